@@ -0,0 +1,82 @@
+"""
+Benchmark resolve_version against the implementation it replaced.
+
+Run from the repository root with
+    python benchmarks/bench_resolve_version.py
+"""
+import timeit
+from typing import List, Optional
+
+from packaging.specifiers import SpecifierSet
+
+from depend.dependencies.helper import (
+    fix_constraint,
+    resolve_version,
+    try_version,
+    version_index,
+)
+
+REPEAT = 5
+
+
+def legacy_resolve_version(
+    vers: List[str], reqs: List[SpecifierSet] = None
+) -> Optional[str]:
+    """resolve_version before versions were indexed"""
+    or_compatible = []
+    for req in reqs:
+        or_compatible.extend([ver for ver in vers if req.contains(ver)])
+    if or_compatible:
+        return sorted(or_compatible, key=try_version, reverse=True)[0]
+    return None
+
+
+def listing(majors: int, minors: int, patches: int) -> List[str]:
+    """Version list shaped like busy npm or PyPI packages, oldest first"""
+    vers = []
+    for major in range(majors):
+        for minor in range(minors):
+            for patch in range(patches):
+                vers.append(f"{major}.{minor}.{patch}")
+            vers.append(f"{major}.{minor + 1}.0-rc.1")
+    return vers
+
+
+CASES = [
+    ("javascript", listing(20, 15, 10), ["*", "^18.0.0", "~16.11.0", "4.x || 5.x"]),
+    ("python", listing(2, 40, 40), ["", ">=1.20", "~=1.26.0", "<1.0"]),
+    ("rust", listing(1, 200, 5), ["0.2", "^0.150", "~0.10.1", ">=0.1, <0.3"]),
+]
+
+
+def main():
+    print(
+        f"{'language':<12}{'versions':>10}{'constraint':>16}"
+        f"{'legacy':>12}{'cold':>12}{'warm':>12}"
+    )
+    for language, vers, constraints in CASES:
+        for constraint in constraints:
+            reqs = fix_constraint(language, constraint)
+            expected = legacy_resolve_version(vers, reqs)
+            assert resolve_version(vers, reqs) == expected, constraint
+            legacy = min(
+                timeit.repeat(
+                    lambda: legacy_resolve_version(vers, reqs), number=1, repeat=REPEAT
+                )
+            )
+            version_index.cache_clear()
+            cold = timeit.timeit(lambda: resolve_version(vers, reqs), number=1)
+            warm = min(
+                timeit.repeat(
+                    lambda: resolve_version(vers, reqs), number=1, repeat=REPEAT
+                )
+            )
+            print(
+                f"{language:<12}{len(vers):>10}{constraint or '(any)':>16}"
+                f"{legacy * 1000:>10.2f}ms{cold * 1000:>10.2f}ms{warm * 1000:>10.2f}ms"
+            )
+    print("cold includes building the index, warm reuses it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Find where batch resolution with NumPy overtakes resolving constraints one by one.
+
+Run from the repository root with
+    python benchmarks/bench_resolve_versions.py
+"""
+import random
+import timeit
+
+from bench_resolve_version import listing
+
+from depend.dependencies.helper import fix_constraint, resolve_version, version_index
+from depend.dependencies.version_batch import resolve_versions
+
+REPEAT = 5
+BATCH_SIZES = [1, 4, 16, 64, 256, 1024]
+
+
+def constraints(vers, size, seed=0):
+    """Caret ranges on random versions, so some resolve far from the newest"""
+    rng = random.Random(seed)
+    return [
+        fix_constraint("javascript", "^" + rng.choice(vers).split("-")[0])
+        for _ in range(size)
+    ]
+
+
+def main():
+    print(f"{'versions':>10}{'batch':>8}{'scalar':>12}{'numpy':>12}")
+    for vers in (listing(5, 10, 10), listing(20, 15, 10)):
+        version_index(tuple(vers))
+        crossover = None
+        for size in BATCH_SIZES:
+            batch = constraints(vers, size)
+            assert resolve_versions(vers, batch) == [
+                resolve_version(vers, reqs) for reqs in batch
+            ]
+            scalar = min(
+                timeit.repeat(
+                    lambda: [resolve_version(vers, reqs) for reqs in batch],
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            vector = min(
+                timeit.repeat(
+                    lambda: resolve_versions(vers, batch), number=1, repeat=REPEAT
+                )
+            )
+            if crossover is None and vector < scalar:
+                crossover = size
+            print(
+                f"{len(vers):>10}{size:>8}"
+                f"{scalar * 1000:>10.2f}ms{vector * 1000:>10.2f}ms"
+            )
+        print(f"numpy is faster from a batch of {crossover} constraints")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark the semver range engine against the regex rewriting it replaced,
+over the constraints found in the lockfiles and manifests of tests/data.
+
+Run from the repository root with
+    python benchmarks/bench_semver.py
+"""
+import json
+import re
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from bench_resolve_version import listing
+from packaging.specifiers import SpecifierSet
+
+from depend.dependencies.helper import (
+    clear_constraint_cache,
+    fix_constraint,
+    handle_caret,
+    handle_dep_file,
+    handle_lax_specifier,
+    handle_tilde,
+    resolve_version,
+)
+from depend.dependencies.semver import parse_semver, semver_index
+
+DATA = Path(__file__).parent.parent / "tests" / "data"
+SOURCES = [
+    ("example_package.json", "package.json", "javascript"),
+    ("example_package_lock.json", "package-lock.json", "javascript"),
+    ("example_npm_shrinkwrap.json", "npm-shrinkwrap.json", "javascript"),
+    ("example_v1_yarn.lock", "yarn.lock", "javascript"),
+    ("example_v2_yarn.lock", "yarn.lock", "javascript"),
+    ("example_cargo.toml", "Cargo.toml", "rust"),
+    ("example_cargo.lock", "Cargo.lock", "rust"),
+    ("example_composer.json", "composer.json", "php"),
+]
+# dependency lines of yarn lockfiles, such as `chalk "^2.0.0"` or `debug: ^4.1.0`
+YARN_DEPENDENCY = re.compile(r'^ {4}"?[@\w./-]+"?:? "?([^"\n]+?)"?$', re.MULTILINE)
+ROUNDS = 20
+
+
+def legacy_fix_constraint(language: str, reqs: str) -> List[SpecifierSet]:
+    """
+    fix_constraint of semver ecosystems before ranges were compiled natively.
+    It raised on some constraints, such as git urls, those match any version.
+    """
+    try:
+        return legacy_rewrite(language, reqs)
+    except ValueError:
+        return [SpecifierSet()]
+
+
+def legacy_rewrite(language: str, reqs: str) -> List[SpecifierSet]:
+    """Rewriting of ranges into PEP 440 specifiers"""
+    fixed_constraint = reqs.strip()
+    if fixed_constraint in ("latest", "*", ""):
+        return [SpecifierSet()]
+    if language == "rust":
+        all_constraints = [
+            ",".join(
+                legacy_rust(constraint) for constraint in fixed_constraint.split(",")
+            )
+        ]
+    else:
+        separator = "||" if language == "javascript" else "|"
+        fix = legacy_js if language == "javascript" else legacy_php
+        all_constraints = [
+            ",".join(fix(constraint) for constraint in sub_constraint.split(","))
+            for sub_constraint in fixed_constraint.replace("||", separator).split(
+                separator
+            )
+        ]
+    return handle_lax_specifier(all_constraints)
+
+
+def legacy_rust(fixed_constraint: str) -> str:
+    """fix_constraint_rust as it was"""
+    if "*" not in fixed_constraint:
+        if "~" in fixed_constraint:
+            fixed_constraint = handle_tilde(fixed_constraint)
+        elif fixed_constraint[:1].isalnum():
+            fixed_constraint = "^" + fixed_constraint
+        if "^" in fixed_constraint:
+            fixed_constraint = handle_caret(fixed_constraint)
+    return fixed_constraint
+
+
+def legacy_php(sub_constraint: str) -> str:
+    """fix_constraint_php as it was"""
+    sub_constraint = sub_constraint.strip()
+    if " - " in sub_constraint:
+        low, high = sub_constraint.split(" - ", 1)
+        sub_constraint = f">={low}, <={high}"
+    if "^" in sub_constraint:
+        sub_constraint = handle_caret(sub_constraint)
+    if "~" in sub_constraint:
+        sub_constraint = handle_tilde(sub_constraint, True)
+    return re.sub(r"(\s)+(?!\w)", ",", sub_constraint)
+
+
+def legacy_js(sub_constraint: str) -> str:
+    """fix_constraint_js as it was"""
+    sub_constraint = sub_constraint.strip().replace(".x", ".*")
+    if "^" in sub_constraint:
+        sub_constraint = handle_caret(sub_constraint)
+    if "~" in sub_constraint:
+        sub_constraint = handle_tilde(sub_constraint)
+    if " - " in sub_constraint:
+        low, high = sub_constraint.split(" - ", 1)
+        sub_constraint = f">={low}, <={high}"
+    return re.sub(r"(\s)+(?!\w)", ",", sub_constraint)
+
+
+def requires(data) -> List[str]:
+    """Every range in the requires maps of an npm lockfile"""
+    found = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == "requires" and isinstance(value, dict):
+                found += [req for req in value.values() if isinstance(req, str)]
+            else:
+                found += requires(value)
+    return found
+
+
+def corpus() -> List[Tuple[str, str]]:
+    """Language and constraint of every dependency declared in tests/data"""
+    constraints = []
+    for file_name, manifest, language in SOURCES:
+        content = (DATA / file_name).read_text()
+        entries = handle_dep_file(manifest, content).get("pkg_dep", [])
+        constraints += [
+            (language, entry.rsplit(";", 1)[1]) for entry in entries if ";" in entry
+        ]
+        if file_name.endswith(".json"):
+            constraints += [(language, req) for req in requires(json.loads(content))]
+        elif "yarn" in file_name:
+            constraints += [(language, req) for req in YARN_DEPENDENCY.findall(content)]
+    return constraints
+
+
+def throughput(run: Callable[[], object], count: int, rounds: int = ROUNDS) -> float:
+    """Best rate over a number of rounds, in constraints per second"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def main():
+    constraints = corpus()
+    vers = listing(20, 15, 10)
+    print(
+        f"{len(constraints)} constraints, {len(set(constraints))} distinct, "
+        f"resolved against {len(vers)} versions"
+    )
+
+    def legacy():
+        return [
+            resolve_version(vers, legacy_fix_constraint(language, constraint))
+            for language, constraint in constraints
+        ]
+
+    def native():
+        return [
+            resolve_version(vers, fix_constraint(language, constraint))
+            for language, constraint in constraints
+        ]
+
+    def cold():
+        clear_constraint_cache()
+        parse_semver.cache_clear()
+        semver_index.cache_clear()
+        return native()
+
+    def compile_legacy():
+        return [legacy_fix_constraint(*constraint) for constraint in constraints]
+
+    def compile_cold():
+        for constraint in constraints:
+            clear_constraint_cache()
+            fix_constraint(*constraint)
+
+    def compile_warm():
+        return [fix_constraint(*constraint) for constraint in constraints]
+
+    crashes = 0
+    for constraint in constraints:
+        try:
+            legacy_rewrite(*constraint)
+        except ValueError:
+            crashes += 1
+    differences = sum(old != new for old, new in zip(legacy(), native()))
+    rows = [
+        ("compile legacy", compile_legacy, ROUNDS),
+        ("compile native cold", compile_cold, ROUNDS),
+        ("compile native warm", compile_warm, ROUNDS),
+        ("resolve legacy", legacy, 3),
+        ("resolve native cold", cold, 3),
+        ("resolve native warm", native, 3),
+    ]
+    for name, run, rounds in rows:
+        rate = throughput(run, len(constraints), rounds)
+        print(f"{name:<24}{rate:>14,.0f} constraints/s")
+    print(f"{crashes} constraints raised in the legacy rewriting")
+    print(f"{differences} constraints resolve differently")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,35 @@ import json
 import logging
 import os.path
 import sys
+from contextlib import nullcontext
+from datetime import timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO, Union
 
 import coloredlogs
 import typer
 from rich import print as rprint
 
-from depend.dependencies.helper import handle_dep_file, parse_dep_response
+from depend import run_stats
+from depend.dependencies.helper import (
+    canonical_entry,
+    handle_dep_file,
+    parse_dep_response,
+)
+from depend.dependencies.py.py_helper import entry_with_extras, set_target_environment
+from depend.dependencies.registry_mode import set_registry_mode
 from depend.error import LanguageNotSupportedError, ParamMissing, VCSNotSupportedError
-from depend.inspector import make_multiple_requests
+from depend.inspector import iter_multiple_requests, make_multiple_requests
+from depend.store import metadata_store
+from depend.vcs.git_mirror import set_mirror_mode
+from depend.vcs.vcs_budget import VCSBudget, parse_budget
+from depend.vcs.vcs_phase import (
+    ready_deferred,
+    report_deferred,
+    run_vcs_phase,
+    set_phase_mode,
+    take_pending,
+)
 
 app = typer.Typer()
 coloredlogs.install(
@@ -20,12 +39,213 @@ coloredlogs.install(
 )
 
 
+def write_ndjson(records: Iterable[Any], stream: TextIO) -> int:
+    """
+    Write records as newline delimited JSON as soon as they are produced
+    :param records: schema compliant responses
+    :param stream: text stream to write to
+    :return: number of records written
+    """
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record) + "\n")
+        stream.flush()
+        count += 1
+    return count
+
+
+def record_entries(language: str, records: List[Any]) -> Set[str]:
+    """
+    Canonical entries of every dependency listed in schema compliant responses
+    :param language: language of the packages
+    :param records: schema compliant responses
+    """
+    return {
+        canonical_entry(language, dep)
+        for record in records
+        for package in record.values()
+        for entry in package["versions"].values()
+        for dep in entry["pkg_dep"]
+    }
+
+
+def run_vcs_rounds(
+    language: str,
+    result: List[Any],
+    roots: List[str],
+    recursive: bool,
+    jobs: int = 1,
+    pipeline: bool = False,
+    vcs_jobs: int = 4,
+    budget: Optional[VCSBudget] = None,
+    batch: bool = False,
+    wait: bool = False,
+) -> None:
+    """
+    Run the VCS phase over queued lookups, and over deferred ones once quota
+    is reset. With recursive resolution the dependencies it finds are resolved
+    too, and the phase run again over the lookups that queues, until no lookup
+    is left. Lookups still deferred are reported.
+    :param language: language of the packages
+    :param result: schema compliant responses, extended in place
+    :param roots: dependency entries the run started from
+    :param recursive: dependencies found are resolved if true
+    :param jobs: number of packages fetched in parallel
+    :param pipeline: resolve dependencies found with the pipelined scheduler
+    :param vcs_jobs: repositories looked up in parallel
+    :param budget: calls or seconds every round of the phase spends from
+    :param batch: run the phase over GraphQL
+    :param wait: wait for drained GitHub tokens to be reset to replay deferred lookups
+    """
+    replayed = None
+    while True:
+        deferred, replayed = ready_deferred(wait, budget, replayed)
+        if not (lookups := take_pending() + deferred):
+            break
+        queued = record_entries(language, result)
+        queued.update(canonical_entry(language, root) for root in roots)
+        run_vcs_phase(lookups, jobs=vcs_jobs, budget=budget, batch=batch)
+        if not recursive:
+            continue
+        found = {
+            dep
+            for _, _, looked_up in lookups
+            for dep in looked_up.get("pkg_dep") or []
+            if canonical_entry(language, dep) not in queued
+        }
+        if not found:
+            continue
+        run_stats.record("vcs_phase_rounds")
+        result.extend(
+            make_multiple_requests(
+                language,
+                sorted(found),
+                jobs=jobs,
+                pipeline=pipeline,
+                queued=queued,
+            )
+        )
+    report_deferred()
+
+
+def maintain_store(
+    language: str,
+    show_stats: bool = False,
+    prune_days: Optional[int] = None,
+    export: Optional[Path] = None,
+) -> bool:
+    """
+    Run the maintenance operations asked for on the metadata store,
+    whether the run itself uses the store or not
+    :param language: language whose results are pruned
+    :param show_stats: print a summary of the store to stderr
+    :param prune_days: remove results of the language stored this many days ago or more
+    :param export: file every stored result is written to as newline delimited JSON
+    :return: true if any operation was run
+    """
+    if prune_days is not None:
+        removed = metadata_store.prune(language, timedelta(days=prune_days))
+        logging.info("Pruned %d stored results", removed)
+    if export:
+        exported = metadata_store.export(export)
+        logging.info("Exported %d stored results to %s", exported, export)
+    if show_stats:
+        typer.echo(json.dumps(metadata_store.stats(), indent=3), err=True)
+    return show_stats or prune_days is not None or export is not None
+
+
 @app.callback(invoke_without_command=True)
 def main(
     lang: str = typer.Option(..., help="python, javascript, go, cs, php, rust"),
     packages: Optional[str] = typer.Option(None, help="rich;latest,pygit2;~=1.9.2,..."),
     dep_file: Optional[Path] = typer.Option(None, help="Absolute or Relative Path"),
     depth: Optional[int] = typer.Option(None, help="Recursive resolution by default"),
+    jobs: int = typer.Option(1, help="Number of packages fetched in parallel"),
+    pipeline: bool = typer.Option(
+        False, help="Queue dependencies as soon as their parent is resolved"
+    ),
+    stats: bool = typer.Option(False, help="Print statistics of the run to stderr"),
+    store: bool = typer.Option(
+        False, help="Persist package metadata and reuse it in later runs"
+    ),
+    store_stats: bool = typer.Option(
+        False, help="Print a summary of the metadata store to stderr"
+    ),
+    store_prune: Optional[int] = typer.Option(
+        None,
+        help="Remove stored results of --lang this many days old, "
+        "along with expired version lists",
+    ),
+    store_export: Optional[Path] = typer.Option(
+        None, help="File every stored result is exported to as ndjson"
+    ),
+    output_format: str = typer.Option(
+        "json",
+        "--format",
+        help="json for a single document, ndjson for one record per line",
+    ),
+    output: Optional[Path] = typer.Option(
+        None, help="File to write results to instead of stdout"
+    ),
+    python_version: Optional[str] = typer.Option(
+        None, help="Drop python dependencies whose markers exclude this version"
+    ),
+    platform: Optional[str] = typer.Option(
+        None, help="Drop python dependencies whose markers exclude this sys.platform"
+    ),
+    extras: Optional[str] = typer.Option(
+        None,
+        help="Comma separated extras requested for the python packages given "
+        "or the dependency file, their dependencies request extras of their own",
+    ),
+    pypi_metadata: bool = typer.Option(
+        False, help="Read python packages from the Simple API and core metadata"
+    ),
+    pypi_index: Optional[str] = typer.Option(
+        None, help="Simple API root used by --pypi-metadata, PyPI by default"
+    ),
+    cargo_sparse: bool = typer.Option(
+        False, help="Resolve rust crates from the sparse index"
+    ),
+    cargo_index: Optional[str] = typer.Option(
+        None, help="Sparse index root used by --cargo-sparse, crates.io by default"
+    ),
+    goproxy: bool = typer.Option(
+        False, help="Resolve go modules from a module proxy instead of pkg.go.dev"
+    ),
+    goproxy_url: Optional[str] = typer.Option(
+        None, help="Proxy root used by --goproxy, file:// for a proxy on disk"
+    ),
+    packagist_p2: bool = typer.Option(
+        False, help="Read php packages from the compact p2 metadata documents"
+    ),
+    packagist_repo: Optional[str] = typer.Option(
+        None, help="Composer repository root used by --packagist-p2"
+    ),
+    vcs_phase: bool = typer.Option(
+        False,
+        help="Look repositories up in a phase of their own after resolution, "
+        "dependencies found are then resolved. Needs recursive resolution or depth 0",
+    ),
+    vcs_jobs: int = typer.Option(
+        4, help="Repositories looked up in parallel by the VCS phase"
+    ),
+    vcs_budget: Optional[str] = typer.Option(
+        None, help="GitHub calls the VCS phase may spend, or seconds such as 90s"
+    ),
+    vcs_batch: bool = typer.Option(
+        False, help="Run the VCS phase over GraphQL, many repositories per query"
+    ),
+    vcs_wait: bool = typer.Option(
+        False,
+        help="Wait for drained GitHub tokens to be reset to finish deferred lookups",
+    ),
+    git_mirror: bool = typer.Option(
+        False, help="Read repositories of any git host from local bare mirrors"
+    ),
+    git_mirror_dir: Optional[Path] = typer.Option(
+        None, help="Directory mirrors are kept in, the user cache dir by default"
+    ),
 ) -> List[Any]:
     """
     Dependency Inspector
@@ -33,7 +253,7 @@ def main(
     Retrieves licenses and dependencies of Python, JavaScript, C#, PHP, Rust and Go packages.
     Uses Package Indexes for Python and Javascript
     Go is temporarily handled by scraping pkg.go.dev and VCS
-    VCS support is currently limited to GitHub for fallthrough cases in Go
+    VCS fallthrough uses GitHub, or local git mirrors of any host with git_mirror
     Parameters such as auth tokens and passwords can be defined in config.ini
     rather than specifying as an argument
 
@@ -45,7 +265,93 @@ def main(
 
     :param depth: dependency query recursion level
 
+    :param jobs: number of packages fetched in parallel
+
+    :param pipeline: queue dependencies as soon as their parent is resolved
+
+    :param stats: print statistics of the run to stderr
+
+    :param store: persist package metadata and reuse it in later runs
+
+    :param store_stats: print a summary of the metadata store to stderr
+
+    :param store_prune: remove stored results of lang this many days old, along with
+    expired version lists
+
+    :param store_export: file every stored result is exported to as ndjson
+
+    :param output_format: json for a single document, ndjson to stream one record per line
+
+    :param output: file to write results to instead of stdout
+
+    :param python_version: drop python dependencies whose markers exclude this version
+
+    :param platform: drop python dependencies whose markers exclude this sys.platform
+
+    :param extras: comma separated extras requested for the python packages given or
+    the dependency file, their dependencies request extras of their own
+
+    :param pypi_metadata: read python packages from the Simple API and core metadata files
+
+    :param pypi_index: Simple API root used by pypi_metadata, PyPI by default
+
+    :param cargo_sparse: resolve rust crates from the sparse index, licenses from crates.io
+
+    :param cargo_index: sparse index root used by cargo_sparse, crates.io by default
+
+    :param goproxy: resolve go modules from a module proxy instead of pkg.go.dev
+
+    :param goproxy_url: proxy root used by goproxy, file:// for a proxy on disk
+
+    :param packagist_p2: read php packages from the compact p2 metadata documents
+
+    :param packagist_repo: composer repository root used by packagist_p2, Packagist by default
+
+    :param vcs_phase: look repositories up in a phase of their own after resolution,
+    dependencies found are then resolved, so depth must be left out or 0
+
+    :param vcs_jobs: repositories looked up in parallel by the VCS phase
+
+    :param vcs_budget: GitHub calls the VCS phase may spend, or seconds such as 90s
+
+    :param vcs_batch: run the VCS phase over GraphQL, many GitHub repositories per query
+
+    :param vcs_wait: wait for drained GitHub tokens to be reset to finish deferred
+    lookups, instead of reporting them
+
+    :param git_mirror: read repositories of any git host from local bare mirrors
+
+    :param git_mirror_dir: directory mirrors are kept in, the user cache dir by default
+
     """
+    run_stats.reset()
+    metadata_store.enabled = store
+    set_target_environment(
+        python_version, platform, extras.split(",") if extras else None
+    )
+    set_registry_mode("python", pypi_metadata, pypi_index)
+    set_registry_mode("rust", cargo_sparse, cargo_index)
+    set_registry_mode("go", goproxy, goproxy_url)
+    set_registry_mode("php", packagist_p2, packagist_repo)
+    set_phase_mode(vcs_phase or vcs_batch)
+    set_mirror_mode(git_mirror, git_mirror_dir)
+    if output_format not in ["json", "ndjson"]:
+        logging.error("Unsupported output format %s", output_format)
+        sys.exit(-1)
+    if (vcs_phase or vcs_batch) and output_format == "ndjson":
+        # streamed records are written before the VCS phase could fill them in
+        logging.error("vcs_phase is only supported with the json format")
+        sys.exit(-1)
+    if (vcs_phase or vcs_batch) and depth not in (None, 0):
+        # the depth of the packages a repository points to is not tracked
+        logging.error("vcs_phase only supports recursive resolution or depth 0")
+        sys.exit(-1)
+    try:
+        budget = parse_budget(vcs_budget)
+    except ValueError:
+        logging.error("Unsupported VCS budget %s", vcs_budget)
+        sys.exit(-1)
+    maintained = maintain_store(lang, store_stats, store_prune, store_export)
     payload: Dict[str, Union[None, str, list[str]]] = {}
     result: List[Any] = []
     file_extension = ""
@@ -58,11 +364,11 @@ def main(
         dep_content = handle_dep_file(os.path.basename(dep_file), dep_file.read_text())
         payload[lang] = dep_content.get("pkg_dep")
         result.append(parse_dep_response([dep_content]))
-        if depth == 0:
-            rprint(result)
-            return result
     elif packages:
         payload[lang] = packages
+    elif maintained:
+        # store maintenance needs no packages
+        return result
     else:
         logging.error("Nothing to process please specify either dep_file or packages")
         sys.exit(-1)
@@ -72,19 +378,64 @@ def main(
         if isinstance(dependencies, str):
             dep_list = dependencies.replace(",", "\n").split("\n")
             dep_list = list(filter(None, dep_list))
+            if language == "python" and extras:
+                dep_list = [
+                    entry_with_extras(entry, extras.split(",")) for entry in dep_list
+                ]
         elif isinstance(dependencies, list):
             dep_list = dependencies
         else:
             dep_list = []
+        # For a lockfile, we just want to fetch details of the dependencies
+        # given, and not recurse any further. Hence depth=1
+        dep_depth = 1 if file_extension == "lock" else depth
+        if dep_file and depth == 0:
+            # the dependency file is parsed and none of its entries queried
+            dep_list = []
         try:
-            if file_extension == "lock":
-                # For a lockfile, we just want to fetch details of the dependencies
-                # given, and not recurse any further. Hence depth=1
-                result.extend(make_multiple_requests(language, dep_list, depth=1))
-            else:
-                result.extend(make_multiple_requests(language, dep_list, depth))
+            if output_format == "ndjson":
+                # records are written as they arrive and not kept in memory
+                with open(output, "w") if output else nullcontext(sys.stdout) as f:
+                    write_ndjson(result, f)
+                    write_ndjson(
+                        iter_multiple_requests(
+                            language, dep_list, dep_depth, jobs=jobs
+                        ),
+                        f,
+                    )
+                # streamed records can not be filled in afterwards
+                report_deferred()
+                result = []
+            elif dep_list:
+                result.extend(
+                    make_multiple_requests(
+                        language, dep_list, dep_depth, jobs=jobs, pipeline=pipeline
+                    )
+                )
+            if output_format == "json":
+                # the budget covers every round, not the resolution before them
+                budget.start()
+                # lookups deferred for quota are replayed along with the queued ones
+                run_vcs_rounds(
+                    language,
+                    result,
+                    dep_list,
+                    dep_depth is None,
+                    jobs=jobs,
+                    pipeline=pipeline,
+                    vcs_jobs=vcs_jobs,
+                    budget=budget,
+                    batch=vcs_batch,
+                    wait=vcs_wait,
+                )
         except (LanguageNotSupportedError, VCSNotSupportedError, ParamMissing) as e:
             logging.error(e.msg)
             sys.exit(-1)
-    rprint(json.dumps(result, indent=3))
+    if output_format == "json":
+        if output:
+            output.write_text(json.dumps(result, indent=3))
+        else:
+            rprint(json.dumps(result, indent=3))
+    if stats:
+        typer.echo(json.dumps(run_stats.snapshot(), indent=3), err=True)
     return result
@@ -0,0 +1,152 @@
+"""Memoization of the transitive closure of resolved packages"""
+from typing import Any, Dict, List, Set, Tuple
+
+from depend import run_stats
+from depend.dependencies.helper import (
+    canonical_name,
+    fix_constraint,
+    parse_dep_response,
+    pinned_version,
+)
+from depend.store import metadata_store
+
+
+def response_key(package_d: str, dep_resp: Any) -> Tuple[str, str]:
+    """
+    Package name and version a dependency entry resolved to
+    :param package_d: package name optionally followed by ;version constraint
+    :param dep_resp: schema compliant response for the entry
+    :return: name as queried and resolved version, empty if not a single version
+    """
+    name = package_d.rsplit(";", 1)[0]
+    if not isinstance(dep_resp, dict) or len(dep_resp) != 1:
+        return name, ""
+    versions = next(iter(dep_resp.values())).get("versions", {})
+    if len(versions) != 1:
+        return name, ""
+    return name, next(iter(versions)) or ""
+
+
+def splice_closure(
+    language: str,
+    package_d: str,
+    dep_resp: Any,
+    known: Dict[str, Tuple[Any, Set[str]]],
+) -> None:
+    """
+    Seed responses of every package below a resolved package from its stored closure
+    :param language: language of the package
+    :param package_d: entry that was resolved
+    :param dep_resp: schema compliant response for the entry
+    :param known: responses and dependencies that need not be queried again
+    """
+    name, ver = response_key(package_d, dep_resp)
+    if not ver:
+        return
+    members = metadata_store.get_closure(language, name, ver)
+    if members is None:
+        return
+    seeded = {}
+    for member in members:
+        if member["package"] in known:
+            continue
+        stored = metadata_store.get_result(language, member["name"], member["version"])
+        if stored is None:
+            return
+        seeded[member["package"]] = (parse_dep_response([stored]), set(member["deps"]))
+    known.update(seeded)
+    run_stats.record("closures_spliced")
+
+
+def record_closures(language: str, graph: Dict[str, Tuple[str, Set[str]]]) -> None:
+    """
+    Persist the closure of every package resolved by an unlimited depth run
+    :param language: language of the packages
+    :param graph: resolved version and dependencies of every entry in the run
+    """
+    if not metadata_store.enabled:
+        return
+    members: Dict[str, Dict[str, Any]] = {}
+    for package_d, (ver, deps) in graph.items():
+        name = package_d.rsplit(";", 1)[0]
+        if not ver or not metadata_store.has_result(language, name, ver):
+            continue
+        constraint = package_d.rsplit(";", 1)[1:] or [""]
+        members[package_d] = {
+            "package": package_d,
+            # the store keys version lists by the canonical name
+            "name": canonical_name(language, name),
+            "version": ver,
+            "pinned": pinned_version(fix_constraint(language, constraint[0]))
+            is not None,
+            "deps": sorted(deps),
+        }
+    children = {package_d: deps for package_d, (_, deps) in graph.items()}
+    for package_d, reachable in _reachable(children).items():
+        below = sorted(reachable - {package_d})
+        if package_d not in members or any(dep not in members for dep in below):
+            continue
+        member = members[package_d]
+        metadata_store.put_closure(
+            language,
+            member["name"],
+            member["version"],
+            [members[dep] for dep in below],
+        )
+
+
+def _reachable(children: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """
+    Set of entries reachable from every entry, cycles included.
+    Strongly connected components are found with Tarjan's algorithm, which
+    completes every component only after all components reachable from it.
+    :param children: dependencies of every entry
+    :return: entries reachable from each entry, including itself
+    """
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    reach: Dict[str, Set[str]] = {}
+    for root in children:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(sorted(children[root])))]
+        while work:
+            node, deps = work[-1]
+            for dep in deps:
+                if dep not in children:
+                    continue
+                if dep not in index:
+                    index[dep] = low[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(sorted(children[dep]))))
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] != index[node]:
+                    continue
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                reachable = set(component)
+                for member in component:
+                    for dep in children[member]:
+                        if dep in children and dep not in component:
+                            reachable |= reach[dep]
+                for member in component:
+                    reach[member] = reachable
+    return reach
@@ -6,6 +6,8 @@ REGISTRY: dict = {
     "python": {
         "registry": "PyPI",
         "url": "https://pypi.org/pypi",
+        # Simple API read in registry mode
+        "mode_url": "https://pypi.org/simple",
         "name": jc("info.name"),
         "versions": jc("releases | keys(@)"),
         "version": jc("info.version"),
@@ -26,6 +28,8 @@ REGISTRY: dict = {
     },
     "go": {
         "url": "https://pkg.go.dev",
+        # module proxy read in registry mode
+        "mode_url": "https://proxy.golang.org",
         "name": "nav.go-Main-headerBreadcrumb",
         "parse": "div.go-Main-headerDetails",
         "versions": "div.Version-tag",
@@ -45,6 +49,8 @@ REGISTRY: dict = {
     },
     "php": {
         "url": "https://packagist.org/packages",
+        # repository serving p2 metadata read in registry mode
+        "mode_url": "https://repo.packagist.org",
         "name": jc("package.name"),
         "versions": jc("package.versions.keys(@)"),
         "ver_data": jc("package.versions"),
@@ -53,6 +59,8 @@ REGISTRY: dict = {
     },
     "rust": {
         "url": "https://crates.io/api/v1/crates",
+        # sparse index read in registry mode
+        "mode_url": "https://index.crates.io",
         "name": jc("version.crate"),
         "versions": jc("versions[].num"),
         "version": jc("version.num"),
@@ -0,0 +1,83 @@
+"""Go module proxy protocol, as served by proxy.golang.org or a GOPROXY mirror"""
+import json
+from pathlib import Path
+from typing import List
+from urllib.parse import unquote, urlparse
+
+from requests import Response
+
+from depend.dep_helper import requests
+
+from ..registry_mode import mode_url
+from ..semver import semver_index
+
+
+def escape_path(module: str) -> str:
+    """
+    Case encoding of module paths, upper case letters become ! and the lower case letter
+    https://go.dev/ref/mod#goproxy-protocol
+    :param module: module path
+    """
+    return "".join("!" + c.lower() if c.isupper() else c for c in module)
+
+
+def proxy_url(module: str, endpoint: str) -> str:
+    """
+    Url of a module proxy endpoint
+    :param module: module path
+    :param endpoint: @v/list, @latest or @v/<version> followed by .info, .mod or .zip
+    """
+    return f"{mode_url('go')}/{escape_path(module)}/{escape_path(endpoint)}"
+
+
+def is_file_url(url: str) -> bool:
+    """
+    Check if a url points to a proxy on disk
+    :param url: url to fetch
+    """
+    return url.startswith("file://")
+
+
+def file_response(url: str) -> Response:
+    """
+    Response for a file of a proxy on disk, 404 if it does not exist
+    :param url: file:// url
+    """
+    path = Path(unquote(urlparse(url).path))
+    response = Response()
+    response.url = url
+    response.encoding = "utf-8"
+    if path.is_file():
+        response.status_code = 200
+        response._content = path.read_bytes()
+    else:
+        response.status_code = 404
+        response._content = b""
+    return response
+
+
+def proxy_get(url: str) -> Response:
+    """
+    Fetch from the module proxy, on disk or over http
+    :param url: proxy url
+    """
+    if is_file_url(url):
+        return file_response(url)
+    return requests.get(url)
+
+
+def proxy_versions(response: Response, url: str) -> List[str]:
+    """
+    Tagged versions of a module newest first, the latest pseudo-version
+    if nothing is tagged
+    :param response: response for the @v/list endpoint
+    :param url: url of the @v/list endpoint
+    """
+    vers = response.text.split() if response.status_code == 200 else []
+    if not vers:
+        latest = proxy_get(url.rsplit("@v/list", 1)[0] + "@latest")
+        if latest.status_code == 200:
+            vers = [json.loads(latest.text)["Version"]]
+    index = semver_index(tuple(vers))
+    ordered = [ver for _, ver in index]
+    return ordered + [ver for ver in vers if ver not in ordered]
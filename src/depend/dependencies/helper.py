@@ -1,8 +1,10 @@
 """Helper Functions for Inspector."""
 import datetime
+import json
 import logging
 import re
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 import jmespath
 from bs4 import BeautifulSoup
@@ -10,6 +12,7 @@ from packaging.specifiers import InvalidSpecifier, SpecifierSet
 from packaging.version import InvalidVersion, Version
 from requests import Response
 
+from depend import run_stats
 from depend.constants import REGISTRY
 from depend.dep_helper import requests
 from depend.error import FileNotSupportedError
@@ -18,10 +21,37 @@ from .cs.cs_worker import handle_nuspec, parse_nuspec
 from .dep_types import Result
 from .go.go_worker import handle_go_mod
 from .js.js_worker import handle_js, handle_json, handle_yarn_lock
+from .php.php_p2 import p2_versions
 from .php.php_worker import handle_composer_json
-from .py.py_helper import get_py_dep_from_iterable, handle_requirements_txt
+from .py.py_helper import (
+    get_py_dep_from_iterable,
+    handle_requirements_txt,
+    split_extras,
+)
+from .py.py_simple import (
+    metadata_file,
+    parse_core_metadata,
+    simple_versions,
+)
 from .py.py_worker import handle_otherpy, handle_setup_cfg, handle_setup_py, handle_toml
+from .registry_mode import registry_mode
+from .rust.rust_sparse import (
+    sparse_dependencies,
+    sparse_entries,
+    sparse_url,
+)
 from .rust.rust_worker import handle_cargo_toml, handle_lock
+from .semver import SEMVER_LANGUAGES, compile_range, is_semver, resolve_semver
+
+# number of packages whose parsed versions are kept in memory
+VERSION_INDEX_SIZE = 1024
+INVALID_VERSION = Version("9999.9999.9999")
+# npm registry format with only what installs need, no license or homepage
+NPM_ABBREVIATED = "application/vnd.npm.install-v1+json"
+# number of compiled constraints kept in memory
+CONSTRAINT_CACHE_SIZE = 4096
+# number of parsed Packagist documents kept in memory
+PHP_DOCUMENT_SIZE = 256
 
 
 def parse_license(license_file: str, license_dict: dict) -> List[str]:
@@ -130,12 +160,83 @@ def handle_pypi(api_response: Response, result: Result):
     if not api_depend:
         result["pkg_dep"] = None
     else:
-        pkg_dep = get_py_dep_from_iterable(api_depend)
+        # dependencies of the extras the package was requested with are kept
+        _, extras = split_extras(result["pkg_name"])
+        pkg_dep = get_py_dep_from_iterable(api_depend, extras)
         result["pkg_dep"] = pkg_dep
     repo = repo_q.search(data) or ""
     return repo
 
 
+def record_transfer(language: str, response: Response) -> None:
+    """
+    Count bytes received from PyPI, per mode, to compare metadata only runs
+    :param language: language of the package
+    :param response: response fetched for the package
+    """
+    if language != "python" or getattr(response, "from_cache", False):
+        return
+    key = (
+        "pypi_metadata_mode_bytes"
+        if registry_mode("python")
+        else "pypi_json_mode_bytes"
+    )
+    run_stats.record(key, len(response.content))
+
+
+def core_metadata_url(api_response: Response, package: str, ver: str) -> str:
+    """
+    Url to read a version from in metadata only mode
+    :param api_response: Simple API project page
+    :param package: as imported, extras it is requested with are left out
+    :param ver: version to look for
+    :return: url of the core metadata file, JSON API url if the version has none
+    """
+    package, _ = split_extras(package)
+    if api_response.status_code == 200:
+        url = metadata_file(api_response.json(), ver, str(api_response.url))
+        if url is not None:
+            return url
+    return "/".join((REGISTRY["python"]["url"], package, ver, "json"))
+
+
+def handle_pypi_metadata(
+    api_response: Response,
+    result: Result,
+    package: str,
+    ver: str,
+    meta_res: Response = None,
+):
+    """
+    Fill result from the core metadata file of a version (PEP 658), falling
+    back to the JSON API for versions uploaded without one
+    :param api_response: Simple API project page
+    :param result: object to mutate
+    :param package: as imported, optionally requesting extras
+    :param ver: version queried
+    :param meta_res: response for core_metadata_url if already fetched
+    :return: repo to do vcs query if data incomplete
+    """
+    url = core_metadata_url(api_response, package, ver)
+    if meta_res is None:
+        meta_res = requests.get(url)
+        record_transfer("python", meta_res)
+    if not url.endswith(".metadata"):
+        run_stats.record("pypi_metadata_fallbacks")
+        return handle_pypi(meta_res, result)
+    if meta_res.status_code != 200:
+        return ""
+    info = parse_core_metadata(meta_res.text)
+    result["pkg_ver"] = info["version"]
+    result["pkg_lic"] = [info["license"] or "Other"]
+    if not info["requires_dist"]:
+        result["pkg_dep"] = None
+    else:
+        _, extras = split_extras(package)
+        result["pkg_dep"] = get_py_dep_from_iterable(info["requires_dist"], extras)
+    return info["home_page"]
+
+
 def handle_cs(api_response: Response, result: Result):
     """
     Take api response and return required results object
@@ -150,18 +251,56 @@ def handle_cs(api_response: Response, result: Result):
     return root.get("repository", {}).get("@url")
 
 
-def handle_npmjs(api_response: Response, result: Result):
+def handle_npmjs(api_response: Response, result: Result, ver: str = ""):
     """
     Take api response and return required results object
-    :param api_response: response from requests get
+    :param api_response: response from requests get, or the packument
     :param result: object to mutate
+    :param ver: version to pick when api_response is the packument
     """
     if api_response.status_code == 404:
         return ""
-    repo = handle_js(api_response.json(), result)
+    data = api_response.json()
+    if ver and ver in (data.get("versions") or {}):
+        data = data["versions"][ver]
+    repo = handle_js(data, result)
     return repo
 
 
+@lru_cache(maxsize=PHP_DOCUMENT_SIZE)
+def php_document(url: str, content: bytes, p2: bool) -> dict:
+    """
+    Release data by version of a Packagist document.
+    Documents are keyed by url and content, as every version of a package
+    is served from the same document.
+    :param url: url the document was served from
+    :param content: body of the document
+    :param p2: document is p2 metadata rather than the packages API
+    :return: release data by version, shared so it must not be mutated
+    """
+    data = json.loads(content)
+    if p2:
+        return p2_versions(data)
+    versions_q: jmespath.parser.ParsedResult = REGISTRY["php"]["ver_data"]
+    return versions_q.search(data) or {}
+
+
+run_stats.track_cache("php_document", php_document)
+
+
+def php_package(api_response: Response) -> dict:
+    """
+    Release data by version of a Packagist document, parsed once per run
+    :param api_response: packages API or p2 metadata response
+    :return: release data by version, shared so it must not be mutated
+    """
+    if api_response.status_code != 200:
+        return {}
+    return php_document(
+        str(api_response.url), api_response.content, registry_mode("php")
+    )
+
+
 def handle_php(api_response: Response, result: Result, ver: str):
     """
     Take api response and return required results object
@@ -170,34 +309,48 @@ def handle_php(api_response: Response, result: Result, ver: str):
     :param ver: queried versions
     """
     queries = REGISTRY["php"]
-    data = api_response.json()
     result["pkg_ver"] = ver
-    versions_q: jmespath.parser.ParsedResult = queries["ver_data"]
-    versions = versions_q.search(data)
-    ver_data = versions.get(ver, {})
-    result["pkg_lic"] = ver_data.get(queries["license_key"], ["Other"])
-    dep_data = ver_data.get(queries["dependency_key"], {})
+    ver_data = php_package(api_response).get(ver, {})
+    licenses = ver_data.get(queries["license_key"], ["Other"])
+    # the release data is shared across results, its lists are copied
+    result["pkg_lic"] = list(licenses) if isinstance(licenses, list) else licenses
+    dep_data = dict(ver_data.get(queries["dependency_key"]) or {})
     lang_ver = dep_data.pop("php", "")
     result["lang_ver"] = [lang_ver]
     result["pkg_dep"] = [key + ";" + value for (key, value) in dep_data.items()]
 
 
-def handle_rust(api_response: Response, result: Result, url: str):
+def handle_rust(
+    api_response: Response,
+    result: Result,
+    url: str,
+    dep_res: Response = None,
+    ver: str = "",
+):
     """
     Take api response and return required results object
-    :param api_response: response from requests get
+    :param api_response: response from requests get, or the versions listing
     :param result: object to mutate
-    :param url: url queried for response
+    :param url: version specific url
+    :param dep_res: dependencies response, or sparse index file in sparse mode,
+        if already fetched
+    :param ver: version to pick when api_response is the versions listing
     """
     queries = REGISTRY["rust"]
-    dep_url = url + "/dependencies"
-    dep_res = requests.get(dep_url)
+    if registry_mode("rust"):
+        handle_rust_sparse(api_response, result, dep_res, ver)
+        return
+    if dep_res is None:
+        dep_url = url + "/dependencies"
+        dep_res = requests.get(dep_url)
     version_q: jmespath.parser.ParsedResult = queries["version"]
     license_q: jmespath.parser.ParsedResult = queries["license"]
     dependencies_q: jmespath.parser.ParsedResult = queries["dependency"]
     if api_response.status_code == 404 or dep_res.status_code == 404:
         return ""
     data = api_response.json()
+    if ver and "versions" in data:
+        data = {"version": rust_listed_version(data, ver)}
     dep = dep_res.json()
     result["pkg_ver"] = version_q.search(data) or ""
     result["pkg_lic"] = [license_q.search(data) or "Other"]
@@ -205,12 +358,52 @@ def handle_rust(api_response: Response, result: Result, url: str):
     result["pkg_dep"] = req_file_data
 
 
-def scrape_go(response: Response, result: Result, url: str):
+def handle_rust_sparse(
+    api_response: Response, result: Result, index_res: Response = None, ver: str = ""
+):
+    """
+    Fill result from the sparse index file of the crate, with only the license
+    read from the crates.io API response of the version
+    :param api_response: crates.io response for the version
+    :param result: object to mutate
+    :param index_res: sparse index file if already fetched
+    :param ver: version queried
+    """
+    if index_res is None:
+        index_res = requests.get(sparse_url(result["pkg_name"]))
+    if api_response.status_code == 404 or index_res.status_code != 200:
+        return
+    data = api_response.json()
+    result["pkg_ver"] = REGISTRY["rust"]["version"].search(data) or ver
+    result["pkg_lic"] = [REGISTRY["rust"]["license"].search(data) or "Other"]
+    result["pkg_dep"] = sparse_dependencies(sparse_entries(index_res.text), ver)
+
+
+def handle_go_proxy(response: Response, result: Result, ver: str) -> str:
+    """
+    Fill result from the go.mod file served by the module proxy for a version
+    :param response: response for the @v/<version>.mod endpoint
+    :param result: object to mutate
+    :param ver: version queried
+    :return: module path, module proxies have no license data so it is left to VCS
+    """
+    if response.status_code != 200:
+        return result["pkg_name"]
+    go_mod = handle_go_mod(response.text)
+    result["pkg_name"] = go_mod["pkg_name"] or result["pkg_name"]
+    result["pkg_ver"] = ver
+    result["lang_ver"] = [lang for lang in go_mod["lang_ver"] if lang]
+    result["pkg_dep"] = go_mod["pkg_dep"]
+    return result["pkg_name"]
+
+
+def scrape_go(response: Response, result: Result, url: str, dep_res: Response = None):
     """
     Take api response and return required results object
     :param response: response from requests get
     :param result: object to mutate
     :param url: go url scraped
+    :param dep_res: imports page response if already fetched
     """
     queries = REGISTRY["go"]
     soup = BeautifulSoup(response.text, "html.parser")
@@ -227,9 +420,9 @@ def scrape_go(response: Response, result: Result, url: str):
     key_data = re.findall(r"([^ \n:]+): ([- ,.\w]+)", key_element)
     data = dict(key_data)
     dependencies_tag = []
-    # requirements not version specific
-    non_ver_url = url.split("@")[0] + "?tab=imports"
-    dep_res = requests.get(non_ver_url, allow_redirects=False)
+    if dep_res is None:
+        # requirements not version specific
+        dep_res = requests.get(go_imports_url(url), allow_redirects=False)
     if dep_res.status_code == 200:
         dep_soup = BeautifulSoup(dep_res.text, "html.parser")
         dependencies_tag = [
@@ -242,15 +435,33 @@ def scrape_go(response: Response, result: Result, url: str):
     result["pkg_dep"] = dependencies_tag
 
 
-def go_versions(url: str) -> list:
+def go_imports_url(url: str) -> str:
+    """
+    Get url of the page listing imports of a go package
+    :param url: go url scraped
+    """
+    return url.split("@")[0] + "?tab=imports"
+
+
+def go_versions_url(url: str) -> str:
+    """
+    Get url of the page listing versions of a go package
+    :param url: go url scraped
+    """
+    return url + "?tab=versions"
+
+
+def go_versions(url: str, ver_res: Response = None) -> list:
     """
     Get list of all versions for go package
     :param url: go url scraped
+    :param ver_res: versions page response if already fetched
     :return: list of versions
     """
     queries = REGISTRY["go"]
     ver_parse = queries["versions"].split(".")
-    ver_res = requests.get(url + "?tab=versions", allow_redirects=False)
+    if ver_res is None:
+        ver_res = requests.get(go_versions_url(url), allow_redirects=False)
     releases = []
     if ver_res.status_code == 200:
         version_soup = BeautifulSoup(ver_res.text, "html.parser")
@@ -267,9 +478,79 @@ def rust_versions(api_response: Response) -> list:
     :param api_response: registry response
     :return: list of versions
     """
+    if registry_mode("rust"):
+        if api_response.status_code != 200:
+            return []
+        return [entry["vers"] for entry in sparse_entries(api_response.text)]
     return default_versions(api_response, "rust")
 
 
+def rust_listed_version(data: dict, ver: str) -> dict:
+    """
+    Get metadata of a single version from the crate versions listing
+    :param data: parsed versions listing
+    :param ver: version to look for
+    :return: version metadata, empty if not listed
+    """
+    for listed in data.get("versions") or []:
+        if listed.get("num") == ver:
+            return listed
+    return {}
+
+
+def listing_has_version(language: str, api_response: Response, ver: str) -> bool:
+    """
+    Check if the versions listing already carries the metadata of a version
+    :param language: language of the package
+    :param api_response: registry response used to list versions
+    :param ver: resolved version
+    :return: true if the version specific request can be skipped
+    """
+    if api_response.status_code != 200:
+        return False
+    match language:
+        case "python":
+            if registry_mode("python"):
+                # the project page links the metadata file of every version
+                return ver in simple_versions(api_response.json())
+            # info.* describes the latest release
+            data = api_response.json()
+            return REGISTRY["python"]["version"].search(data) == ver
+        case "javascript":
+            if is_abbreviated(api_response):
+                return False
+            data = api_response.json()
+            return ver in (data.get("versions") or {})
+        case "php":
+            return ver in php_package(api_response)
+        case "rust":
+            # the sparse index has no license data
+            if registry_mode("rust"):
+                return False
+            return bool(rust_listed_version(api_response.json(), ver))
+    return False
+
+
+def listing_headers(language: str) -> dict:
+    """
+    Headers of the request listing versions of a package.
+    The http cache matches headers, so each representation is cached apart.
+    :param language: language of the package
+    """
+    if language == "javascript":
+        return {"Accept": f"{NPM_ABBREVIATED}; q=1.0, application/json; q=0.8, */*"}
+    return {}
+
+
+def is_abbreviated(api_response: Response) -> bool:
+    """
+    Check if an npm packument is in the abbreviated install format
+    :param api_response: registry response used to list versions
+    """
+    content_type = api_response.headers.get("content-type", "")
+    return content_type.startswith(NPM_ABBREVIATED)
+
+
 def default_versions(api_response, language):
     """Default API query structure for obtaining versions"""
     queries = REGISTRY[language]
@@ -289,6 +570,8 @@ def js_versions(api_response: Response) -> list:
     :param api_response: registry response
     :return: list of versions
     """
+    if is_abbreviated(api_response):
+        run_stats.record("npm_abbreviated_listings")
     return default_versions(api_response, "javascript")
 
 
@@ -298,6 +581,10 @@ def py_versions(api_response: Response) -> list:
     :param api_response: registry response
     :return: list of versions
     """
+    if registry_mode("python"):
+        if api_response.status_code != 200:
+            return []
+        return simple_versions(api_response.json())
     return default_versions(api_response, "python")
 
 
@@ -316,7 +603,7 @@ def php_versions(api_response: Response) -> list:
     :param api_response: registry response
     :return: list of versions
     """
-    return default_versions(api_response, "php")
+    return list(php_package(api_response))
 
 
 def handle_lax_specifier(all_constraints: list[str]) -> list[SpecifierSet]:
@@ -339,12 +626,49 @@ def handle_lax_specifier(all_constraints: list[str]) -> list[SpecifierSet]:
 
 def fix_constraint(language: str, reqs: str) -> list[SpecifierSet]:
     """
-    Fixes requirement string to be parsed by python requirements
+    Fixes requirement string to be parsed by python requirements.
+    Compiled constraints are kept in a bounded LRU cache for the whole run.
+    :param language: language of source code
+    :param reqs: requirement info associated with package
+    """
+    return list(compiled_constraint(language, reqs.strip()))
+
+
+@lru_cache(maxsize=CONSTRAINT_CACHE_SIZE)
+def compiled_constraint(language: str, reqs: str) -> Tuple[SpecifierSet, ...]:
+    """
+    Specifier sets of a stripped requirement string, compiled once
+    :param language: language of source code
+    :param reqs: requirement info associated with package
+    """
+    return tuple(compile_constraint(language, reqs))
+
+
+run_stats.track_cache("constraint_cache", compiled_constraint)
+
+
+def clear_constraint_cache() -> None:
+    """
+    Drops every compiled constraint
+    """
+    run_stats.clear_cache("constraint_cache")
+
+
+def compile_constraint(language: str, reqs: str) -> list[SpecifierSet]:
+    """
+    Converts a requirement string to specifier sets, bypassing the cache
     :param language: language of source code
     :param reqs: requirement info associated with package
     """
     all_constraints = []
     fixed_constraint = reqs.strip()
+    if language in SEMVER_LANGUAGES:
+        # https://docs.npmjs.com/cli/v8/configuring-npm/package-json#dependencies
+        # https://getcomposer.org/doc/articles/versions.md#writing-version-constraints
+        # https://doc.rust-lang.org/cargo/reference/specifying-dependencies.html
+        if fixed_constraint == "latest":
+            fixed_constraint = ""
+        return list(compile_range(language, fixed_constraint))
     if fixed_constraint in ("latest", "*", "") or not fixed_constraint:
         return [SpecifierSet()]
     match language:
@@ -357,77 +681,15 @@ def fix_constraint(language: str, reqs: str) -> list[SpecifierSet]:
                     ]
                 )
             ]
-        case "javascript":
-            # JS supports * or x as a direct major ver wildcard
-            # https://docs.npmjs.com/cli/v8/configuring-npm/package-json#dependencies
-            # handle logical or
-            for sub_constraint in fixed_constraint.split("||"):
-                sub_constraint = ",".join(
-                    [
-                        fix_constraint_js(constraint)
-                        for constraint in sub_constraint.split(",")
-                    ]
-                )
-                all_constraints.append(sub_constraint)
         case "go":
             # https://go.dev/ref/mod#go-mod-file-require
             all_constraints = [">=" + fixed_constraint]
         case "cs":
             # https://docs.microsoft.com/en-us/nuget/concepts/package-versioning#version-ranges
             all_constraints = [fix_constraint_cs(fixed_constraint)]
-        case "php":
-            # https://getcomposer.org/doc/articles/versions.md#writing-version-constraints
-            # handle logical or
-            for sub_constraint in fixed_constraint.replace("||", "|").split("|"):
-                sub_constraint = ",".join(
-                    [
-                        fix_constraint_php(constraint)
-                        for constraint in sub_constraint.split(",")
-                    ]
-                )
-                all_constraints.append(sub_constraint)
-        case "rust":
-            # https://doc.rust-lang.org/cargo/reference/specifying-dependencies.html
-            all_constraints = [
-                ",".join(
-                    [
-                        fix_constraint_rust(constraint)
-                        for constraint in fixed_constraint.split(",")
-                    ]
-                )
-            ]
     return handle_lax_specifier(all_constraints)
 
 
-def fix_constraint_rust(fixed_constraint: str) -> str:
-    """Rust version constrains to Python"""
-    # Default works like caret
-    if "*" not in fixed_constraint:
-        if "~" in fixed_constraint:
-            fixed_constraint = handle_tilde(fixed_constraint)
-        elif fixed_constraint[:1].isalnum():
-            fixed_constraint = "^" + fixed_constraint
-        if "^" in fixed_constraint:
-            fixed_constraint = handle_caret(fixed_constraint)
-    return fixed_constraint
-
-
-def fix_constraint_php(sub_constraint: str) -> str:
-    """PHP version constrains to Python"""
-    sub_constraint = sub_constraint.strip()
-    # range constraints alternative
-    if " - " in sub_constraint:
-        sub_constraint = sub_constraint.split(" - ", 1)
-        sub_constraint = f">={sub_constraint[0]}, <={sub_constraint[1]}"
-    if "^" in sub_constraint:
-        sub_constraint = handle_caret(sub_constraint)
-    if "~" in sub_constraint:
-        sub_constraint = handle_tilde(sub_constraint, True)
-    # handle remaining logical ands
-    sub_constraint = re.sub(r"(\s)+(?!\w)", ",", sub_constraint)
-    return sub_constraint
-
-
 def fix_constraint_cs(fixed_constraint: str) -> str:
     """C# version constrains to Python"""
     if fixed_constraint[0] == "(":
@@ -469,26 +731,6 @@ def fix_constraint_cs(fixed_constraint: str) -> str:
     return fixed_constraint
 
 
-def fix_constraint_js(sub_constraint: str) -> str:
-    """JavaScript version constrains to Python"""
-    # JavaScript uses `x` as its wildcard character.
-    # Replacing '.x' with '.*' should be fine, as `package=x` isn't valid
-    # (use `package=*` for that), and for cases like `1.2.3-pre.x`, i think
-    # it's fine to have it replaced with `1.2.3-pre.*`.
-    sub_constraint = sub_constraint.strip().replace(".x", ".*")
-    if "^" in sub_constraint:
-        sub_constraint = handle_caret(sub_constraint)
-    if "~" in sub_constraint:
-        sub_constraint = handle_tilde(sub_constraint)
-    # range constraints alternative
-    if " - " in sub_constraint:
-        sub_constraint = sub_constraint.split(" - ", 1)
-        sub_constraint = f">={sub_constraint[0]}, <={sub_constraint[1]}"
-    # handle remaining logical ands
-    sub_constraint = re.sub(r"(\s)+(?!\w)", ",", sub_constraint)
-    return sub_constraint
-
-
 def fix_constraint_py(fixed_constraint: str) -> str:
     """Python non standard version constrains handling"""
     # handle poetry spec of tilde requirements
@@ -501,6 +743,28 @@ def fix_constraint_py(fixed_constraint: str) -> str:
     return fixed_constraint
 
 
+@lru_cache(maxsize=VERSION_INDEX_SIZE)
+def version_index(vers: Tuple[str, ...]) -> Tuple[Tuple[Version | str, str], ...]:
+    """
+    Versions of a package parsed once and sorted newest first.
+    Unparsable versions are kept as strings and sort first, as with try_version.
+    :param vers: all available versions
+    :return: parsed and original version strings in order of preference
+    """
+    parsed: List[Tuple[Version | str, str]] = []
+    for ver in vers:
+        try:
+            parsed.append((Version(ver), ver))
+        except InvalidVersion:
+            parsed.append((ver, ver))
+    # stable sort keeps the listing order among equal versions
+    parsed.sort(
+        key=lambda item: item[0] if isinstance(item[0], Version) else INVALID_VERSION,
+        reverse=True,
+    )
+    return tuple(parsed)
+
+
 def resolve_version(vers: List[str], reqs: List[SpecifierSet] = None) -> Optional[str]:
     """
     Returns latest suitable version from available metadata
@@ -508,19 +772,61 @@ def resolve_version(vers: List[str], reqs: List[SpecifierSet] = None) -> Optiona
     :param reqs: requirement info associated with package
     :return: specific version to query defaults to latest
     """
-    compatible_vers = vers
-    or_compatible = []
-    for req in reqs:
-        or_compatible.extend([ver for ver in compatible_vers if req.contains(ver)])
-    if or_compatible:
-        sorted_vers = sorted(
-            or_compatible,
-            key=try_version,
-            reverse=True,
-        )
-        return sorted_vers[0]
-    else:
+    if is_semver(reqs):
+        return resolve_semver(vers, reqs)
+    for parsed, ver in version_index(tuple(vers)):
+        if any(req.contains(parsed) for req in reqs):
+            return ver
+    return None
+
+
+def pinned_version(reqs: List[SpecifierSet]) -> Optional[str]:
+    """
+    Returns the version an exact pin refers to
+    :param reqs: requirement info obtained from fix_constraint
+    :return: pinned version, None if constraints allow a range of versions
+    """
+    if len(reqs) != 1 or len(reqs[0]) != 1:
         return None
+    spec = next(iter(reqs[0]))
+    if spec.operator in ("==", "===") and not spec.version.endswith(".*"):
+        return spec.version
+    return None
+
+
+def canonical_name(language: str, name: str) -> str:
+    """
+    Name under which the registry of a language treats packages as identical
+    :param language: language of the package
+    :param name: package name as found in a dependency list
+    """
+    name = name.strip()
+    match language:
+        case "python":
+            # https://peps.python.org/pep-0503/#normalized-names
+            # a package requested with extras lists more dependencies
+            name, extras = split_extras(name)
+            name = re.sub(r"[-_.]+", "-", name).lower()
+            return name + "[" + ",".join(extras) + "]" if extras else name
+        case "rust":
+            # crates.io refuses names differing only in case, - or _
+            return name.lower().replace("_", "-")
+        case "php" | "cs":
+            return name.lower()
+    return name
+
+
+def canonical_entry(language: str, package_d: str) -> str:
+    """
+    Dependency entry with its name canonicalized and no-op constraints dropped
+    :param language: language of the package
+    :param package_d: package name optionally followed by ;version constraint
+    """
+    name_ver = package_d.rsplit(";", 1)
+    constraint = name_ver[1].strip() if len(name_ver) > 1 else ""
+    if constraint in ("latest", "*"):
+        constraint = ""
+    return canonical_name(language, name_ver[0]) + ";" + constraint
 
 
 def handle_caret(req: str) -> str:
@@ -563,4 +869,4 @@ def try_version(value):
     try:
         return Version(value)
     except InvalidVersion:
-        return Version("9999.9999.9999")
+        return INVALID_VERSION
@@ -0,0 +1,46 @@
+"""Packagist p2 metadata, one minified document of tagged releases per package"""
+from typing import Any, Dict, List
+
+from ..registry_mode import mode_url
+
+# marks a key removed since the previous release of a minified document
+UNSET = "__unset"
+
+
+def p2_url(package: str) -> str:
+    """
+    Metadata document of the tagged releases of a package
+    :param package: vendor/name
+    """
+    return f"{mode_url('php')}/p2/{package.lower()}.json"
+
+
+def expand_minified(entries: List[dict]) -> List[dict]:
+    """
+    Full release data from a minified list, where each release only holds
+    the keys that differ from the release before it
+    https://github.com/composer/metadata-minifier
+    :param entries: releases as served, newest first
+    """
+    expanded = []
+    current: Dict[str, Any] = {}
+    for entry in entries:
+        for key, value in entry.items():
+            if value == UNSET:
+                current.pop(key, None)
+            else:
+                current[key] = value
+        expanded.append(dict(current))
+    return expanded
+
+
+def p2_versions(data: dict) -> Dict[str, dict]:
+    """
+    Release data of the package of a p2 document by version, newest first
+    :param data: parsed p2 document
+    """
+    for entries in (data.get("packages") or {}).values():
+        if data.get("minified"):
+            entries = expand_minified(entries)
+        return {entry["version"]: entry for entry in entries if "version" in entry}
+    return {}
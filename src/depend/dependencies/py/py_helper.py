@@ -1,12 +1,135 @@
 """Helper functions for Python Dependencies"""
+import re
 from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 import packaging
 import packaging.specifiers
-from pkg_resources import parse_requirements
+from packaging.markers import default_environment
+from pkg_resources import Requirement, parse_requirements
 
 from depend.dependencies.dep_types import Result
 
+# sys.platform values mapped to platform.system() and os.name
+PLATFORMS = {
+    "linux": ("Linux", "posix"),
+    "win32": ("Windows", "nt"),
+    "cygwin": ("CYGWIN_NT", "posix"),
+    "darwin": ("Darwin", "posix"),
+    "freebsd": ("FreeBSD", "posix"),
+}
+# name and extras of a package requested as name[extra,...]
+EXTRAS_PATTERN = re.compile(r"^\s*([^\[\s]+)\s*(?:\[([^\]]*)\])?\s*$")
+# PEP 508 environment markers are evaluated against, None to keep every dependency,
+# and extras of the root packages
+_target: Dict[str, Any] = {"environment": None, "extras": ()}
+
+
+def set_target_environment(
+    python_version: Optional[str] = None,
+    platform: Optional[str] = None,
+    extras: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Configure the environment markers of dependencies are evaluated against.
+    Fields not given default to the running interpreter, and markers are not
+    evaluated at all if nothing is given.
+    :param python_version: target python version such as 3.8 or 3.8.10
+    :param platform: target sys.platform such as linux, win32 or darwin
+    :param extras: extras requested for the root packages and dependency files
+    """
+    extras = tuple(sorted(set(extras or ())))
+    if not python_version and not platform and not extras:
+        _target.update(environment=None, extras=())
+        return
+    environment = default_environment()
+    if python_version:
+        full_version = (python_version + ".0.0").split(".")[:3]
+        environment["python_version"] = ".".join(full_version[:2])
+        environment["python_full_version"] = ".".join(
+            python_version.split(".") if python_version.count(".") > 1 else full_version
+        )
+    if platform:
+        system, os_name = PLATFORMS.get(platform, (platform, "posix"))
+        environment["sys_platform"] = platform
+        environment["platform_system"] = system
+        environment["os_name"] = os_name
+    _target.update(environment=environment, extras=extras)
+
+
+def target_tag() -> str:
+    """
+    Short description of the target environment, empty if markers are not evaluated
+    """
+    environment = _target["environment"]
+    if environment is None:
+        return ""
+    # extras are part of the package name, so they need no tag of their own
+    return environment["python_full_version"] + "-" + environment["sys_platform"]
+
+
+def split_extras(name: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Name of a package and the extras requested with it
+    :param name: package name, optionally followed by [extra,...]
+    :return: bare name and sorted extras, lowercased
+    """
+    match = EXTRAS_PATTERN.match(name)
+    if match is None or match.group(2) is None:
+        return name.strip(), ()
+    extras = {extra.strip().lower() for extra in match.group(2).split(",")}
+    return match.group(1), tuple(sorted(filter(None, extras)))
+
+
+def with_extras(name: str, extras: Iterable[str]) -> str:
+    """
+    Package name requesting extras, on top of those it already requests
+    :param name: package name, optionally followed by [extra,...]
+    :param extras: extras to request
+    """
+    name, requested = split_extras(name)
+    extras = sorted(set(requested).union(extra.lower() for extra in extras))
+    return name + "[" + ",".join(extras) + "]" if extras else name
+
+
+def entry_with_extras(package_d: str, extras: Iterable[str]) -> str:
+    """
+    Dependency entry requesting extras for its package
+    :param package_d: package name optionally followed by ;version constraint
+    :param extras: extras to request
+    """
+    name, separator, constraint = package_d.partition(";")
+    return with_extras(name, extras) + separator + constraint
+
+
+def requirement_name(requirement: Requirement) -> str:
+    """
+    Name of a requirement as listed in dependencies, carrying the extras it requests
+    :param requirement: parsed requirement
+    """
+    return with_extras(str(requirement.key), requirement.extras)
+
+
+def marker_matches(
+    requirement: Requirement, extras: Optional[Iterable[str]] = None
+) -> bool:
+    """
+    Check if a requirement applies to the target environment
+    :param requirement: parsed requirement, possibly with a PEP 508 marker
+    :param extras: extras requested for the package listing the requirement,
+        those of the root packages if not given
+    """
+    environment = _target["environment"]
+    if environment is None or requirement.marker is None:
+        return True
+    if extras is None:
+        extras = _target["extras"]
+    # base requirements hold for any extra, so no extra means the empty one
+    return any(
+        requirement.marker.evaluate({**environment, "extra": extra})
+        for extra in tuple(extras) or ("",)
+    )
+
 
 def handle_requirements_txt(req_file_data) -> Result:
     """
@@ -27,15 +150,24 @@ def handle_requirements_txt(req_file_data) -> Result:
     return res
 
 
-def get_py_dep_from_iterable(api_depend):
+def get_py_dep_from_iterable(api_depend, extras: Optional[Iterable[str]] = None):
+    """
+    Dependencies applying to the target environment, each carrying the extras
+    it requests as in name[extra];spec
+    :param api_depend: requirement strings
+    :param extras: extras requested for the package, those of the root packages
+        if not given
+    """
     if not api_depend:
         return []
     install_reqs = parse_requirements(api_depend)
     ir: packaging.specifiers.SpecifierSet
     pkg_dep = []
     for ir in install_reqs:
+        if not marker_matches(ir, extras):
+            continue
         if not ir.specs:
-            pkg_dep.append(str(ir.key) + ";" + "latest")
+            pkg_dep.append(requirement_name(ir) + ";" + "latest")
         else:
-            pkg_dep.append(str(ir.key) + ";" + str(ir.specifier))
+            pkg_dep.append(requirement_name(ir) + ";" + str(ir.specifier))
     return pkg_dep
@@ -0,0 +1,98 @@
+"""PyPI Simple JSON API (PEP 691) and core metadata files (PEP 658)"""
+from email.parser import HeaderParser
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    canonicalize_name,
+    canonicalize_version,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+
+from ..registry_mode import mode_url
+
+SIMPLE_FORMAT = "application/vnd.pypi.simple.v1+json"
+
+
+def simple_url(package: str) -> str:
+    """
+    Project page of a package on the Simple API, JSON requested through the
+    format query parameter so cached responses need no Accept header
+    :param package: as imported
+    """
+    return f"{mode_url('python')}/{canonicalize_name(package)}/?format={SIMPLE_FORMAT}"
+
+
+def file_version(filename: str) -> Optional[str]:
+    """
+    Version of a distribution file from its name
+    :param filename: wheel or sdist filename
+    :return: normalized version, None if the name can not be parsed
+    """
+    try:
+        if filename.endswith(".whl"):
+            version = parse_wheel_filename(filename)[1]
+        else:
+            version = parse_sdist_filename(filename)[1]
+    except (InvalidWheelFilename, InvalidSdistFilename):
+        return None
+    return str(version)
+
+
+def simple_versions(data: dict) -> List[str]:
+    """
+    Versions listed on a project page, from its files for API versions before 1.1
+    :param data: parsed project page
+    """
+    if data.get("versions"):
+        return list(data["versions"])
+    versions = []
+    for file in data.get("files", []):
+        version = file_version(file["filename"])
+        if version is not None and version not in versions:
+            versions.append(version)
+    return versions
+
+
+def metadata_file(data: dict, ver: str, page_url: str) -> Optional[str]:
+    """
+    Url of the core metadata file of a version, preferring wheels and unyanked files
+    :param data: parsed project page
+    :param ver: version to look for
+    :param page_url: url of the project page, file urls may be relative to it
+    :return: url of the .metadata file, None if no file of the version has one
+    """
+    wanted = canonicalize_version(ver)
+    candidates = [
+        file
+        for file in data.get("files", [])
+        if canonicalize_version(file_version(file["filename"]) or "") == wanted
+        and (file.get("core-metadata") or file.get("dist-info-metadata"))
+    ]
+    if not candidates:
+        return None
+    candidates.sort(
+        key=lambda file: (
+            bool(file.get("yanked")),
+            not file["filename"].endswith(".whl"),
+        )
+    )
+    return urljoin(page_url, candidates[0]["url"]) + ".metadata"
+
+
+def parse_core_metadata(text: str) -> Dict[str, Any]:
+    """
+    Fields of a core metadata file named as in the JSON API info object
+    :param text: content of a METADATA or PKG-INFO file
+    """
+    message = HeaderParser().parsestr(text)
+    return {
+        "name": message.get("Name", ""),
+        "version": message.get("Version", ""),
+        "license": message.get("License-Expression") or message.get("License"),
+        "requires_dist": message.get_all("Requires-Dist") or [],
+        "home_page": message.get("Home-page", ""),
+    }
@@ -7,6 +7,7 @@ import toml
 from pkg_resources import parse_requirements
 
 from ..dep_types import Result
+from .py_helper import marker_matches, requirement_name
 from .setup_reader import LaxSetupReader, handle_classifiers
 
 
@@ -64,7 +65,10 @@ def handle_toml(file_data: str) -> Result:
             install_reqs = parse_requirements("\n".join(package_dep))
             ir: packaging.specifiers.SpecifierSet
             for ir in install_reqs:
-                res["pkg_dep"].append(str(ir.key) + ";" + str(ir.specifier))
+                if marker_matches(ir):
+                    res["pkg_dep"].append(
+                        requirement_name(ir) + ";" + str(ir.specifier)
+                    )
     res["pkg_name"] = package_data.get("name", "")
     res["pkg_ver"] = package_data.get("version", "")
     res["pkg_lic"] = [package_data.get("license", "Other")]
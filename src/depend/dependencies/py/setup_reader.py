@@ -4,20 +4,19 @@ https://github.com/python-poetry/poetry/blob/master/src/poetry/utils/setup_reade
 """
 
 import ast
+import base64
 import logging
 import re
 from configparser import ConfigParser
 from datetime import datetime
 from typing import Any, Iterable, List, Match, Optional, Union
 
-import github
-from github.ContentFile import ContentFile
 from poetry.core.semver import Version, exceptions
 from poetry.utils.setup_reader import SetupReader
 
 from depend.dependencies.dep_types import Result
 from depend.dependencies.py.py_helper import handle_requirements_txt
-from depend.handle_env import get_github
+from depend.error import VCSDeferredError
 
 
 def find_github(text: str) -> Match[str] | None:
@@ -90,19 +89,28 @@ class LaxSetupReader(SetupReader):
             res["lang_ver"] = lang_ver.split(",")
         pkg_dep = self._find_install_requires(setup_call, body)
         if isinstance(pkg_dep, str) and repo_identifier:
-            g = get_github()
             logging.info("Repo: %s", repo_identifier.groups())
-            repo = g.get_repo(repo_identifier.group(1) + "/" + repo_identifier.group(2))
-            commit_branch_tag = repo_identifier.group(3) or repo.default_branch
+            repo_name = repo_identifier.group(1) + "/" + repo_identifier.group(2)
+            # the store github_get revalidates against imports this module
+            from depend.vcs.github_api import github_get
+
             try:
-                repo_file_content = repo.get_contents(pkg_dep, ref=commit_branch_tag)
-                if isinstance(repo_file_content, ContentFile):
-                    dep_file = repo_file_content.decoded_content.decode()
-                    res["pkg_dep"] = handle_requirements_txt(dep_file).get(
-                        "pkg_dep", []
-                    )
-            except github.GithubException as e:
-                logging.error(e)
+                repo = github_get(f"/repos/{repo_name}") or {}
+                commit_branch_tag = repo_identifier.group(3) or repo.get(
+                    "default_branch", ""
+                )
+                repo_file_content = github_get(
+                    f"/repos/{repo_name}/contents/{pkg_dep}?ref={commit_branch_tag}"
+                )
+            except VCSDeferredError as e:
+                logging.warning(e.msg)
+                res["pkg_err"]["vcs"] = e.msg
+                repo_file_content = None
+            if isinstance(repo_file_content, dict) and repo_file_content.get("content"):
+                dep_file = base64.b64decode(repo_file_content["content"]).decode()
+                res["pkg_dep"] = handle_requirements_txt(dep_file).get("pkg_dep", [])
+            else:
+                logging.error(f"{pkg_dep} cannot be read from {repo_name}")
         else:
             res["pkg_dep"] = handle_requirements_txt("\n".join(pkg_dep)).get(
                 "pkg_dep", {}
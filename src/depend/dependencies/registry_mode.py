@@ -0,0 +1,42 @@
+"""Registry protocols read instead of the default registry API of a language"""
+from typing import Dict, Optional
+
+from depend.constants import REGISTRY
+
+# root each language in registry mode reads from
+_modes: Dict[str, str] = {}
+
+
+def set_registry_mode(
+    language: str, enabled: bool = False, url: Optional[str] = None
+) -> None:
+    """
+    Read packages of a language through a leaner protocol than its registry API:
+    the Simple API and core metadata files for python, the sparse index for rust
+    with licenses left to crates.io, a module proxy for go instead of scraping
+    pkg.go.dev and p2 metadata documents for php
+    :param language: python, rust, go or php
+    :param enabled: registry mode is used if true
+    :param url: root of the protocol, mode_url of the language if not given,
+        file:// urls read a go proxy laid out on disk
+    """
+    if enabled:
+        _modes[language] = (url or REGISTRY[language]["mode_url"]).rstrip("/")
+    else:
+        _modes.pop(language, None)
+
+
+def registry_mode(language: str) -> bool:
+    """
+    Check if packages of a language are read in registry mode
+    :param language: language of the package
+    """
+    return language in _modes
+
+
+def mode_url(language: str) -> str:
+    """
+    Root the registry mode of a language reads from
+    :param language: python, rust, go or php
+    """
+    return _modes.get(language, REGISTRY[language]["mode_url"])
@@ -0,0 +1,45 @@
+"""crates.io sparse index, one newline delimited JSON file per crate"""
+import json
+from typing import List
+
+from ..registry_mode import mode_url
+
+
+def sparse_url(crate: str) -> str:
+    """
+    Index file of a crate, placed by the length of its name
+    https://doc.rust-lang.org/cargo/reference/registry-index.html#index-files
+    :param crate: crate name
+    """
+    name = crate.lower()
+    if len(name) <= 2:
+        prefix = str(len(name))
+    elif len(name) == 3:
+        prefix = "3/" + name[0]
+    else:
+        prefix = name[:2] + "/" + name[2:4]
+    return f"{mode_url('rust')}/{prefix}/{name}"
+
+
+def sparse_entries(text: str) -> List[dict]:
+    """
+    Every published version of a crate, oldest first
+    :param text: content of the index file
+    """
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def sparse_dependencies(entries: List[dict], ver: str) -> List[str]:
+    """
+    Dependencies of a version as name;requirement, like the crates.io API
+    :param entries: parsed index file
+    :param ver: version to look for
+    """
+    for entry in entries:
+        if entry.get("vers") == ver:
+            # renamed dependencies name the crate in package
+            return [
+                (dep.get("package") or dep["name"]) + ";" + dep["req"]
+                for dep in entry.get("deps", [])
+            ]
+    return []
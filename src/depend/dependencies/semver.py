@@ -0,0 +1,327 @@
+"""Native parser and matcher of npm, Cargo and Composer version ranges"""
+import logging
+import operator
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from packaging.specifiers import InvalidSpecifier, Specifier, SpecifierSet
+
+# ecosystems whose constraints are semver ranges
+SEMVER_LANGUAGES = ("javascript", "rust", "php")
+# number of parsed versions and version lists kept in memory
+SEMVER_CACHE_SIZE = 65536
+SEMVER_INDEX_SIZE = 1024
+# major, minor, patch and the fourth component Composer allows
+RELEASE_SIZE = 4
+
+# release components, 1 if not a pre-release, pre-release identifiers
+SemVer = Tuple[Tuple[int, ...], int, Tuple[Tuple[int, int | str], ...]]
+Comparator = Tuple[str, SemVer]
+
+VERSION_RE = re.compile(
+    r"^v?(?P<release>(?:\d+|[xX*])(?:\.(?:\d+|[xX*])){0,3})"
+    r"(?:-?(?P<pre>[0-9A-Za-z][0-9A-Za-z.-]*))?(?:\+[0-9A-Za-z.-]*)?$"
+)
+HYPHEN_RE = re.compile(r"^\s*(\S+)\s+-\s+(\S+)\s*$")
+COMPARATOR_RE = re.compile(r"(\^|~>|~|>=|<=|!=|>|<|==?)?\s*([^\s,<>=^~!][^\s,]*)")
+STABILITY_RE = re.compile(r"@(dev|alpha|beta|rc|stable)$", re.IGNORECASE)
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+# sorts below every version, "<" against it matches nothing
+LOWEST: SemVer = ((0,) * RELEASE_SIZE, 0, ())
+
+
+def _pre_key(pre: str) -> Tuple[Tuple[int, int | str], ...]:
+    """Pre-release identifiers, numeric ones sorting below alphanumeric ones"""
+    return tuple(
+        (0, int(part)) if part.isdigit() else (1, part) for part in pre.split(".")
+    )
+
+
+def _partial(text: str, language: str) -> Tuple[List[int], str, bool]:
+    """
+    Split a possibly partial version such as 1.2, 1.x or v1.2.3-rc.1
+    :param text: version as written in a range
+    :param language: language of the range
+    :return: release components given before any wildcard, pre-release
+        and whether the version ends with a wildcard
+    """
+    match = VERSION_RE.match(text.lstrip("="))
+    if match is None:
+        raise ValueError(text)
+    release = match.group("release").split(".")
+    parts = []
+    for part in release:
+        if not part.isdigit():
+            break
+        parts.append(int(part))
+    pre = match.group("pre") or ""
+    if language == "php":
+        # Composer orders stabilities dev < alpha < beta < rc regardless of case
+        pre = pre.lower()
+    return parts, pre if len(parts) >= 3 else "", len(parts) < len(release)
+
+
+def _semver(parts: List[int], pre: str = "") -> SemVer:
+    """Version key with missing release components set to zero"""
+    release = tuple(parts[:RELEASE_SIZE]) + (0,) * (RELEASE_SIZE - len(parts))
+    return (release, 0, _pre_key(pre)) if pre else (release, 1, ())
+
+
+def _bump(parts: List[int], index: int, ceiling: bool = True) -> SemVer:
+    """
+    Next release after every version sharing the first index + 1 components
+    :param parts: release components
+    :param index: last component kept, it is incremented
+    :param ceiling: sort below the pre-releases of the next release as well,
+        as upper bounds exclude them
+    """
+    release, _, _ = _semver(parts[:index] + [parts[index] + 1])
+    return (release, 0, ()) if ceiling else (release, 1, ())
+
+
+@lru_cache(maxsize=SEMVER_CACHE_SIZE)
+def parse_semver(text: str) -> Optional[SemVer]:
+    """
+    Parse a published version, leniently as registries list them
+    :param text: version such as 1.2.3, v1.2.3-beta.1 or 1.0.0.0
+    :return: version key ordered by semver precedence, None if not a version
+    """
+    match = VERSION_RE.match(text.strip())
+    if match is None or not match.group("release").replace(".", "").isdigit():
+        return None
+    parts = [int(part) for part in match.group("release").split(".")]
+    return _semver(parts, match.group("pre") or "")
+
+
+def _text(key: SemVer) -> str:
+    """Version string of a key, for PEP 440 rendering"""
+    release, _, pre = key
+    text = ".".join(str(part) for part in release[: 3 if not release[3] else 4])
+    if pre:
+        text += "-" + ".".join(str(part) for _, part in pre)
+    return text
+
+
+def _term(language: str, op: str, operand: str) -> Tuple[List[Comparator], List[str]]:
+    """
+    Desugar a single comparator into primitive ones
+    :param language: language of the range
+    :param op: operator as written, empty for a bare version
+    :param operand: possibly partial version
+    :return: primitive comparators and their closest PEP 440 rendering
+    """
+    parts, pre, wildcard = _partial(operand, language)
+    count = len(parts)
+    if not op or op == "==":
+        # bare versions are caret requirements in Cargo, unless a wildcard
+        op = "^" if not op and language == "rust" and not wildcard else "="
+    if op == "~>":
+        op = "~"
+    if not count:
+        if op in ("<", ">", "!="):
+            return [("<", LOWEST)], ["<0"]
+        return [], []
+    lower = _semver(parts, pre)
+    rendered = None
+    if op == "^":
+        nonzero = [i for i, part in enumerate(parts[:3]) if part]
+        upper = _bump(parts, nonzero[0] if nonzero else min(count, 3) - 1)
+        comparators = [(">=", lower), ("<", upper)]
+    elif op == "~":
+        if language == "php":
+            # Composer bumps the second to last component given
+            index = max(count - 2, 0)
+        else:
+            index = 1 if count >= 2 else 0
+        comparators = [(">=", lower), ("<", _bump(parts, index))]
+    elif op == "=" and count >= 3:
+        comparators = [("==", lower)]
+        rendered = ["==" + operand.lstrip("=v")]
+    elif op == "=":
+        comparators = [(">=", lower), ("<", _bump(parts, count - 1))]
+        rendered = ["==" + ".".join(map(str, parts)) + ".*"]
+    elif op in (">", "<=") and count < 3:
+        bumped = _bump(parts, count - 1, ceiling=op != ">")
+        comparators = [(">=" if op == ">" else "<", bumped)]
+    elif op == "!=" and count < 3:
+        raise ValueError(operand)
+    elif op == "<" and count < 3:
+        # partial upper bounds exclude pre-releases of the release they name
+        comparators = [(op, (lower[0], 0, ()))]
+    else:
+        comparators = [(op, lower)]
+    if language == "php":
+        # Composer bounds such as >=1.2 and <2.0 stand for 1.2.0.0-dev and 2.0.0.0-dev
+        comparators = [
+            (op, (key[0], 0, ()) if op in (">=", "<") and key[1] else key)
+            for op, key in comparators
+        ]
+    return comparators, rendered or [op + _text(key) for op, key in comparators]
+
+
+def _hyphen(language: str, low: str, high: str) -> Tuple[List[Comparator], List[str]]:
+    """Desugar an inclusive hyphen range such as 1.2.3 - 2.3"""
+    comparators, rendered = _term(language, ">=", low)
+    parts, pre, _ = _partial(high, language)
+    if len(parts) >= 3:
+        upper = [("<=", _semver(parts, pre))]
+    elif parts:
+        upper = [("<", _bump(parts, len(parts) - 1))]
+    else:
+        upper = []
+    return comparators + upper, rendered + [op + _text(key) for op, key in upper]
+
+
+class SemverRange(SpecifierSet):
+    """
+    Set of comparators that must all match, matched with semver precedence.
+    A pre-release only matches if a comparator of the set has a pre-release
+    of the same release, unless the range opts into lower stabilities.
+    For display, equality and pinned_version it behaves as the closest
+    PEP 440 specifier set, comparators without a PEP 440 form are left out.
+    """
+
+    def __init__(
+        self,
+        comparators: Iterable[Comparator] = (),
+        rendered: Iterable[str] = (),
+        unstable: bool = False,
+    ):
+        """
+        :param comparators: primitive comparators of the range
+        :param rendered: PEP 440 rendering of the comparators
+        :param unstable: pre-releases match without a matching comparator
+        """
+        specifiers = []
+        for spec in rendered:
+            try:
+                specifiers.append(str(Specifier(spec)))
+            except InvalidSpecifier:
+                continue
+        super().__init__(",".join(specifiers))
+        self.comparators = tuple(comparators)
+        self.unstable = unstable
+        uppers = [bound for op, bound in self.comparators if op in ("<", "<=", "==")]
+        # no version above it matches, None if the range is unbounded
+        self.ceiling = min(uppers) if uppers else None
+
+    def matches(self, key: SemVer) -> bool:
+        """
+        Check if a parsed version is in the range
+        :param key: version key from parse_semver
+        """
+        for op, bound in self.comparators:
+            if not COMPARISONS[op](key, bound):
+                return False
+        if key[1] or self.unstable:
+            return True
+        return any(bound[2] and bound[0] == key[0] for _, bound in self.comparators)
+
+    def contains(self, item, prereleases=None, installed=None) -> bool:
+        """
+        Check if a version is in the range
+        :param item: version string or packaging Version
+        """
+        key = parse_semver(str(item))
+        return key is not None and self.matches(key)
+
+
+def _compile_set(language: str, constraint: str) -> SemverRange:
+    """Compile one side of a logical or"""
+    unstable = False
+    comparators: List[Comparator] = []
+    rendered: List[str] = []
+    constraint = constraint.replace(",", " ")
+    if language == "php":
+        flag = STABILITY_RE.search(constraint)
+        unstable = flag is not None and flag.group(1).lower() != "stable"
+        constraint = re.sub(r"@\w+", "", constraint)
+    hyphen = HYPHEN_RE.match(constraint)
+    if hyphen:
+        comparators, rendered = _hyphen(language, *hyphen.groups())
+    else:
+        for op, operand in COMPARATOR_RE.findall(constraint):
+            term_comparators, term_rendered = _term(language, op, operand)
+            comparators += term_comparators
+            rendered += term_rendered
+    return SemverRange(comparators, rendered, unstable)
+
+
+def compile_range(language: str, constraint: str) -> Tuple[SemverRange, ...]:
+    """
+    Compile an npm, Cargo or Composer range
+    :param language: language of the range
+    :param constraint: range as written in the manifest
+    :return: comparator sets, a version matches the range if any set matches
+    """
+    if language == "php":
+        alternatives = constraint.replace("||", "|").split("|")
+    elif language == "javascript":
+        alternatives = constraint.split("||")
+    else:
+        alternatives = [constraint]
+    ranges = []
+    for alternative in alternatives:
+        try:
+            ranges.append(_compile_set(language, alternative))
+        except ValueError:
+            logging.warning(f"Failed to resolve version specification '{alternative}'")
+            # an alternative that can not be read matches no version
+            ranges.append(SemverRange([("<", LOWEST)], ["<0"]))
+    return tuple(ranges)
+
+
+@lru_cache(maxsize=SEMVER_INDEX_SIZE)
+def semver_index(vers: Tuple[str, ...]) -> Tuple[Tuple[SemVer, str], ...]:
+    """
+    Versions of a package parsed once and sorted newest first by semver precedence.
+    Versions that are not semver are left out.
+    :param vers: all available versions
+    :return: version keys and original version strings in order of preference
+    """
+    parsed = []
+    for ver in vers:
+        key = parse_semver(ver)
+        if key is not None:
+            parsed.append((key, ver))
+    # stable sort keeps the listing order among equal versions
+    parsed.sort(key=lambda item: item[0], reverse=True)
+    return tuple(parsed)
+
+
+def is_semver(reqs: Optional[List[SpecifierSet]]) -> bool:
+    """
+    Check if requirement info was compiled by compile_range
+    :param reqs: requirement info obtained from fix_constraint
+    """
+    return bool(reqs) and all(isinstance(req, SemverRange) for req in reqs)
+
+
+def resolve_semver(vers: List[str], reqs: List[SemverRange]) -> Optional[str]:
+    """
+    Latest version in any of the ranges
+    :param vers: list of all available versions
+    :param reqs: comparator sets obtained from compile_range
+    :return: matching version, None if nothing matches
+    """
+    index = semver_index(tuple(vers))
+    start = 0
+    ceilings = [req.ceiling for req in reqs]
+    if None not in ceilings:
+        # versions above every upper bound are skipped, they are a prefix of the index
+        ceiling = max(ceilings)
+        start = bisect_left(index, True, key=lambda item: item[0] <= ceiling)
+    for i in range(start, len(index)):
+        key, ver = index[i]
+        if any(req.matches(key) for req in reqs):
+            return ver
+    return None
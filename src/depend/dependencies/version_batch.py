@@ -0,0 +1,294 @@
+"""Batch resolution of many constraints against one version list, using NumPy"""
+import operator
+from typing import Dict, List, Optional, Tuple
+
+from packaging.specifiers import Specifier, SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from .helper import resolve_version, version_index
+from .semver import SemVer, SemverRange, is_semver, semver_index
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# release components encoded, longer releases are always confirmed one by one
+RELEASE_SIZE = 4
+# columns: epoch, release, pre-release kind and number, post and dev
+KEY_SIZE = RELEASE_SIZE + 5
+# columns of semver keys: release and whether the version is stable
+SEMVER_KEY_SIZE = RELEASE_SIZE + 1
+PRE_KINDS = {"a": 0, "b": 1, "rc": 2}
+NO_PRE, DEV_ONLY = 3, -1
+KEY_LIMIT = 2**62
+COMPARISONS = {
+    "==": operator.eq,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+# comparisons of the release and stability of a version with a semver bound,
+# versions equal on both have to be confirmed on their pre-release
+SEMVER_COMPARISONS = {
+    "==": operator.eq,
+    ">=": operator.ge,
+    ">": operator.ge,
+    "<=": operator.le,
+    "<": operator.le,
+}
+
+
+def compare_keys(keys: np.ndarray, key: Tuple[int, ...]) -> np.ndarray:
+    """
+    Sign of the comparison of every encoded version with a key
+    :param keys: encoded versions, one per row
+    :param key: encoded version
+    :return: array of -1, 0 and 1
+    """
+    diff = np.sign(keys - np.array(key, dtype=np.int64))
+    first = (diff != 0).argmax(axis=1)
+    return diff[np.arange(len(diff)), first]
+
+
+def encode_semver(key: SemVer) -> Optional[Tuple[int, ...]]:
+    """
+    Integer key of the release and stability of a semver version,
+    pre-release identifiers are left to SemverRange.matches
+    :param key: version key from parse_semver
+    :return: key, None if a component does not fit in the key
+    """
+    release, stable, _ = key
+    encoded = (*release, stable)
+    if max(encoded) > KEY_LIMIT:
+        return None
+    return encoded
+
+
+def encode_version(version: Version) -> Optional[Tuple[int, ...]]:
+    """
+    Integer key ordered like PEP 440, local versions ignored
+    :param version: parsed version
+    :return: key, None if the version does not fit in the key
+    """
+    release = version.release
+    if len(release) > RELEASE_SIZE:
+        return None
+    if version.pre is not None:
+        pre = (PRE_KINDS[version.pre[0]], version.pre[1])
+    elif version.post is None and version.dev is not None:
+        pre = (DEV_ONLY, 0)
+    else:
+        pre = (NO_PRE, 0)
+    post = -1 if version.post is None else version.post
+    dev = KEY_LIMIT if version.dev is None else version.dev
+    key = (
+        version.epoch,
+        *release,
+        *[0] * (RELEASE_SIZE - len(release)),
+        *pre,
+        post,
+        dev,
+    )
+    if max(key) > KEY_LIMIT:
+        return None
+    return key
+
+
+class VersionArray:
+    """
+    Version list of a package encoded once into integer arrays, newest first.
+    Every specifier is translated into a mask that is a superset of the
+    versions it accepts, and the newest candidates are confirmed with
+    SpecifierSet.contains so results are identical to resolve_version.
+    Pre-release rules differ across packaging releases and are left to it.
+    """
+
+    def __init__(self, vers: List[str]):
+        """
+        :param vers: all available versions
+        """
+        index = version_index(tuple(vers))
+        self.versions = [ver for _, ver in index]
+        self.parsed = [parsed for parsed, _ in index]
+        keys = np.zeros((len(index), KEY_SIZE), dtype=np.int64)
+        # unparsable or oversized versions are candidates for every specifier
+        self.exact = np.zeros(len(index), dtype=bool)
+        for i, parsed in enumerate(self.parsed):
+            if not isinstance(parsed, Version):
+                continue
+            key = encode_version(parsed)
+            if key is not None:
+                keys[i] = key
+                self.exact[i] = True
+        self.keys = keys
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def compare(self, key: Tuple[int, ...]) -> np.ndarray:
+        """
+        Sign of the comparison of every version with a key
+        :param key: encoded version
+        :return: array of -1, 0 and 1
+        """
+        return compare_keys(self.keys, key)
+
+    def prefix(self, version: Version, size: int) -> np.ndarray:
+        """
+        Versions sharing the epoch and first release components of a version
+        :param version: parsed version
+        :param size: number of release components to compare
+        """
+        release = version.release[:size]
+        match = self.keys[:, 0] == version.epoch
+        for i, part in enumerate(release):
+            match &= self.keys[:, 1 + i] == part
+        return match
+
+    def specifier_mask(self, spec: Specifier) -> np.ndarray:
+        """
+        Superset of the versions a single specifier accepts
+        :param spec: specifier such as >=1.2 or ==1.*
+        """
+        cached = self._masks.get(str(spec))
+        if cached is not None:
+            return cached
+        mask = np.ones(len(self.keys), dtype=bool)
+        op, target = spec.operator, spec.version
+        wildcard = op in ("==", "!=") and target.endswith(".*")
+        try:
+            version = Version(target[:-2] if wildcard else target)
+        except InvalidVersion:
+            version = None
+        key = encode_version(version) if version is not None else None
+        if key is None or op in ("!=", "==="):
+            pass
+        elif wildcard:
+            if len(version.release) <= RELEASE_SIZE:
+                mask = self.prefix(version, len(version.release))
+        elif op == "~=":
+            mask = (self.compare(key) >= 0) & self.prefix(
+                version, len(version.release) - 1
+            )
+        else:
+            mask = COMPARISONS[op](self.compare(key), 0)
+        mask = mask | ~self.exact
+        self._masks[str(spec)] = mask
+        return mask
+
+    def candidates(self, reqs: List[SpecifierSet]) -> np.ndarray:
+        """
+        Superset of the versions accepted by any of the OR-ed specifier sets
+        :param reqs: requirement info obtained from fix_constraint
+        """
+        mask = np.zeros(len(self.keys), dtype=bool)
+        for req in reqs:
+            req_mask = np.ones(len(self.keys), dtype=bool)
+            for spec in req:
+                req_mask &= self.specifier_mask(spec)
+            mask |= req_mask
+        return mask
+
+    def resolve(self, reqs: List[SpecifierSet]) -> Optional[str]:
+        """
+        Latest version accepted by the constraints, same as resolve_version
+        :param reqs: requirement info obtained from fix_constraint
+        """
+        for i in np.flatnonzero(self.candidates(reqs)):
+            if any(req.contains(self.parsed[i]) for req in reqs):
+                return self.versions[i]
+        return None
+
+
+class SemverArray:
+    """
+    Version list of an npm, Cargo or Composer package encoded once into integer
+    arrays, newest first by semver precedence. Comparators compiled from caret,
+    tilde, x and hyphen ranges are translated into masks on the release and
+    stability of every version, a superset of the versions they accept, and
+    the newest candidates are confirmed with SemverRange.matches so results
+    are identical to resolve_semver.
+    """
+
+    def __init__(self, vers: List[str]):
+        """
+        :param vers: all available versions
+        """
+        index = semver_index(tuple(vers))
+        self.versions = [ver for _, ver in index]
+        self.parsed = [key for key, _ in index]
+        keys = np.zeros((len(index), SEMVER_KEY_SIZE), dtype=np.int64)
+        # oversized versions are candidates for every comparator
+        self.exact = np.zeros(len(index), dtype=bool)
+        for i, parsed in enumerate(self.parsed):
+            key = encode_semver(parsed)
+            if key is not None:
+                keys[i] = key
+                self.exact[i] = True
+        self.keys = keys
+        self._masks: Dict[Tuple[str, SemVer], np.ndarray] = {}
+
+    def comparator_mask(self, op: str, bound: SemVer) -> np.ndarray:
+        """
+        Superset of the versions a primitive comparator accepts
+        :param op: comparison operator
+        :param bound: version key compared with
+        """
+        cached = self._masks.get((op, bound))
+        if cached is not None:
+            return cached
+        key = encode_semver(bound)
+        if key is None or op not in SEMVER_COMPARISONS:
+            mask = np.ones(len(self.keys), dtype=bool)
+        else:
+            mask = SEMVER_COMPARISONS[op](compare_keys(self.keys, key), 0)
+        mask = mask | ~self.exact
+        self._masks[(op, bound)] = mask
+        return mask
+
+    def candidates(self, reqs: List[SemverRange]) -> np.ndarray:
+        """
+        Superset of the versions accepted by any of the OR-ed ranges
+        :param reqs: comparator sets obtained from compile_range
+        """
+        mask = np.zeros(len(self.keys), dtype=bool)
+        for req in reqs:
+            req_mask = np.ones(len(self.keys), dtype=bool)
+            for op, bound in req.comparators:
+                req_mask &= self.comparator_mask(op, bound)
+            mask |= req_mask
+        return mask
+
+    def resolve(self, reqs: List[SemverRange]) -> Optional[str]:
+        """
+        Latest version in any of the ranges, same as resolve_semver
+        :param reqs: comparator sets obtained from compile_range
+        """
+        for i in np.flatnonzero(self.candidates(reqs)):
+            if any(req.matches(self.parsed[i]) for req in reqs):
+                return self.versions[i]
+        return None
+
+
+def resolve_versions(
+    vers: List[str], batch: List[List[SpecifierSet]]
+) -> List[Optional[str]]:
+    """
+    Resolve many constraints against the same version list at once.
+    PEP 440 constraints are resolved through a VersionArray and semver ranges
+    through a SemverArray, each encoded once for the whole batch.
+    Falls back to resolve_version for every constraint without NumPy.
+    :param vers: list of all available versions
+    :param batch: requirement info of every constraint, from fix_constraint
+    :return: resolved version of every constraint, None if nothing matches
+    """
+    if np is None or not vers:
+        return [resolve_version(vers, reqs) for reqs in batch]
+    arrays: Dict[bool, VersionArray | SemverArray] = {}
+    resolved = []
+    for reqs in batch:
+        semver = is_semver(reqs)
+        if semver not in arrays:
+            arrays[semver] = SemverArray(vers) if semver else VersionArray(vers)
+        resolved.append(arrays[semver].resolve(reqs))
+    return resolved
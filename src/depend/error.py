@@ -1,5 +1,6 @@
 """All custom exceptions raised by Dependency Inspector"""
 import abc
+from datetime import datetime
 
 
 class UnsupportedError(Exception):
@@ -28,6 +29,18 @@ class VCSNotSupportedError(UnsupportedError):
         super().__init__(self.msg)
 
 
+class VCSDeferredError(UnsupportedError):
+    """Raised when a VCS lookup has to wait for the rate limit to reset"""
+
+    def __init__(self, package: str, reset: float):
+        self.reset = reset
+        self.msg = (
+            f"VCS lookup of {package} deferred until "
+            f"{datetime.fromtimestamp(reset).isoformat()}, quota exhausted"
+        )
+        super().__init__(self.msg)
+
+
 class FileNotSupportedError(UnsupportedError):
     """Raised when file to be parsed is not supported"""
 
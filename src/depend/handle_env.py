@@ -2,24 +2,26 @@
 
 import logging
 import os
+import re
 
 from dotenv import load_dotenv
-from github import Github
+
+from depend.vcs.github_scheduler import GithubScheduler
 
 load_dotenv()
 
-if "GITHUB_TOKEN" in os.environ:
-    gh_token = os.environ.get("GITHUB_TOKEN")
-    if not gh_token:
-        gh_token = None
-else:
-    gh_token = None
+# GITHUB_TOKENS holds a pool of tokens separated by commas or whitespace
+gh_tokens = re.split(r"[,\s]+", os.environ.get("GITHUB_TOKENS", "").strip())
+if os.environ.get("GITHUB_TOKEN"):
+    gh_tokens.append(os.environ["GITHUB_TOKEN"])
+gh_tokens = list(dict.fromkeys(token for token in gh_tokens if token))
+if not gh_tokens:
     logging.warning("Proceeding without GitHub Authentication")
-github_object = Github(gh_token)
+github_scheduler = GithubScheduler(gh_tokens)
 
 
-def get_github():
+def get_github_scheduler() -> GithubScheduler:
     """
-    Returns an authenticated GitHub object if env variable is defined
+    Returns the scheduler rotating across every GitHub token defined
     """
-    return github_object
+    return github_scheduler
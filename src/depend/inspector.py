@@ -1,33 +1,97 @@
 """License & Version Extractor"""
+import asyncio
+import heapq
 import logging
 import re
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
 from datetime import datetime
-from typing import Any, List, Optional, Set, Tuple
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
+import httpx
 from requests import Response
 
+from depend import run_stats
+from depend.closure import record_closures, response_key, splice_closure
 from depend.constants import REGISTRY
 from depend.dep_helper import requests
 from depend.dependencies.dep_types import Result
+from depend.dependencies.go.go_proxy import (
+    file_response,
+    is_file_url,
+    proxy_url,
+    proxy_versions,
+)
 from depend.dependencies.helper import (
+    canonical_entry,
+    canonical_name,
+    core_metadata_url,
     fix_constraint,
+    go_imports_url,
     go_versions,
+    go_versions_url,
     handle_cs,
+    handle_go_proxy,
     handle_npmjs,
     handle_php,
     handle_pypi,
+    handle_pypi_metadata,
     handle_rust,
     js_versions,
+    listing_has_version,
+    listing_headers,
     nuget_versions,
     parse_dep_response,
     php_versions,
+    pinned_version,
     py_versions,
+    record_transfer,
     resolve_version,
     rust_versions,
     scrape_go,
 )
-from depend.error import LanguageNotSupportedError, VCSNotSupportedError
+from depend.dependencies.php.php_p2 import p2_url
+from depend.dependencies.py.py_helper import split_extras
+from depend.dependencies.py.py_simple import simple_url
+from depend.dependencies.registry_mode import registry_mode
+from depend.dependencies.rust.rust_sparse import sparse_url
+from depend.dependencies.version_batch import resolve_versions
+from depend.error import (
+    LanguageNotSupportedError,
+    VCSDeferredError,
+    VCSNotSupportedError,
+)
+from depend.handle_env import get_github_scheduler
+from depend.store import metadata_store
+from depend.vcs.git_mirror import handle_git, mirror_mode
 from depend.vcs.github_worker import handle_github
+from depend.vcs.vcs_phase import phase_mode, queue_lookup, track_records
+
+ASYNC_CONCURRENCY = 64
+# registries with a version specific url that can be queried for exact pins
+PINNED_URL_LANGUAGES = ("python", "javascript", "cs", "rust")
+# versions selected for a dependency entry and the response listing them
+Selection = Tuple[List[str], Optional[Response]]
+# url, headers and whether redirects are followed of a request listing versions
+ListingRequest = Tuple[str, Dict[str, str], bool]
+Listing = Tuple[list, Optional[Response | httpx.Response]]
 
 
 def handle_vcs(
@@ -37,11 +101,17 @@ def handle_vcs(
 ) -> None:
     """
     Fall through to VCS check for a go namespace (only due to go.mod check)
+    In phase mode the lookup is queued for the VCS phase after resolution,
+    in mirror mode repositories of any host are read from local git mirrors.
     :param language: primary language of the package
     :param dependency: package not found in other repositories
     :param result: object with name version license and dependencies
     """
-    if "github.com" in dependency:
+    if phase_mode():
+        queue_lookup(language, dependency, result)
+    elif mirror_mode():
+        handle_git(language, dependency, result)
+    elif "github.com" in dependency:
         handle_github(language, dependency, result)
     else:
         raise VCSNotSupportedError(dependency)
@@ -59,6 +129,11 @@ def make_url(language: str, package: str, version: str = "") -> str:
     url_elements: Tuple[str, ...]
     match language:
         case "python":
+            # extras only select dependencies, the registry knows the bare name
+            package, _ = split_extras(package)
+            if registry_mode("python"):
+                # the project page links the metadata file of every version
+                return simple_url(package)
             if version:
                 url_elements = (
                     str(REGISTRY[language]["url"]),
@@ -74,6 +149,9 @@ def make_url(language: str, package: str, version: str = "") -> str:
             else:
                 url_elements = (str(REGISTRY[language]["url"]), package)
         case "go":
+            if registry_mode("go"):
+                # go.mod of the version, or the list of its tagged versions
+                return proxy_url(package, f"@v/{version}.mod" if version else "@v/list")
             if version:
                 url_elements = (str(REGISTRY[language]["url"]), package + "@" + version)
             else:
@@ -91,11 +169,16 @@ def make_url(language: str, package: str, version: str = "") -> str:
             else:
                 url_elements = (REGISTRY[language]["url"], package, "index.json")
         case "php":
+            if registry_mode("php"):
+                return p2_url(package)
+            # every version is served from the same document
             url_elements = (REGISTRY[language]["url"], package)
             suffix = ".json"
         case "rust":
             if version:
                 url_elements = (REGISTRY[language]["url"], package, version)
+            elif registry_mode("rust"):
+                return sparse_url(package)
             else:
                 url_elements = (REGISTRY[language]["url"], package, "versions")
         case _:
@@ -122,12 +205,372 @@ def find_github(text: str) -> str:
         return ""
 
 
+def new_result(package: str) -> Result:
+    """
+    Result object to be filled in for a package
+    :param package: as imported
+    """
+    return {
+        "import_name": "",
+        "lang_ver": [],
+        "pkg_name": package,
+        "pkg_ver": "",
+        "pkg_lic": ["Other"],
+        "pkg_err": {},
+        "pkg_dep": [],
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def vcs_version(version: str) -> str:
+    """
+    Repo to query when a version is meant to be handled by VCS provider
+    :param version: version specification of the package
+    :return: repo url or an empty string for registry versions
+    """
+    supported_domains = [
+        "github.com",
+    ]
+    if not any(domain in version for domain in supported_domains):
+        return ""
+    if "||" in version:
+        git_url, git_branch = version.split("||")
+        return git_url + "/tree/" + git_branch
+    return version
+
+
+def list_versions(
+    language: str, response: Response, url: str, ver_res: Response = None
+) -> list:
+    """
+    Get all available versions from the registry response
+    :param language: python, javascript or go
+    :param response: response for the url made without a version
+    :param url: url queried for response, after redirects
+    :param ver_res: go versions page if already fetched
+    :return: list of versions
+    """
+    match language:
+        case "python":
+            return py_versions(response)
+        case "javascript":
+            return js_versions(response)
+        case "go":
+            if registry_mode("go"):
+                return proxy_versions(response, url)
+            return go_versions(url, ver_res)
+        case "cs":
+            return nuget_versions(response)
+        case "php":
+            return php_versions(response)
+        case "rust":
+            return rust_versions(response)
+    return []
+
+
+def pinned_url_version(
+    language: str, version_constraints: list, all_ver: bool
+) -> Optional[str]:
+    """
+    Version to query directly when the constraint is an exact pin
+    :param language: python, javascript or go
+    :param version_constraints: constraints obtained from fix_constraint
+    :param all_ver: all versions queried if true
+    :return: pinned version, None if versions have to be listed
+    """
+    if all_ver or language not in PINNED_URL_LANGUAGES:
+        return None
+    if language == "python" and registry_mode("python"):
+        # files of the pin are only known from the project page
+        return None
+    if language == "rust" and registry_mode("rust"):
+        # dependencies of the pin are only known from the index file
+        return None
+    return pinned_version(version_constraints)
+
+
+def use_pinned_response(response: Response | httpx.Response) -> bool:
+    """
+    Check if the response for a pinned version can be used as is
+    :param response: response for the version specific url
+    :return: false if versions have to be listed as the pin could not be read
+    """
+    if response.status_code != 200:
+        run_stats.record("pinned_fallbacks")
+        return False
+    run_stats.record("pinned_requests_saved")
+    return True
+
+
+def reuse_listing(
+    language: str, listing: Optional[Response | httpx.Response], ver: str
+) -> bool:
+    """
+    Check if a version can be handled from the versions listing
+    :param language: language of the package
+    :param listing: response used to list versions, if any
+    :param ver: resolved version
+    """
+    if listing is None or not listing_has_version(language, listing, ver):
+        return False
+    run_stats.record("listing_reused")
+    return True
+
+
+def stored_pin(
+    language: str,
+    package: str,
+    version_constraints: list,
+    all_ver: bool,
+    stored: Dict[str, Result],
+) -> list:
+    """
+    Check the metadata store for an exact pin before touching the network
+    :param language: language of the package
+    :param package: as imported
+    :param version_constraints: constraints obtained from fix_constraint
+    :param all_ver: all versions queried if true
+    :param stored: filled with the stored result if found
+    :return: pinned version if stored, else an empty list
+    """
+    pinned = None if all_ver else pinned_version(version_constraints)
+    if pinned and (result := metadata_store.get_result(language, package, pinned)):
+        stored[pinned] = result
+        return [pinned]
+    return []
+
+
+def stored_version(
+    language: str, package: str, ver: str, stored: Dict[str, Result]
+) -> Optional[Result]:
+    """
+    Result of a registry version already present in the metadata store
+    :param language: language of the package
+    :param package: as imported
+    :param ver: resolved version
+    :param stored: results already obtained from the store
+    """
+    if ver in stored:
+        return stored.pop(ver)
+    if vcs_version(ver):
+        return None
+    return metadata_store.get_result(language, package, ver)
+
+
+def store_versions(
+    language: str, package: str, response: Response | httpx.Response, vers: list
+) -> None:
+    """
+    Keep versions listed by the registry until they expire
+    :param language: language of the package
+    :param package: as imported
+    :param response: response used to list versions
+    :param vers: all available versions
+    """
+    if response.status_code == 200 and vers:
+        metadata_store.put_versions(language, package, vers)
+
+
+def store_result(
+    language: str,
+    package: str,
+    version: str,
+    ver: str,
+    response: Response | httpx.Response,
+    result: Result,
+    repo: str = "",
+) -> None:
+    """
+    Persist results of published registry versions, as they never change.
+    Results the VCS fallback ran for are left out, as repositories do change.
+    :param language: language of the package
+    :param package: as imported
+    :param version: version specification of the package
+    :param ver: resolved version
+    :param response: last registry response for the version
+    :param result: object filled in for the version
+    :param repo: repo the VCS fallback was run for, empty if registry data sufficed
+    """
+    if response.status_code == 200 and not vcs_version(version) and not repo:
+        metadata_store.put_result(language, package, ver, result)
+
+
+def listing_steps(
+    language: str, package: str
+) -> Generator[ListingRequest, Response | httpx.Response, Listing]:
+    """
+    All available versions of a package, from the store or the registry.
+    Requests are yielded and their responses sent back, so that blocking and
+    async clients share the store lookup and the handling of go redirects.
+    :param language: language of the package
+    :param package: as imported
+    :return: versions and the response listing them, None if they were stored
+    """
+    listed = metadata_store.get_versions(language, package)
+    if listed is not None:
+        return listed, None
+    url = make_url(language, package)
+    # Get all available versions for specified package
+    response = yield url, listing_headers(language), True
+    record_transfer(language, response)
+    red_url = url
+    ver_res = None
+    if language == "go" and not registry_mode("go"):
+        # Handle 302: Redirection
+        if response.status_code == 200 and response.history:
+            red_url = str(response.url)
+        ver_res = yield go_versions_url(red_url), {}, False
+    listed = list_versions(language, response, red_url, ver_res)
+    store_versions(language, package, response, listed)
+    return listed, response
+
+
+def fetch_versions(language: str, package: str) -> Tuple[list, Optional[Response]]:
+    """
+    All available versions of a package, from the store or the registry
+    :param language: language of the package
+    :param package: as imported
+    :return: versions and the response listing them, None if they were stored
+    """
+    steps = listing_steps(language, package)
+    try:
+        url, headers, redirects = next(steps)
+        while True:
+            response = registry_get(url, headers=headers, allow_redirects=redirects)
+            url, headers, redirects = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+
+async def async_fetch_versions(
+    language: str, package: str, get: Callable[..., Any]
+) -> Tuple[list, Optional[httpx.Response]]:
+    """
+    All available versions of a package, from the store or the registry,
+    without blocking
+    :param language: language of the package
+    :param package: as imported
+    :param get: coroutine function fetching a url with the async client
+    :return: versions and the response listing them, None if they were stored
+    """
+    steps = listing_steps(language, package)
+    try:
+        url, headers, redirects = next(steps)
+        while True:
+            response = await get(url, headers=headers, follow_redirects=redirects)
+            url, headers, redirects = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+
+def select_versions(
+    vers: list, package: str, version: str, version_constraints: list, all_ver: bool
+) -> list:
+    """
+    Parse only one version resolved from constraint provided
+    :param vers: all available versions
+    :param package: as imported
+    :param version: version constraint as specified
+    :param version_constraints: constraints obtained from fix_constraint
+    :param all_ver: all versions queried if true
+    :return: versions to query
+    """
+    logging.debug(vers)
+    if not all_ver and vers:
+        resolved_version = resolve_version(vers, version_constraints)
+        if resolved_version is not None:
+            return [resolved_version]
+        logging.warning(
+            f"No version could be resolved for package {package} with version constraint {version}"
+        )
+        return []
+    return vers
+
+
+def handle_registry_response(
+    language: str,
+    response: Response,
+    result: Result,
+    ver: str,
+    url: str,
+    repo: str,
+    dep_res: Response = None,
+) -> str:
+    """
+    Fill result from a version specific registry response
+    :param language: python, javascript, go, cs, php or rust
+    :param response: response for the version specific url or versions listing
+    :param result: object to mutate
+    :param ver: version queried
+    :param url: version specific url
+    :param repo: repo known so far
+    :param dep_res: rust dependencies or python core metadata response if already fetched
+    :return: repo to do vcs query if data incomplete
+    """
+    match language:
+        case "python":
+            if registry_mode("python"):
+                return handle_pypi_metadata(
+                    response, result, result["pkg_name"], ver, dep_res
+                )
+            return handle_pypi(response, result)
+        case "javascript":
+            return handle_npmjs(response, result, ver)
+        case "go":
+            return handle_go_proxy(response, result, ver)
+        case "cs":
+            return handle_cs(response, result)
+        case "php":
+            handle_php(response, result, ver)
+        case "rust":
+            handle_rust(response, result, url, dep_res, ver)
+    return repo
+
+
+def handle_fallback(
+    language: str, repo: str, result: Result, response: Response, url: str
+) -> None:
+    """
+    Use VCS if a repo is known, else report failed registry response
+    :param language: primary language of the package
+    :param repo: repo url collected from the registry
+    :param result: object to mutate
+    :param response: last registry response
+    :param url: last url queried
+    """
+    if repo:
+        try:
+            handle_vcs(language, repo, result)
+        except VCSNotSupportedError:
+            logging.info(f"Unable to use VCS as unsupported: {repo}")
+        except VCSDeferredError as e:
+            # registry resolution goes on, the lookup waits for quota
+            get_github_scheduler().defer(language, repo, result, e)
+    else:
+        if response.status_code != 200:
+            logging.error(
+                f"{response.status_code}: {url} maybe git: {find_github(response.text)}"
+            )
+
+
+def registry_get(url: str, **kwargs) -> Response:
+    """
+    Blocking GET of a registry url, module proxies laid out on disk are read directly
+    :param url: url to fetch
+    """
+    if is_file_url(url):
+        return file_response(url)
+    return requests.get(url, **kwargs)
+
+
 def make_single_request(
     language: str,
     package: str,
     version: str = "",
     force_schema: bool = True,
     all_ver: bool = False,
+    versions: Optional[List[str]] = None,
+    listing: Optional[Response] = None,
 ) -> Tuple[dict | Result | List[Result], Set[str]]:
     """
     Obtain package license and dependency information.
@@ -136,121 +579,274 @@ def make_single_request(
     :param version: check for specific version
     :param force_schema: returns schema compliant response if true
     :param all_ver: all versions queried if version not supplied
+    :param versions: versions already selected for the constraint, versions
+        are not listed again
+    :param listing: response listing the versions, reused for a version it holds
     :return: result object with name version license and dependencies
     """
     rem_dep: Set[str] = set()
     result_list = []
-    result: Result = {
-        "import_name": "",
-        "lang_ver": [],
-        "pkg_name": package,
-        "pkg_ver": "",
-        "pkg_lic": ["Other"],
-        "pkg_err": {},
-        "pkg_dep": [],
-        "timestamp": datetime.utcnow().isoformat(),
-    }
-    repo = ""
-    vers = []
+    result = new_result(package)
     response: Response
-    supported_domains = [
-        "github.com",
-    ]
+    prefetched: Dict[str, Response] = {}
+    stored: Dict[str, Result] = {}
     # Single request is meant to be handled by VCS provider
-    if any(domain in version for domain in supported_domains):
-        if "||" in version:
-            git_url, git_branch = version.split("||")
-            repo = git_url + "/tree/" + git_branch
-        else:
-            repo = version
+    if repo := vcs_version(version):
         vers = [repo]
+    elif versions is not None:
+        vers = versions
     # Requested for a version using a version constraint
     else:
         version_constraints = fix_constraint(language, version)
-        url = make_url(language, package)
-        # Get all available versions for specified package
-        response = requests.get(url)
-        red_url = url
-        match language:
-            case "python":
-                vers = py_versions(response)
-            case "javascript":
-                vers = js_versions(response)
-            case "go":
-                if response.status_code == 200:
-                    # Handle 302: Redirection
-                    if response.history:
-                        red_url = response.url
-                vers = go_versions(red_url)
-            case "cs":
-                vers = nuget_versions(response)
-            case "php":
-                vers = php_versions(response)
-            case "rust":
-                vers = rust_versions(response)
-        # Parse only one version resolved from constraint provided
-        logging.debug(vers)
-        if not all_ver and vers:
-            resolved_version = resolve_version(vers, version_constraints)
-            if resolved_version is not None:
-                vers = [resolved_version]
-            else:
-                vers = []
-                logging.warning(
-                    f"No version could be resolved for package {package} with version constraint {version}"
-                )
+        vers = stored_pin(language, package, version_constraints, all_ver, stored)
+        # Exact pins skip listing versions unless the version is not found
+        if not vers and (
+            pinned := pinned_url_version(language, version_constraints, all_ver)
+        ):
+            response = requests.get(make_url(language, package, pinned))
+            record_transfer(language, response)
+            if use_pinned_response(response):
+                vers = [pinned]
+                prefetched[pinned] = response
+        if not vers:
+            listed, listing = fetch_versions(language, package)
+            vers = select_versions(
+                listed, package, version, version_constraints, all_ver
+            )
     # Check multiple versions of specified package
     for ver in vers:
+        if (stored_res := stored_version(language, package, ver, stored)) is not None:
+            rem_dep = set(stored_res.get("pkg_dep") or [])
+            result_list.append(stored_res)
+            continue
         # Construct URL for version specific data
         url = make_url(language, package, ver)
         logging.info(url)
-        response = requests.get(url)
+        if ver in prefetched:
+            response = prefetched.pop(ver)
+        elif reuse_listing(language, listing, ver):
+            response = listing
+        else:
+            response = registry_get(url)
+            record_transfer(language, response)
         # Collect repo if available to do vcs query if data incomplete
-        match language:
-            case "python":
-                repo = handle_pypi(response, result)
-            case "javascript":
-                repo = handle_npmjs(response, result)
-            case "cs":
-                repo = handle_cs(response, result)
-            case "php":
-                handle_php(response, result, ver)
-            case "rust":
-                handle_rust(response, result, url)
-            case "go":
-                if response.status_code == 200:
-                    red_url = url
-                    if response.history:
-                        red_url = response.url + "@" + version
-                        response = requests.get(red_url)
-                    scrape_go(response, result, red_url)
-                elif not repo:
-                    repo = package
-        if repo:
-            try:
-                handle_vcs(language, repo, result)
-            except VCSNotSupportedError:
-                logging.info(f"Unable to use VCS as unsupported: {repo}")
+        if language == "go" and not registry_mode("go"):
+            if response.status_code == 200:
+                red_url = url
+                if response.history:
+                    red_url = response.url + "@" + version
+                    response = requests.get(red_url)
+                scrape_go(response, result, red_url)
+            elif not repo:
+                repo = package
         else:
-            if response.status_code != 200:
-                logging.error(
-                    f"{response.status_code}: {url} maybe git: {find_github(response.text)}"
-                )
+            # sparse index file listing versions also holds their dependencies
+            index_res = (
+                listing if language == "rust" and registry_mode("rust") else None
+            )
+            repo = handle_registry_response(
+                language, response, result, ver, url, repo, index_res
+            )
+        handle_fallback(language, repo, result, response, url)
+        store_result(language, package, version, ver, response, result, repo)
+        rem_dep = set(result.get("pkg_dep") or [])
+        result_list.append(result)
+    if not result_list:
+        result_list = [result]
+    if force_schema:
+        return track_records(result_list, parse_dep_response(result_list)), rem_dep
+    else:
+        return result_list, rem_dep
+
+
+async def _async_get(
+    client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str, **kwargs
+) -> httpx.Response:
+    """
+    Non-blocking GET limited by the number of requests allowed in flight
+    :param client: async http client
+    :param semaphore: limits concurrent requests
+    :param url: url to fetch
+    """
+    if is_file_url(url):
+        return file_response(url)
+    async with semaphore:
+        return await client.get(url, **kwargs)
+
+
+async def async_make_single_request(
+    language: str,
+    package: str,
+    version: str = "",
+    force_schema: bool = True,
+    all_ver: bool = False,
+    client: Optional[httpx.AsyncClient] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[dict | Result | List[Result], Set[str]]:
+    """
+    Obtain package license and dependency information without blocking.
+    :param language: python, javascript or go
+    :param package: as imported
+    :param version: check for specific version
+    :param force_schema: returns schema compliant response if true
+    :param all_ver: all versions queried if version not supplied
+    :param client: async http client to reuse, a new one is created if missing
+    :param semaphore: limits concurrent requests across calls
+    :return: result object with name version license and dependencies
+    """
+    if client is None:
+        async with httpx.AsyncClient(follow_redirects=True) as new_client:
+            return await async_make_single_request(
+                language, package, version, force_schema, all_ver, new_client, semaphore
+            )
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    get = partial(_async_get, client, semaphore)
+    rem_dep: Set[str] = set()
+    result_list = []
+    result = new_result(package)
+    response: httpx.Response
+    prefetched: Dict[str, httpx.Response] = {}
+    listing: Optional[httpx.Response] = None
+    stored: Dict[str, Result] = {}
+    if repo := vcs_version(version):
+        vers = [repo]
+    else:
+        version_constraints = fix_constraint(language, version)
+        vers = stored_pin(language, package, version_constraints, all_ver, stored)
+        if not vers and (
+            pinned := pinned_url_version(language, version_constraints, all_ver)
+        ):
+            response = await get(make_url(language, package, pinned))
+            record_transfer(language, response)
+            if use_pinned_response(response):
+                vers = [pinned]
+                prefetched[pinned] = response
+        if not vers:
+            listed, listing = await async_fetch_versions(language, package, get)
+            vers = select_versions(
+                listed, package, version, version_constraints, all_ver
+            )
+    for ver in vers:
+        if (stored_res := stored_version(language, package, ver, stored)) is not None:
+            rem_dep = set(stored_res.get("pkg_dep") or [])
+            result_list.append(stored_res)
+            continue
+        url = make_url(language, package, ver)
+        logging.info(url)
+        if ver in prefetched:
+            response = prefetched.pop(ver)
+        elif reuse_listing(language, listing, ver):
+            response = listing
+        else:
+            response = await get(url)
+            record_transfer(language, response)
+        if language == "go" and not registry_mode("go"):
+            if response.status_code == 200:
+                red_url = url
+                if response.history:
+                    red_url = str(response.url) + "@" + version
+                    response = await get(red_url)
+                imports = await get(go_imports_url(red_url), follow_redirects=False)
+                scrape_go(response, result, red_url, imports)
+            elif not repo:
+                repo = package
+        else:
+            dep_res = None
+            if language == "rust" and registry_mode("rust"):
+                dep_res = listing
+                if dep_res is None:
+                    dep_res = await get(sparse_url(package))
+            elif language == "rust":
+                dep_res = await get(url + "/dependencies")
+            elif language == "python" and registry_mode("python"):
+                dep_res = await get(core_metadata_url(response, package, ver))
+                record_transfer(language, dep_res)
+            repo = handle_registry_response(
+                language, response, result, ver, url, repo, dep_res
+            )
+        # VCS providers are only reachable through blocking clients
+        await asyncio.to_thread(handle_fallback, language, repo, result, response, url)
+        store_result(language, package, version, ver, response, result, repo)
         rem_dep = set(result.get("pkg_dep") or [])
         result_list.append(result)
     if not result_list:
         result_list = [result]
     if force_schema:
-        return parse_dep_response(result_list), rem_dep
+        return track_records(result_list, parse_dep_response(result_list)), rem_dep
     else:
         return result_list, rem_dep
 
 
+def query_package(
+    language: str, package_d: str, selected: Optional[Selection] = None
+) -> Tuple[dict | Result | List[Result], Set[str]]:
+    """
+    Obtain schema compliant information for a single dependency entry.
+    :param language: python, javascript or go
+    :param package_d: package name optionally followed by ;version constraint
+    :param selected: versions already selected for the entry and their listing
+    :return: parsed result and dependencies of the resolved version
+    """
+    versions, listing = selected or (None, None)
+    name_ver = package_d.rsplit(";", 1)
+    if len(name_ver) == 1:
+        return make_single_request(
+            language, name_ver[0], versions=versions, listing=listing
+        )
+    return make_single_request(
+        language, name_ver[0], name_ver[1], versions=versions, listing=listing
+    )
+
+
+def resolved_key(
+    language: str, package_d: str, dep_resp: Any
+) -> Optional[Tuple[str, str]]:
+    """
+    Identity of the release a dependency entry resolved to
+    :param language: language of the package
+    :param package_d: package name optionally followed by ;version constraint
+    :param dep_resp: schema compliant response for the entry
+    :return: canonical name and version, None if no single version was resolved
+    """
+    name, ver = response_key(package_d, dep_resp)
+    if not ver:
+        return None
+    return canonical_name(language, name), ver
+
+
+def query_entry(
+    language: str,
+    package_d: str,
+    known: Dict[str, Tuple[Any, Set[str]]],
+    unlimited: bool = False,
+    selected: Optional[Selection] = None,
+) -> Tuple[dict | Result | List[Result], Set[str]]:
+    """
+    query_package for entries not already known from a stored closure
+    :param language: python, javascript or go
+    :param package_d: package name optionally followed by ;version constraint
+    :param known: responses and dependencies that need not be queried again
+    :param unlimited: seed known with the stored closure of the resolved version
+    :param selected: versions already selected for the entry and their listing
+    :return: parsed result and dependencies of the resolved version
+    """
+    if package_d in known:
+        return known[package_d]
+    response = query_package(language, package_d, selected)
+    if unlimited:
+        splice_closure(language, package_d, response[0], known)
+    return response
+
+
 def make_multiple_requests(
     language: str,
     packages: List[str],
     depth: Optional[int] = None,
     result: Optional[list] = None,
+    jobs: int = 1,
+    pipeline: bool = False,
+    queued: Optional[Set[str]] = None,
 ) -> List[Any]:
     """
     Obtain license and dependency information for list of packages.
@@ -258,15 +854,49 @@ def make_multiple_requests(
     :param packages: a list of dependencies in each language
     :param depth: depth of recursion, None for no limit and 0 for input parsing alone
     :param result: optional result object to append to during recursion
+    :param jobs: number of packages fetched in parallel
+    :param pipeline: queue dependencies as soon as their parent is resolved
+        instead of waiting for the whole level to finish
+    :param queued: canonical entries an earlier call resolved, not queried again
     :return: result object with name version license and dependencies
     """
-    return _make_multiple_requests(
-        language,
-        packages,
-        depth,
-        result,
-        _already_queried=set(),
-    )
+    graph: Dict[str, Tuple[str, Set[str]]] = {}
+    if pipeline:
+        result = _pipelined_requests(
+            language,
+            packages,
+            depth,
+            result,
+            jobs=jobs,
+            _graph=graph,
+            _queued=set(queued or ()),
+        )
+    elif jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            result = _make_multiple_requests(
+                language,
+                packages,
+                depth,
+                result,
+                _already_queried=set(),
+                _executor=executor,
+                _graph=graph,
+                _queued=set(queued or ()),
+            )
+    else:
+        result = _make_multiple_requests(
+            language,
+            packages,
+            depth,
+            result,
+            _already_queried=set(),
+            _graph=graph,
+            _queued=set(queued or ()),
+        )
+    # closures are only complete when nothing was cut off by depth
+    if depth is None:
+        record_closures(language, graph)
+    return result
 
 
 def _make_multiple_requests(
@@ -274,36 +904,525 @@ def _make_multiple_requests(
     packages: List[str],
     depth: Optional[int] = None,
     result: Optional[list] = None,
-    _already_queried: Optional[Set] = None,
+    _already_queried: Optional[Set[Tuple[str, str]]] = None,
+    _executor: Optional[Executor] = None,
+    _known: Optional[Dict[str, Tuple[Any, Set[str]]]] = None,
+    _graph: Optional[Dict[str, Tuple[str, Set[str]]]] = None,
+    _queued: Optional[Set[str]] = None,
 ) -> List[Any]:
     """
     Recursive implementation of make_multiple_requests, with caching.
-    :param _already_queried: set that keeps track of queried packages
+    Every level is resolved in full before moving on to the next one.
+    :param _already_queried: set that keeps track of the canonical name and
+        version every queried entry resolved to
+    :param _executor: optional pool used to fetch packages of a level in parallel
+    :param _known: responses seeded from stored closures
+    :param _graph: optional dict to record the version and dependencies of every entry
+    :param _queued: set that keeps track of queued canonical entries
     """
     logging.debug("Fetching packages: %s", packages)
     if result is None:
         result = []
+    if _already_queried is None:
+        _already_queried = set()
+    if _queued is None:
+        _queued = set()
+    if _known is None:
+        _known = {}
     deps = set()
+    groups = group_entries(language, packages)
+    query = partial(query_group, language, known=_known, unlimited=depth is None)
+    # map preserves input order, so results are identical to the serial path
+    if _executor is None:
+        responses = map(query, groups)
+    else:
+        responses = _executor.map(query, groups)
+    answers = {
+        package_d: response
+        for group, group_responses in zip(groups, responses)
+        for package_d, response in zip(group, group_responses)
+    }
     for package_d in packages:
-        name_ver = package_d.rsplit(";", 1)
-        if len(name_ver) == 1:
-            dep_resp, res_deps = make_single_request(language, name_ver[0])
-        else:
-            dep_resp, res_deps = make_single_request(language, name_ver[0], name_ver[1])
+        dep_resp, res_deps = answers[package_d]
+        _queued.add(canonical_entry(language, package_d))
+        if _graph is not None:
+            _graph[package_d] = (response_key(package_d, dep_resp)[1], set(res_deps))
+        key = resolved_key(language, package_d, dep_resp)
+        if key in _already_queried:
+            run_stats.record("duplicates_skipped")
+            continue
+        if key is not None:
+            _already_queried.add(key)
         result.append(dep_resp)
         deps = deps.union(res_deps)
-        _already_queried.add(package_d)
-    deps.difference_update(_already_queried)
     # higher levels may ignore version specifications
-    if len(deps) == 0:
+    # sorted to keep the order of the next level stable across runs
+    next_level = []
+    for dep in sorted(deps):
+        entry = canonical_entry(language, dep)
+        if entry not in _queued:
+            _queued.add(entry)
+            next_level.append(dep)
+    if len(next_level) == 0:
         return result
     if depth is None:
         return _make_multiple_requests(
-            language, list(deps), result=result, _already_queried=_already_queried
+            language,
+            next_level,
+            result=result,
+            _already_queried=_already_queried,
+            _executor=_executor,
+            _known=_known,
+            _graph=_graph,
+            _queued=_queued,
         )
     elif isinstance(depth, int) and depth > 0:
         return _make_multiple_requests(
-            language, list(deps), depth - 1, result, _already_queried
+            language,
+            next_level,
+            depth - 1,
+            result,
+            _already_queried,
+            _executor,
+            _known,
+            _graph,
+            _queued,
         )
     else:
         return result
+
+
+def group_entries(language: str, packages: List[str]) -> List[List[str]]:
+    """
+    Group dependency entries constraining the same package, so its versions are
+    listed once for all of them
+    :param language: language of the packages
+    :param packages: dependency entries
+    :return: groups in order of their first entry, repositories on their own
+    """
+    groups: Dict[str, List[str]] = {}
+    for package_d in dict.fromkeys(packages):
+        name_ver = package_d.rsplit(";", 1)
+        if len(name_ver) > 1 and vcs_version(name_ver[1]):
+            groups[package_d] = [package_d]
+        else:
+            groups.setdefault(canonical_name(language, name_ver[0]), []).append(
+                package_d
+            )
+    return list(groups.values())
+
+
+def query_group(
+    language: str,
+    entries: List[str],
+    known: Dict[str, Tuple[Any, Set[str]]],
+    unlimited: bool = False,
+) -> List[Tuple[dict | Result | List[Result], Set[str]]]:
+    """
+    query_entry for entries constraining the same package. Its versions are
+    listed once and the constraints of every entry resolved in one batch.
+    :param language: python, javascript or go
+    :param entries: dependency entries naming the same package
+    :param known: responses and dependencies that need not be queried again
+    :param unlimited: seed known with the stored closure of the resolved version
+    :return: parsed result and dependencies of every entry, in order
+    """
+    unknown = [package_d for package_d in entries if package_d not in known]
+    selected: Dict[str, Selection] = {}
+    if len(unknown) > 1:
+        name = unknown[0].rsplit(";", 1)[0]
+        listed, listing = fetch_versions(language, name)
+        versions = [
+            package_d.rsplit(";", 1)[1] if ";" in package_d else ""
+            for package_d in unknown
+        ]
+        constraints = [fix_constraint(language, version) for version in versions]
+        resolved = resolve_versions(listed, constraints)
+        run_stats.record("batch_resolved", len(unknown))
+        for package_d, version, ver in zip(unknown, versions, resolved):
+            if ver is None:
+                logging.warning(
+                    f"No version could be resolved for package {name} with version constraint {version}"
+                )
+            selected[package_d] = ([ver] if ver is not None else [], listing)
+    return [
+        query_entry(language, package_d, known, unlimited, selected.get(package_d))
+        for package_d in entries
+    ]
+
+
+def _timed_group(
+    language: str,
+    entries: List[str],
+    known: Dict[str, Tuple[Any, Set[str]]],
+    unlimited: bool = False,
+) -> Tuple[List[Tuple[dict | Result | List[Result], Set[str]]], float]:
+    """
+    Query a group of dependency entries and measure how long each took
+    :param language: python, javascript or go
+    :param entries: dependency entries naming the same package
+    :param known: responses seeded from stored closures
+    :param unlimited: seed known with the stored closure of the resolved version
+    :return: responses of query_group and seconds spent per entry
+    """
+    start = time.perf_counter()
+    responses = query_group(language, entries, known, unlimited)
+    return responses, (time.perf_counter() - start) / len(entries)
+
+
+def _levels(packages: List[str], children: Dict[str, Set[str]]) -> List[List[str]]:
+    """
+    Group resolved packages the way the level-barrier scheduler visits them
+    :param packages: root dependency entries
+    :param children: dependencies found for every resolved entry
+    :return: list of levels, each ordered like _make_multiple_requests
+    """
+    levels = []
+    seen: Set[str] = set()
+    level = [package_d for package_d in packages if package_d in children]
+    while level:
+        levels.append(level)
+        seen.update(level)
+        deps = set().union(*(children[package_d] for package_d in level))
+        level = sorted(dep for dep in deps - seen if dep in children)
+    return levels
+
+
+def _level_barrier_estimate(
+    levels: List[List[str]], durations: Dict[str, float], jobs: int
+) -> float:
+    """
+    Estimate wall time of the same run with a barrier after every level
+    :param levels: resolved packages grouped by level
+    :param durations: seconds spent resolving each package
+    :param jobs: number of workers available
+    :return: sum of the makespan of every level
+    """
+    total = 0.0
+    for level in levels:
+        workers = [0.0] * min(max(jobs, 1), len(level))
+        for package_d in level:
+            heapq.heappush(workers, heapq.heappop(workers) + durations[package_d])
+        total += max(workers)
+    return total
+
+
+class _Worklist:
+    """
+    Bookkeeping shared by the worklist schedulers.
+    Remaining depth is tracked for every package so that a package reached
+    again through a shorter path is still expanded as far as it should be.
+    Entries are deduplicated by canonical entry before they are queued and
+    by resolved release once they are resolved.
+    """
+
+    def __init__(
+        self,
+        language: str,
+        submit: Optional[Callable[[List[str]], None]] = None,
+    ):
+        """
+        :param language: language of the packages
+        :param submit: starts resolving dependency entries queued together
+        """
+        self.language = language
+        self.submit = submit
+        self.queued: Set[str] = set()
+        self.budgets: Dict[str, Optional[int]] = {}
+        self.children: Dict[str, Set[str]] = {}
+        self.entries: Dict[str, str] = {}
+        self.releases: Dict[Tuple[str, str], str] = {}
+        self.duplicates: Dict[str, str] = {}
+
+    def node(self, package_d: str) -> str:
+        """
+        Queued entry that stands for a dependency entry in the graph
+        :param package_d: package name optionally followed by ;version constraint
+        """
+        entry = canonical_entry(self.language, package_d)
+        package_d = self.entries.get(entry, package_d)
+        return self.duplicates.get(package_d, package_d)
+
+    def schedule(self, packages: List[str], budget: Optional[int]) -> None:
+        """
+        Queue dependency entries unless they were already queued,
+        new entries are submitted together
+        :param packages: package names optionally followed by ;version constraint
+        :param budget: remaining depth, None for no limit
+        """
+        new = []
+        for package_d in packages:
+            entry = canonical_entry(self.language, package_d)
+            if entry in self.queued:
+                package_d = self.node(package_d)
+                current = self.budgets.get(package_d, budget)
+                if current is not None and (budget is None or budget > current):
+                    self.budgets[package_d] = budget
+                    if package_d in self.children:
+                        self._expand(package_d)
+                continue
+            self.queued.add(entry)
+            self.entries[entry] = package_d
+            self.budgets[package_d] = budget
+            new.append(package_d)
+        if new:
+            self.submit(new)
+
+    def resolved(
+        self,
+        package_d: str,
+        res_deps: Set[str],
+        key: Optional[Tuple[str, str]] = None,
+    ) -> bool:
+        """
+        Record a resolved entry and queue its dependencies right away
+        :param package_d: entry that was resolved
+        :param res_deps: dependencies of the resolved version
+        :param key: canonical name and version the entry resolved to
+        :return: False if another entry already resolved to the same release
+        """
+        self.children[package_d] = set(res_deps)
+        if key is not None:
+            original = self.releases.setdefault(key, package_d)
+            if original != package_d:
+                self.duplicates[package_d] = original
+                run_stats.record("duplicates_skipped")
+                # expanded in place of the duplicate, as deep as either allows
+                self.schedule([original], self.budgets[package_d])
+                return False
+        self._expand(package_d)
+        return True
+
+    def _expand(self, package_d: str) -> None:
+        budget = self.budgets[package_d]
+        if budget is not None and budget <= 0:
+            return
+        self.schedule(
+            sorted(self.children[package_d]), None if budget is None else budget - 1
+        )
+
+    def levels(self, packages: List[str]) -> List[List[str]]:
+        """
+        Resolved entries grouped the way the level scheduler visits them
+        :param packages: root dependency entries
+        """
+        children = {
+            package_d: {self.node(dep) for dep in deps}
+            for package_d, deps in self.children.items()
+            if package_d not in self.duplicates
+        }
+        roots = list(dict.fromkeys(self.node(package_d) for package_d in packages))
+        return _levels(roots, children)
+
+
+def iter_multiple_requests(
+    language: str,
+    packages: List[str],
+    depth: Optional[int] = None,
+    jobs: int = 1,
+) -> Iterator[Any]:
+    """
+    Obtain license and dependency information for list of packages,
+    yielding every schema compliant response as soon as it is resolved.
+    Responses are not kept once yielded, so they come in completion order
+    rather than level by level.
+    :param language: python, javascript or go
+    :param packages: a list of dependencies in each language
+    :param depth: depth of recursion, None for no limit and 0 for input parsing alone
+    :param jobs: number of packages fetched in parallel
+    :return: generator of responses
+    """
+    graph: Dict[str, Tuple[str, Set[str]]] = {}
+    worklist = _Worklist(language)
+    for package_d, dep_resp, res_deps, _ in _iter_pipelined(
+        language, packages, depth, worklist, jobs
+    ):
+        graph[package_d] = (response_key(package_d, dep_resp)[1], set(res_deps))
+        if package_d not in worklist.duplicates:
+            yield dep_resp
+    if depth is None:
+        record_closures(language, graph)
+
+
+def _iter_pipelined(
+    language: str,
+    packages: List[str],
+    depth: Optional[int],
+    worklist: _Worklist,
+    jobs: int = 1,
+) -> Iterator[Tuple[str, Any, Set[str], float]]:
+    """
+    Resolve entries with a worklist, without level barriers.
+    Dependencies of a package are queued as soon as it is resolved and depth
+    is tracked for every package rather than for every level.
+    :param language: python, javascript or go
+    :param packages: root dependency entries
+    :param depth: depth of recursion, None for no limit
+    :param worklist: bookkeeping of queued entries, duplicates are also yielded
+    :param jobs: number of packages fetched in parallel
+    :return: generator of entry, response, dependencies and seconds spent
+    """
+    known: Dict[str, Tuple[Any, Set[str]]] = {}
+    pending: Dict[Future, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+
+        def submit(entries: List[str]) -> None:
+            # entries queued together share the listing of their package
+            for group in group_entries(language, entries):
+                unlimited = worklist.budgets[group[0]] is None
+                future = executor.submit(
+                    _timed_group, language, group, known, unlimited
+                )
+                pending[future] = group
+
+        worklist.submit = submit
+        worklist.schedule(packages, depth)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = pending.pop(future)
+                responses, duration = future.result()
+                for package_d, (dep_resp, res_deps) in zip(group, responses):
+                    # dependencies are queued before the response is handed out
+                    key = resolved_key(language, package_d, dep_resp)
+                    worklist.resolved(package_d, res_deps, key)
+                    yield package_d, dep_resp, res_deps, duration
+
+
+def _pipelined_requests(
+    language: str,
+    packages: List[str],
+    depth: Optional[int] = None,
+    result: Optional[list] = None,
+    jobs: int = 1,
+    _graph: Optional[Dict[str, Tuple[str, Set[str]]]] = None,
+    _queued: Optional[Set[str]] = None,
+) -> List[Any]:
+    """
+    Worklist implementation of make_multiple_requests without level barriers.
+    Responses are collected and returned in the order of the level scheduler.
+    :param jobs: number of packages fetched in parallel
+    :param _graph: optional dict to record the version and dependencies of every entry
+    :param _queued: canonical entries not to be queued
+    """
+    if result is None:
+        result = []
+    start = time.perf_counter()
+    durations: Dict[str, float] = {}
+    responses: Dict[str, Any] = {}
+    worklist = _Worklist(language)
+    worklist.queued.update(_queued or ())
+    for package_d, dep_resp, _, duration in _iter_pipelined(
+        language, packages, depth, worklist, jobs
+    ):
+        responses[package_d] = dep_resp
+        durations[package_d] = duration
+    elapsed = time.perf_counter() - start
+    if _graph is not None:
+        for package_d, dep_resp in responses.items():
+            version = response_key(package_d, dep_resp)[1]
+            _graph[package_d] = (version, worklist.children[package_d])
+    levels = worklist.levels(packages)
+    for level in levels:
+        result.extend(responses[package_d] for package_d in level)
+    estimate = _level_barrier_estimate(levels, durations, jobs)
+    run_stats.record("pipeline_seconds", elapsed)
+    run_stats.record("level_barrier_estimate_seconds", estimate)
+    run_stats.record("pipeline_seconds_saved", estimate - elapsed)
+    logging.info(
+        "Pipelined resolution took %.2fs, about %.2fs less than level barriers",
+        elapsed,
+        estimate - elapsed,
+    )
+    return result
+
+
+async def async_query_package(
+    language: str,
+    package_d: str,
+    client: Optional[httpx.AsyncClient] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[dict | Result | List[Result], Set[str]]:
+    """
+    Non-blocking query_package
+    :param language: python, javascript or go
+    :param package_d: package name optionally followed by ;version constraint
+    :param client: async http client to reuse
+    :param semaphore: limits concurrent requests across calls
+    :return: parsed result and dependencies of the resolved version
+    """
+    name_ver = package_d.rsplit(";", 1)
+    version = name_ver[1] if len(name_ver) > 1 else ""
+    return await async_make_single_request(
+        language, name_ver[0], version, client=client, semaphore=semaphore
+    )
+
+
+async def async_make_multiple_requests(
+    language: str,
+    packages: List[str],
+    depth: Optional[int] = None,
+    result: Optional[list] = None,
+    concurrency: int = ASYNC_CONCURRENCY,
+    client: Optional[httpx.AsyncClient] = None,
+) -> List[Any]:
+    """
+    Obtain license and dependency information for list of packages
+    from within an event loop, queueing dependencies as soon as found.
+    :param language: python, javascript or go
+    :param packages: a list of dependencies in each language
+    :param depth: depth of recursion, None for no limit and 0 for input parsing alone
+    :param result: optional result object to append to
+    :param concurrency: maximum number of requests in flight
+    :param client: async http client to reuse, a new one is created if missing
+    :return: result object with name version license and dependencies
+    """
+    if client is None:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(
+            follow_redirects=True, limits=limits
+        ) as new_client:
+            return await async_make_multiple_requests(
+                language, packages, depth, result, concurrency, new_client
+            )
+    if result is None:
+        result = []
+    semaphore = asyncio.Semaphore(concurrency)
+    known: Dict[str, Tuple[Any, Set[str]]] = {}
+    responses: Dict[str, Any] = {}
+    pending: Dict[asyncio.Task, str] = {}
+
+    async def query(package_d: str, unlimited: bool):
+        if package_d in known:
+            return known[package_d]
+        response = await async_query_package(language, package_d, client, semaphore)
+        if unlimited:
+            splice_closure(language, package_d, response[0], known)
+        return response
+
+    def submit(entries: List[str]) -> None:
+        for package_d in entries:
+            unlimited = worklist.budgets[package_d] is None
+            pending[asyncio.create_task(query(package_d, unlimited))] = package_d
+
+    worklist = _Worklist(language, submit)
+    worklist.schedule(packages, depth)
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            package_d = pending.pop(task)
+            responses[package_d], res_deps = task.result()
+            key = resolved_key(language, package_d, responses[package_d])
+            worklist.resolved(package_d, res_deps, key)
+    if depth is None:
+        graph = {
+            package_d: (
+                response_key(package_d, dep_resp)[1],
+                worklist.children[package_d],
+            )
+            for package_d, dep_resp in responses.items()
+        }
+        record_closures(language, graph)
+    for level in worklist.levels(packages):
+        result.extend(responses[package_d] for package_d in level)
+    return result
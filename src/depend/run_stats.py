@@ -0,0 +1,79 @@
+"""Counters collected while resolving dependencies"""
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+# lru_cache wrapped functions by name, and their cache_info when the run started
+_caches: Dict[str, Callable[..., Any]] = {}
+_baselines: Dict[str, Any] = {}
+
+
+def record(key: str, amount: float = 1) -> None:
+    """
+    Increment a counter for the current run
+    :param key: name of the statistic
+    :param amount: value to add to the statistic
+    """
+    with _lock:
+        _counters[key] += amount
+
+
+def _cache_delta(name: str, counters: Counter) -> None:
+    """
+    Add hits and misses of a tracked cache since the run started
+    :param name: prefix the cache is tracked under
+    :param counters: counters to add them to
+    """
+    info, base = _caches[name].cache_info(), _baselines[name]
+    for key, delta in [
+        (name + "_hits", info.hits - base.hits),
+        (name + "_misses", info.misses - base.misses),
+    ]:
+        if delta:
+            counters[key] += delta
+
+
+def track_cache(name: str, cached: Callable[..., Any]) -> None:
+    """
+    Report hits and misses of a lru_cache wrapped function as name_hits
+    and name_misses, read from its cache_info so lookups cost nothing extra
+    :param name: prefix of the statistics
+    :param cached: function wrapped with functools.lru_cache
+    """
+    with _lock:
+        _caches[name] = cached
+        _baselines[name] = cached.cache_info()
+
+
+def clear_cache(name: str) -> None:
+    """
+    Clear a tracked cache, keeping the hits and misses it counted this run
+    :param name: prefix the cache is tracked under
+    """
+    with _lock:
+        _cache_delta(name, _counters)
+        _caches[name].cache_clear()
+        _baselines[name] = _caches[name].cache_info()
+
+
+def snapshot() -> Dict[str, float]:
+    """
+    Returns a copy of all statistics recorded in the current run
+    """
+    with _lock:
+        counters = Counter(_counters)
+        for name in _caches:
+            _cache_delta(name, counters)
+        return dict(sorted(counters.items()))
+
+
+def reset() -> None:
+    """
+    Clears statistics before a new run
+    """
+    with _lock:
+        _counters.clear()
+        for name, cached in _caches.items():
+            _baselines[name] = cached.cache_info()
@@ -0,0 +1,468 @@
+"""Persistent store of package metadata keyed by ecosystem, name and version"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from requests_cache.backends.sqlite import get_cache_path
+
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+from depend.dependencies.helper import canonical_name, fix_constraint
+from depend.dependencies.py.py_helper import split_extras, target_tag
+from depend.dependencies.version_batch import resolve_versions
+
+VERSIONS_EXPIRY = timedelta(days=1)
+# ETag, Last-Modified and body of a stored GitHub response
+Validators = Tuple[Optional[str], Optional[str], str]
+
+
+class MetadataStore:
+    """
+    SQLite backed store of parsed results.
+    Published versions of a package never change, so results never expire.
+    Only version lists are refreshed once they are older than versions_expiry.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        versions_expiry: timedelta = VERSIONS_EXPIRY,
+        enabled: bool = True,
+    ):
+        """
+        :param db_path: sqlite file, relative paths are placed in the user cache dir
+        :param versions_expiry: time after which version lists are fetched again
+        :param enabled: store is bypassed if false
+        """
+        self.db_path = db_path
+        self.versions_expiry = versions_expiry
+        self.enabled = enabled
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Lazily opened connection shared by all threads
+        """
+        with self._lock:
+            if self._connection is None:
+                path = str(self.db_path)
+                if path != ":memory:":
+                    path = str(get_cache_path(path, use_cache_dir=True))
+                self._connection = sqlite3.connect(path, check_same_thread=False)
+                self._connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS results (
+                        language TEXT, pkg_name TEXT, pkg_ver TEXT,
+                        result TEXT, stored_at REAL,
+                        PRIMARY KEY (language, pkg_name, pkg_ver)
+                    );
+                    CREATE TABLE IF NOT EXISTS versions (
+                        language TEXT, pkg_name TEXT,
+                        versions TEXT, fetched_at REAL,
+                        PRIMARY KEY (language, pkg_name)
+                    );
+                    CREATE TABLE IF NOT EXISTS closures (
+                        language TEXT, pkg_name TEXT, pkg_ver TEXT,
+                        members TEXT, stored_at REAL,
+                        PRIMARY KEY (language, pkg_name, pkg_ver)
+                    );
+                    CREATE TABLE IF NOT EXISTS snapshots (
+                        repo TEXT, sha TEXT, snapshot TEXT, stored_at REAL,
+                        PRIMARY KEY (repo, sha)
+                    );
+                    CREATE TABLE IF NOT EXISTS validators (
+                        url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+                        body TEXT, stored_at REAL
+                    );
+                    """
+                )
+            return self._connection
+
+    @staticmethod
+    def _scope(language: str) -> str:
+        """
+        Key under which results and closures of a language are stored.
+        Python dependencies depend on the environment markers are evaluated against.
+        :param language: language of the package
+        """
+        tag = target_tag() if language == "python" else ""
+        return f"{language}[{tag}]" if tag else language
+
+    @classmethod
+    def _key(cls, language: str, pkg_name: str, pkg_ver: str) -> tuple:
+        """
+        Key of a package version in the results and closures tables,
+        names the registry treats as identical share it
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        """
+        return cls._scope(language), canonical_name(language, pkg_name), pkg_ver
+
+    @staticmethod
+    def _listed_name(language: str, pkg_name: str) -> str:
+        """
+        Key of a package in the versions table, extras do not change the
+        versions a registry lists
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        """
+        if language == "python":
+            pkg_name = split_extras(pkg_name)[0]
+        return canonical_name(language, pkg_name)
+
+    def _execute(self, query: str, params: tuple = ()) -> list:
+        with self._lock:
+            with self.connection as conn:
+                return conn.execute(query, params).fetchall()
+
+    def get_result(
+        self, language: str, pkg_name: str, pkg_ver: str
+    ) -> Optional[Result]:
+        """
+        Result previously stored for a package version
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        :return: stored result, None if missing
+        """
+        if not self.enabled:
+            return None
+        rows = self._execute(
+            "SELECT result FROM results WHERE language=? AND pkg_name=? AND pkg_ver=?",
+            self._key(language, pkg_name, pkg_ver),
+        )
+        run_stats.record("store_hits" if rows else "store_misses")
+        return json.loads(rows[0][0]) if rows else None
+
+    def has_result(self, language: str, pkg_name: str, pkg_ver: str) -> bool:
+        """
+        Check if the result of a package version is stored
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        """
+        if not self.enabled:
+            return False
+        return bool(
+            self._execute(
+                "SELECT 1 FROM results WHERE language=? AND pkg_name=? AND pkg_ver=?",
+                self._key(language, pkg_name, pkg_ver),
+            )
+        )
+
+    def put_result(
+        self, language: str, pkg_name: str, pkg_ver: str, result: Result
+    ) -> None:
+        """
+        Persist the result of a package version
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        :param result: parsed result to store
+        """
+        if not self.enabled:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (
+                *self._key(language, pkg_name, pkg_ver),
+                json.dumps(result),
+                time.time(),
+            ),
+        )
+
+    def get_versions(self, language: str, pkg_name: str) -> Optional[list]:
+        """
+        Versions listed for a package unless they have expired
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :return: list of versions, None if missing or expired
+        """
+        if not self.enabled:
+            return None
+        rows = self._execute(
+            "SELECT versions FROM versions WHERE language=? AND pkg_name=? "
+            "AND fetched_at>=?",
+            (
+                language,
+                self._listed_name(language, pkg_name),
+                time.time() - self.versions_expiry.total_seconds(),
+            ),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def put_versions(self, language: str, pkg_name: str, versions: list) -> None:
+        """
+        Persist the versions listed for a package.
+        Closures in which the package now resolves differently are invalidated.
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param versions: all available versions
+        """
+        if not self.enabled:
+            return
+        name = self._listed_name(language, pkg_name)
+        encoded = json.dumps(versions)
+        previous = self._execute(
+            "SELECT versions FROM versions WHERE language=? AND pkg_name=?",
+            (language, name),
+        )
+        self._execute(
+            "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?)",
+            (language, name, encoded, time.time()),
+        )
+        if previous and previous[0][0] != encoded:
+            self._invalidate_closures(language, name, versions)
+
+    def _invalidate_closures(self, language: str, pkg_name: str, versions: list):
+        """
+        Remove closures with a member that no longer resolves to the same version
+        :param language: language of the package
+        :param pkg_name: key of the package whose version list changed
+        :param versions: new list of versions
+        """
+        # members are matched on their key below, the pattern only narrows rows down
+        pattern = "%" + json.dumps({"name": pkg_name})[1:-2] + "%"
+        closures, constraints, expected = [], [], []
+        for scope, name, ver, members in self._execute(
+            "SELECT language, pkg_name, pkg_ver, members FROM closures "
+            "WHERE (language=? OR language LIKE ?) AND members LIKE ?",
+            (language, language + "[%", pattern),
+        ):
+            for member in json.loads(members):
+                if member["pinned"] or (
+                    self._listed_name(language, member["name"]) != pkg_name
+                ):
+                    continue
+                constraint = member["package"].rsplit(";", 1)[1:] or [""]
+                closures.append((scope, name, ver))
+                constraints.append(fix_constraint(language, constraint[0]))
+                expected.append(member["version"])
+        # every constraint on the package is resolved in one batch
+        resolved = resolve_versions(versions, constraints)
+        for key in dict.fromkeys(
+            key for key, new, old in zip(closures, resolved, expected) if new != old
+        ):
+            self._execute(
+                "DELETE FROM closures WHERE language=? AND pkg_name=? AND pkg_ver=?",
+                key,
+            )
+            run_stats.record("closures_invalidated")
+
+    def get_closure(
+        self, language: str, pkg_name: str, pkg_ver: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Every package below a package version, provided the version lists
+        used to resolve them have not expired
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        :return: closure members, None if missing or not usable
+        """
+        if not self.enabled:
+            return None
+        rows = self._execute(
+            "SELECT members FROM closures WHERE language=? AND pkg_name=? AND pkg_ver=?",
+            self._key(language, pkg_name, pkg_ver),
+        )
+        if not rows:
+            return None
+        members = json.loads(rows[0][0])
+        ranged = {
+            self._listed_name(language, member["name"])
+            for member in members
+            if not member["pinned"]
+        }
+        if ranged:
+            placeholders = ",".join("?" * len(ranged))
+            fresh = self._execute(
+                f"SELECT COUNT(*) FROM versions WHERE language=? AND fetched_at>=? "
+                f"AND pkg_name IN ({placeholders})",
+                (
+                    language,
+                    time.time() - self.versions_expiry.total_seconds(),
+                    *ranged,
+                ),
+            )[0][0]
+            if fresh != len(ranged):
+                return None
+        return members
+
+    def put_closure(
+        self,
+        language: str,
+        pkg_name: str,
+        pkg_ver: str,
+        members: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Persist every package below a package version
+        :param language: language of the package
+        :param pkg_name: package name as queried
+        :param pkg_ver: resolved version
+        :param members: dicts with package entry, name, version, pinned and deps
+        """
+        if not self.enabled:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO closures VALUES (?, ?, ?, ?, ?)",
+            (
+                *self._key(language, pkg_name, pkg_ver),
+                json.dumps(members),
+                time.time(),
+            ),
+        )
+
+    def get_snapshot(self, repo: str, sha: str) -> Optional[Dict[str, Any]]:
+        """
+        Repository snapshot previously stored for a commit
+        :param repo: owner/name of the repository
+        :param sha: commit the snapshot was taken at
+        :return: stored snapshot, None if missing
+        """
+        if not self.enabled:
+            return None
+        rows = self._execute(
+            "SELECT snapshot FROM snapshots WHERE repo=? AND sha=?", (repo, sha)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def put_snapshot(self, repo: str, sha: str, snapshot: Dict[str, Any]) -> None:
+        """
+        Persist a repository snapshot, commits never change so it never expires
+        :param repo: owner/name of the repository
+        :param sha: commit the snapshot was taken at
+        :param snapshot: files and license of the repository at the commit
+        """
+        if not self.enabled:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+            (repo, sha, json.dumps(snapshot), time.time()),
+        )
+
+    def get_validators(self, url: str) -> Optional[Validators]:
+        """
+        Validators and body of a GitHub response stored by an earlier run.
+        They are only used to revalidate, as branches move, so they are kept
+        whether the store is enabled or not.
+        :param url: API url
+        :return: validators, None if nothing is stored
+        """
+        rows = self._execute(
+            "SELECT etag, last_modified, body FROM validators WHERE url=?", (url,)
+        )
+        return rows[0] if rows else None
+
+    def put_validators(
+        self, url: str, etag: Optional[str], last_modified: Optional[str], body: str
+    ) -> None:
+        """
+        Persist a GitHub response that carries validators
+        :param url: API url
+        :param etag: ETag header
+        :param last_modified: Last-Modified header
+        :param body: response text
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, body, time.time()),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary of the contents of the store
+        :return: counts of stored results per language and size on disk
+        """
+        languages = dict(
+            self._execute("SELECT language, COUNT(*) FROM results GROUP BY language")
+        )
+        versions = self._execute("SELECT COUNT(*) FROM versions")[0][0]
+        closures = self._execute("SELECT COUNT(*) FROM closures")[0][0]
+        snapshots = self._execute("SELECT COUNT(*) FROM snapshots")[0][0]
+        size = 0
+        if str(self.db_path) != ":memory:":
+            size = os.path.getsize(get_cache_path(self.db_path, use_cache_dir=True))
+        return {
+            "results": sum(languages.values()),
+            "languages": languages,
+            "version_lists": versions,
+            "closures": closures,
+            "snapshots": snapshots,
+            "size_bytes": size,
+        }
+
+    def prune(
+        self, language: Optional[str] = None, older_than: Optional[timedelta] = None
+    ) -> int:
+        """
+        Remove expired version lists, and results and closures matching the
+        filters given. Results are kept if neither filter is given.
+        :param language: only remove results of this language
+        :param older_than: only remove results stored before this long ago
+        :return: number of results removed
+        """
+        conditions = ""
+        params: tuple = ()
+        if language:
+            conditions += " AND (language=? OR language LIKE ?)"
+            params += (language, language + "[%")
+        if older_than is not None:
+            conditions += " AND stored_at<?"
+            params += (time.time() - older_than.total_seconds(),)
+        with self._lock:
+            with self.connection as conn:
+                conn.execute(
+                    "DELETE FROM versions WHERE fetched_at<?",
+                    (time.time() - self.versions_expiry.total_seconds(),),
+                )
+                if language is None and older_than is None:
+                    return 0
+                conn.execute("DELETE FROM closures WHERE 1=1" + conditions, params)
+                return conn.execute(
+                    "DELETE FROM results WHERE 1=1" + conditions, params
+                ).rowcount
+
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every stored result along with its key
+        """
+        for language, pkg_name, pkg_ver, result in self._execute(
+            "SELECT language, pkg_name, pkg_ver, result FROM results "
+            "ORDER BY language, pkg_name, pkg_ver"
+        ):
+            yield {
+                "language": language,
+                "pkg_name": pkg_name,
+                "pkg_ver": pkg_ver,
+                "result": json.loads(result),
+            }
+
+    def export(self, path: str | Path) -> int:
+        """
+        Write every stored result to a newline delimited JSON file
+        :param path: file to write to
+        :return: number of results exported
+        """
+        count = 0
+        with open(path, "w") as f:
+            for entry in self.iter_results():
+                f.write(json.dumps(entry) + "\n")
+                count += 1
+        return count
+
+
+# opted into with --store, so runs and tests leave the user cache dir alone,
+# only GitHub validators are always kept to revalidate responses across runs
+metadata_store = MetadataStore(
+    os.environ.get("DEPEND_STORE", "depend_store.sqlite"), enabled=False
+)
@@ -0,0 +1,220 @@
+"""VCS backend for any git host, reading blobs from local bare mirrors"""
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from requests_cache.backends.sqlite import get_cache_path
+
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+from depend.error import VCSNotSupportedError
+from depend.vcs.github_worker import fill_result, verify_run
+from depend.vcs.snapshot import Snapshot, wanted_file
+
+MIRROR_DIR = "depend_mirrors"
+# remote urls come from registry metadata, other transports can run commands
+ALLOWED_SCHEMES = ("https", "ssh", "git", "file")
+# seconds a git command may take, a clone of a large remote included
+GIT_TIMEOUT = 600
+# mirror mode and the directory mirrors are kept in
+_mirrors: Dict[str, Any] = {"enabled": False, "dir": None}
+# remotes fetched in this run, and a lock per remote so it is cloned once
+_fetched: Set[str] = set()
+_remote_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def set_mirror_mode(enabled: bool = False, cache_dir: Optional[Path] = None) -> None:
+    """
+    Look repositories of every host up in local bare mirrors
+    :param enabled: mirror mode is used if true
+    :param cache_dir: directory mirrors are kept in, the user cache dir if not given
+    """
+    _mirrors.update(enabled=enabled, dir=cache_dir)
+    _fetched.clear()
+
+
+def mirror_mode() -> bool:
+    """
+    Check if repositories are read from local mirrors
+    """
+    return _mirrors["enabled"]
+
+
+def parse_remote(dependency: str) -> Tuple[str, str]:
+    """
+    Remote url and ref of a repo url, as linked from GitHub, GitLab or Gitea
+    :param dependency: repo url, https is assumed if it has no scheme
+    :return: remote url and the ref it names, empty for the default branch
+    """
+    if "://" not in dependency:
+        dependency = "https://" + dependency
+    if match := re.match(
+        r"(.+?)(?:/-)?/(?:tree|src/branch|src/tag|src/commit)/([^/\s]+)", dependency
+    ):
+        return match.group(1), match.group(2)
+    return dependency.rstrip("/"), ""
+
+
+def mirror_path(url: str) -> Path:
+    """
+    Directory of the bare mirror of a remote
+    :param url: remote url
+    """
+    name = re.sub(r"[^\w.-]+", "_", url.split("://")[-1]).strip("_")
+    digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+    cache_dir = _mirrors["dir"] or get_cache_path(MIRROR_DIR, use_cache_dir=True)
+    return Path(cache_dir) / f"{name[-60:]}-{digest}.git"
+
+
+def run_git(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    """
+    Run git without ever prompting for credentials, so a remote asking for
+    them fails instead of waiting on the terminal
+    :param args: git arguments
+    :raises subprocess.CalledProcessError: git failed
+    :raises subprocess.TimeoutExpired: git took longer than GIT_TIMEOUT
+    """
+    return subprocess.run(
+        ["git", *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        timeout=GIT_TIMEOUT,
+        **kwargs,
+    )
+
+
+def git(path: Path, *args: str, **kwargs) -> subprocess.CompletedProcess:
+    """
+    Run a git command against a mirror
+    :param path: mirror directory
+    :param args: git subcommand and its arguments
+    :raises subprocess.CalledProcessError: git failed
+    :raises subprocess.TimeoutExpired: git took longer than GIT_TIMEOUT
+    """
+    return run_git("--git-dir", str(path), *args, **kwargs)
+
+
+def update_mirror(url: str) -> Path:
+    """
+    Clone a remote as a bare mirror, or fetch what changed since the last run.
+    Each remote is fetched once per run.
+    :param url: remote url
+    :return: mirror directory
+    :raises VCSNotSupportedError: the url uses a transport other than ALLOWED_SCHEMES
+    :raises subprocess.SubprocessError: the remote can not be cloned or fetched
+    """
+    if urlparse(url).scheme not in ALLOWED_SCHEMES:
+        raise VCSNotSupportedError(url)
+    with _locks_lock:
+        lock = _remote_locks.setdefault(url, threading.Lock())
+    path = mirror_path(url)
+    with lock:
+        if url in _fetched:
+            return path
+        if (path / "HEAD").is_file():
+            git(path, "fetch", "--prune", "--quiet", "origin")
+            run_stats.record("git_mirror_fetches")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            run_git("clone", "--mirror", "--quiet", "--", url, str(path))
+            run_stats.record("git_mirror_clones")
+        _fetched.add(url)
+    return path
+
+
+def resolve_commit(path: Path, ref: str) -> Tuple[str, str]:
+    """
+    Commit a branch, tag or sha points to, the default branch if it does not exist
+    :param path: mirror directory
+    :param ref: ref to look for, empty for the default branch
+    :return: ref used and the sha of its commit, empty if neither exists
+    """
+    if ref:
+        try:
+            sha = git(path, "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}")
+            return ref, sha.stdout.decode().strip()
+        except subprocess.CalledProcessError:
+            logging.info(f"{ref} not found, defaulting to the default branch")
+    try:
+        branch = git(path, "symbolic-ref", "--short", "HEAD").stdout.decode().strip()
+        sha = git(path, "rev-parse", "--verify", "--quiet", "HEAD^{commit}")
+    except subprocess.CalledProcessError:
+        # an empty repository has no commit
+        return "", ""
+    return branch, sha.stdout.decode().strip()
+
+
+def read_blobs(path: Path, sha: str, files: List[str]) -> Dict[str, str]:
+    """
+    Content of files at a commit, read in a single git process
+    :param path: mirror directory
+    :param sha: commit
+    :param files: paths of the files
+    :return: decoded content of each file found
+    """
+    requests = "".join(f"{sha}:{name}\n" for name in files)
+    output = git(path, "cat-file", "--batch", input=requests.encode()).stdout
+    contents = {}
+    for name in files:
+        header, _, output = output.partition(b"\n")
+        if header.endswith(b" missing"):
+            continue
+        size = int(header.split()[-1])
+        # each blob is followed by a newline
+        contents[name] = output[:size].decode(errors="replace")
+        output = output[size + 1 :]
+    return contents
+
+
+def git_snapshot(dependency: str) -> Optional[Snapshot]:
+    """
+    Snapshot of the repository of a dependency read from its local mirror,
+    shaped like those taken from GitHub
+    :param dependency: repo url
+    :return: snapshot, None if the repository can not be cloned
+    :raises VCSNotSupportedError: the url uses a transport other than ALLOWED_SCHEMES
+    """
+    url, ref = parse_remote(dependency)
+    try:
+        path = update_mirror(url)
+    except (subprocess.SubprocessError, OSError) as e:
+        logging.error(f"{dependency} cannot be mirrored: {e}")
+        return None
+    used_ref, sha = resolve_commit(path, ref)
+    files: List[str] = []
+    if sha:
+        tree = git(path, "ls-tree", "-z", sha).stdout.decode()
+        for entry in filter(None, tree.split("\0")):
+            info, _, name = entry.partition("\t")
+            if info.split()[1] == "blob":
+                files.append(name)
+    wanted = [name for name in files if wanted_file(name)]
+    return {
+        "files": files,
+        "contents": read_blobs(path, sha, wanted) if wanted else {},
+        "license": None,
+        "ref": used_ref,
+        "sha": sha,
+    }
+
+
+def handle_git(language: str, dependency: str, result: Result) -> None:
+    """
+    VCS fallthrough for any git host, through a local mirror
+    :param language: primary language of the package
+    :param dependency: repo url
+    :param result: object to mutate
+    :raises VCSNotSupportedError: the url uses a transport other than ALLOWED_SCHEMES
+    """
+    if retrievable_keys := verify_run(language, result):
+        if (snapshot := git_snapshot(dependency)) is not None:
+            fill_result(language, dependency, result, retrievable_keys, snapshot)
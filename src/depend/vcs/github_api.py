@@ -0,0 +1,174 @@
+"""GitHub REST API calls, revalidated with ETag and Last-Modified across runs"""
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from requests import RequestException, Response
+
+from depend import run_stats
+from depend.dep_helper import requests
+from depend.error import VCSDeferredError
+from depend.handle_env import get_github_scheduler
+from depend.store import metadata_store
+
+API_URL = "https://api.github.com"
+# raw file host, not counted against the API rate limit
+RAW_URL = "https://raw.githubusercontent.com"
+# seconds a token is skipped when GitHub gives no reset time, a rate limit window
+RESET_WAIT = 3600
+# api and raw file hosts, replaced for GitHub Enterprise or stand-in servers
+_hosts: Dict[str, str] = {"api": API_URL, "raw": RAW_URL}
+# seconds to wait for GitHub
+GITHUB_TIMEOUT = 30
+# GraphQL and raw responses are never served by the http cache, as branches move
+NO_STORE = {"Cache-Control": "no-store"}
+
+
+def set_github_hosts(api_url: Optional[str] = None, raw_url: Optional[str] = None):
+    """
+    Hosts GitHub requests are sent to
+    :param api_url: REST API root, api.github.com if not given
+    :param raw_url: raw file host, raw.githubusercontent.com if not given
+    """
+    _hosts.update(
+        api=(api_url or API_URL).rstrip("/"), raw=(raw_url or RAW_URL).rstrip("/")
+    )
+
+
+def github_host(kind: str) -> str:
+    """
+    Root url of a GitHub host
+    :param kind: api or raw
+    """
+    return _hosts[kind]
+
+
+def github_request(method: str, url: str, **kwargs) -> Optional[Response]:
+    """
+    Send a request with the next token of the pool that has quota.
+    A token drained mid request is skipped and the next one tried.
+    :param method: HTTP method
+    :param url: API url
+    :param kwargs: passed on to requests, headers are merged with the token's
+    :return: first response not refused for quota, None if GitHub can not be reached
+    :raises VCSDeferredError: every token is drained
+    """
+    scheduler = get_github_scheduler()
+    extra_headers = kwargs.pop("headers", {})
+    while (index := scheduler.acquire()) is not None:
+        headers = {
+            "Accept": "application/vnd.github+json",
+            **scheduler.headers(index),
+            **extra_headers,
+        }
+        try:
+            response = requests.request(
+                method, url, headers=headers, timeout=GITHUB_TIMEOUT, **kwargs
+            )
+        except RequestException as e:
+            logging.error(f"GitHub cannot be reached: {e}")
+            return None
+        if getattr(response, "from_cache", False):
+            # no quota was spent and its rate limit headers are out of date
+            return response
+        run_stats.record("github_requests")
+        if response.status_code in (403, 429) and (
+            response.headers.get("x-ratelimit-remaining") == "0"
+            or "retry-after" in response.headers
+        ):
+            reset = response.headers.get("x-ratelimit-reset")
+            if reset is None:
+                wait = response.headers.get("retry-after") or RESET_WAIT
+                reset = time.time() + float(wait)
+            scheduler.drained(index, float(reset))
+            continue
+        scheduler.observe(index, response.headers)
+        return response
+    raise VCSDeferredError(url, scheduler.reset_time())
+
+
+def github_get(path: str) -> Optional[Any]:
+    """
+    GET an API path, revalidating the response stored by an earlier run.
+    GitHub does not count a 304 against the rate limit. Responses still fresh
+    in the http cache are served from it.
+    :param path: path under the API root, such as /repos/owner/name
+    :return: parsed body, None if GitHub answers with an error
+    :raises VCSDeferredError: every token is drained
+    """
+    url = github_host("api") + path
+    headers = {}
+    if (stored := metadata_store.get_validators(url)) is not None:
+        etag, last_modified, _ = stored
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    if (response := github_request("GET", url, headers=headers)) is None:
+        return None
+    if getattr(response, "from_cache", False):
+        run_stats.record("github_quota_saved")
+        return response.json()
+    if response.status_code == 304 and stored is not None:
+        run_stats.record("github_quota_saved")
+        return json.loads(stored[2])
+    if response.status_code != 200:
+        return None
+    etag = response.headers.get("etag")
+    last_modified = response.headers.get("last-modified")
+    if etag or last_modified:
+        metadata_store.put_validators(url, etag, last_modified, response.text)
+    return response.json()
+
+
+def github_graphql(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Run a GraphQL query, retried on the next token if GitHub reports the
+    current one rate limited
+    :param query: query document
+    :return: data of the response, fields GitHub could not resolve are None
+    :raises VCSDeferredError: every token is drained
+    """
+    while True:
+        response = github_request(
+            "POST",
+            github_host("api") + "/graphql",
+            json={"query": query},
+            headers=NO_STORE,
+        )
+        if response is None:
+            return None
+        if response.status_code != 200:
+            logging.error(f"{response.status_code}: GitHub GraphQL query failed")
+            return None
+        body = response.json()
+        errors = body.get("errors") or []
+        if response.headers.get("x-ratelimit-remaining") == "0" and any(
+            error.get("type") == "RATE_LIMITED" for error in errors
+        ):
+            # the token was marked drained from the response headers
+            continue
+        for error in errors:
+            logging.info(f"GitHub GraphQL: {error.get('message')}")
+        return body.get("data")
+
+
+def github_raw(repo_name: str, ref: str, path: str) -> Optional[str]:
+    """
+    Content of a file from the raw file host, which costs no quota
+    :param repo_name: owner/name of the repository
+    :param ref: commit, branch or tag
+    :param path: path of the file in the repository
+    :return: file content, None if it can not be read
+    """
+    try:
+        response = requests.get(
+            f"{github_host('raw')}/{repo_name}/{ref}/{path}",
+            headers=NO_STORE,
+            timeout=GITHUB_TIMEOUT,
+        )
+    except RequestException as e:
+        logging.error(f"GitHub cannot be reached: {e}")
+        return None
+    return response.text if response.status_code == 200 else None
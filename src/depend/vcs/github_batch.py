@@ -0,0 +1,217 @@
+"""Batched VCS enrichment, many GitHub repositories per GraphQL query"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import depend.constants as constants
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+from depend.error import VCSDeferredError
+from depend.handle_env import get_github_scheduler
+from depend.vcs.github_api import github_graphql
+from depend.vcs.github_scheduler import DeferredLookup
+from depend.vcs.github_worker import (
+    fill_result,
+    github_snapshot,
+    parse_repo,
+    verify_run,
+)
+from depend.vcs.snapshot import Snapshot, complete_snapshot, remember_snapshot
+from depend.vcs.vcs_budget import VCSBudget
+
+# repositories per query, each of them asks for every file in wanted_files
+GRAPHQL_BATCH = 10
+# owner, name and ref of a repository, the ref is empty for the default branch
+RepoKey = Tuple[str, str, str]
+# language, repo url, result and keys of result to fill in
+Lookup = Tuple[str, str, Result, List[str]]
+
+
+def wanted_files() -> List[str]:
+    """
+    Every root file the VCS fallback reads, so batched snapshots can be stored
+    alongside those taken over REST. nuspec files are named after the package,
+    complete_snapshot reads them from the raw file host.
+    """
+    files = dict.fromkeys(constants.LICENSE_FILES)
+    for req_files in constants.REQ_FILES.values():
+        files.update(dict.fromkeys(f for f in req_files if f != ".nuspec"))
+    return list(files)
+
+
+def repo_query(alias: str, key: RepoKey, files: List[str]) -> str:
+    """
+    Query fragment for a repository at a ref and the wanted files in its root
+    :param alias: name of the fragment in the response
+    :param key: owner, name and ref of the repository
+    :param files: files whose text is asked for, aliased by their index
+    """
+    owner, name, ref = key
+    expression = ref or "HEAD"
+    lines = [
+        f"{alias}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{",
+        "  nameWithOwner",
+        "  licenseInfo { name }",
+        "  defaultBranchRef { name }",
+        "  latestRelease { tagName }",
+        f"  commit: object(expression: {json.dumps(expression)}) {{ oid }}",
+        f"  tree: object(expression: {json.dumps(expression + ':')}) "
+        "{ ... on Tree { entries { name type } } }",
+    ]
+    lines += [
+        f"  f{index}: object(expression: {json.dumps(expression + ':' + path)}) "
+        "{ ... on Blob { text } }"
+        for index, path in enumerate(files)
+    ]
+    return "\n".join("  " + line for line in lines) + "\n  }"
+
+
+def graphql_snapshot(repo: Dict[str, Any], ref: str, files: List[str]) -> Snapshot:
+    """
+    Snapshot from a repository fragment, shaped like those taken over REST
+    :param repo: repository fragment of the response
+    :param ref: ref looked up, empty for the default branch
+    :param files: files asked for, in the order of their aliases
+    """
+    entries = (repo.get("tree") or {}).get("entries", [])
+    names = [entry["name"] for entry in entries if entry["type"] == "blob"]
+    contents = {}
+    for index, path in enumerate(files):
+        blob = repo.get(f"f{index}") or {}
+        if path in names and blob.get("text") is not None:
+            contents[path] = blob["text"]
+    return {
+        "files": names,
+        "contents": contents,
+        "license": (repo.get("licenseInfo") or {}).get("name"),
+        "ref": ref or (repo.get("defaultBranchRef") or {}).get("name", ""),
+        "sha": (repo.get("commit") or {}).get("oid", ""),
+        "release": (repo.get("latestRelease") or {}).get("tagName"),
+    }
+
+
+def enrich_github(
+    lookups: Iterable[DeferredLookup],
+    batch_size: int = GRAPHQL_BATCH,
+    budget: Optional[VCSBudget] = None,
+) -> None:
+    """
+    Fill in results from GitHub, batch_size repositories per GraphQL query.
+    A repository and ref is asked for once however many packages point to it,
+    unknown refs fall back to the default branch as in handle_github.
+    Lookups left when every token is drained are deferred. Without a token,
+    or for queries GitHub does not answer, repositories are read over REST.
+    :param lookups: language, repo url and result of each lookup
+    :param batch_size: repositories per query
+    :param budget: checked before each query, lookups left are skipped once spent
+    """
+    repos: Dict[RepoKey, List[Lookup]] = {}
+    for language, dependency, result in lookups:
+        result["pkg_err"].pop("vcs", None)
+        if not (retrievable_keys := verify_run(language, result)):
+            continue
+        if repo_identifier := parse_repo(dependency):
+            owner, name, ref = repo_identifier.groups()
+            repos.setdefault((owner, name, ref or ""), []).append(
+                (language, dependency, result, retrievable_keys)
+            )
+        else:
+            logging.info(f"Unable to use VCS as unsupported: {dependency}")
+    files = wanted_files()
+    queue = list(repos)
+    done: Dict[RepoKey, Snapshot] = {}
+    if not get_github_scheduler().authenticated:
+        enrich_rest([repos[key] for key in queue], budget)
+        return
+    while queue:
+        if budget is not None and budget.spent():
+            for key in queue:
+                for _, dependency, result, _ in repos[key]:
+                    budget.skip(dependency, result)
+            return
+        chunk, queue = queue[:batch_size], queue[batch_size:]
+        query = "query {\n"
+        query += "\n".join(
+            repo_query(f"r{i}", key, files) for i, key in enumerate(chunk)
+        )
+        try:
+            data = github_graphql(query + "\n}")
+        except VCSDeferredError as e:
+            defer_lookups([repos[key] for key in chunk + queue], e.reset)
+            return
+        if data is None:
+            logging.warning(
+                "GitHub GraphQL query failed, reading its repositories over REST"
+            )
+            enrich_rest([repos[key] for key in chunk], budget)
+            continue
+        run_stats.record("github_graphql_queries")
+        run_stats.record("github_graphql_repos", len(chunk))
+        for index, key in enumerate(chunk):
+            owner, name, ref = key
+            if (repo := data.get(f"r{index}")) is None:
+                for _, dependency, _, _ in repos[key]:
+                    logging.error(f"{dependency} cannot be parsed")
+                continue
+            if repo.get("commit") is None and ref:
+                default = (owner, name, "")
+                if default in done:
+                    fill_lookups(repos[key], done[default])
+                else:
+                    if default not in repos:
+                        queue.append(default)
+                    repos.setdefault(default, []).extend(repos[key])
+                continue
+            snapshot = complete_snapshot(
+                repo["nameWithOwner"], graphql_snapshot(repo, ref, files)
+            )
+            done[key] = remember_snapshot(
+                repo["nameWithOwner"], snapshot["ref"], snapshot
+            )
+            fill_lookups(repos[key], snapshot)
+
+
+def enrich_rest(
+    repo_lookups: List[List[Lookup]], budget: Optional[VCSBudget] = None
+) -> None:
+    """
+    Fill in results over REST, one repository at a time
+    :param repo_lookups: lookups of each repository
+    :param budget: checked before each repository, lookups left are skipped once spent
+    """
+    for index, lookups in enumerate(repo_lookups):
+        if budget is not None and budget.spent():
+            for remaining in repo_lookups[index:]:
+                for _, dependency, result, _ in remaining:
+                    budget.skip(dependency, result)
+            return
+        try:
+            snapshot = github_snapshot(lookups[0][1])
+        except VCSDeferredError as e:
+            defer_lookups(repo_lookups[index:], e.reset)
+            return
+        if snapshot is not None:
+            fill_lookups(lookups, snapshot)
+
+
+def fill_lookups(lookups: List[Lookup], snapshot: Snapshot) -> None:
+    """
+    Fill in the results of every package pointing to a repository
+    :param lookups: lookups of the repository
+    :param snapshot: files of the repository at the ref looked up
+    """
+    for language, dependency, result, retrievable_keys in lookups:
+        fill_result(language, dependency, result, retrievable_keys, snapshot)
+
+
+def defer_lookups(lookups: List[List[Lookup]], reset: float) -> None:
+    """
+    Defer lookups until quota is available again
+    :param lookups: lookups of each repository left
+    :param reset: unix time of the first token reset
+    """
+    scheduler = get_github_scheduler()
+    for repo_lookups in lookups:
+        for language, dependency, result, _ in repo_lookups:
+            error = VCSDeferredError(dependency, reset)
+            scheduler.defer(language, dependency, result, error)
@@ -0,0 +1,117 @@
+"""Rotation of GitHub requests across a pool of tokens, by remaining quota"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+from depend.error import VCSDeferredError
+
+# lookups postponed while every token was drained: language, repo and result
+DeferredLookup = Tuple[str, str, Result]
+
+
+class GithubScheduler:
+    """
+    Hands out the tokens of a pool in turn.
+    Remaining quota is read from the headers of every response, so no request
+    is spent on the rate limit endpoint. A drained token is skipped until its
+    reset time, lookups arriving while every token is drained are deferred
+    instead of stopping the run.
+    """
+
+    def __init__(self, tokens: Sequence[Optional[str]]):
+        """
+        :param tokens: pool of tokens, None stands for unauthenticated requests
+        """
+        self.tokens = list(tokens) or [None]
+        self.resets: Dict[int, float] = {}
+        self.deferred: List[DeferredLookup] = []
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    @property
+    def authenticated(self) -> bool:
+        """
+        Check if the pool holds a token, GitHub refuses GraphQL queries without one
+        """
+        return any(self.tokens)
+
+    def acquire(self) -> Optional[int]:
+        """
+        Next token with quota left
+        :return: index of the token, None if every token is drained
+        """
+        now = time.time()
+        with self._lock:
+            for _ in range(len(self.tokens)):
+                index = self._turn % len(self.tokens)
+                self._turn += 1
+                if self.resets.get(index, 0) <= now:
+                    self.resets.pop(index, None)
+                    return index
+        return None
+
+    def headers(self, index: int) -> Dict[str, str]:
+        """
+        Authorization headers of a token
+        :param index: index of the token
+        """
+        token = self.tokens[index]
+        return {"Authorization": f"token {token}"} if token else {}
+
+    def drained(self, index: int, reset: float) -> None:
+        """
+        Skip a token until its quota is reset
+        :param index: index of the token out of quota
+        :param reset: unix time of the reset
+        """
+        with self._lock:
+            self.resets[index] = reset
+        run_stats.record("github_tokens_drained")
+        logging.warning(
+            f"GitHub token {index + 1} of {len(self.tokens)} drained until "
+            f"{datetime.fromtimestamp(reset).isoformat()}"
+        )
+
+    def observe(self, index: int, headers: Mapping[str, str]) -> None:
+        """
+        Track the quota of a token from the headers of a response
+        :param index: index of the token used
+        :param headers: response headers
+        """
+        if headers.get("x-ratelimit-remaining") == "0":
+            self.drained(index, float(headers.get("x-ratelimit-reset") or 0))
+
+    def reset_time(self) -> float:
+        """
+        Unix time at which the first drained token can be used again
+        """
+        with self._lock:
+            return min(self.resets.values(), default=time.time())
+
+    def defer(
+        self, language: str, repo: str, result: Result, error: VCSDeferredError
+    ) -> None:
+        """
+        Postpone a lookup until quota is available again, marking its result
+        :param language: primary language of the package
+        :param repo: repo url to look up
+        :param result: object the lookup fills in
+        :param error: reason the lookup is postponed
+        """
+        logging.warning(error.msg)
+        result["pkg_err"]["vcs"] = error.msg
+        with self._lock:
+            self.deferred.append((language, repo, result))
+        run_stats.record("vcs_deferred")
+
+    def take_deferred(self) -> List[DeferredLookup]:
+        """
+        Lookups deferred so far, the queue is emptied
+        """
+        with self._lock:
+            deferred, self.deferred = self.deferred, []
+        return deferred
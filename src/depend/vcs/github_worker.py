@@ -1,18 +1,14 @@
 """VCS Handler for GitHub"""
 
-import calendar
 import logging
 import re
-import sys
-import time
-from typing import Iterable
-
-import github.GithubException
-from github.ContentFile import ContentFile
+from typing import Optional
 
 import depend.constants as constants
 from depend.dependencies.helper import Result, handle_dep_file, parse_license
-from depend.handle_env import get_github
+from depend.error import VCSDeferredError
+from depend.vcs.github_api import github_get
+from depend.vcs.snapshot import Snapshot, repo_snapshot
 
 
 def verify_run(language, result, file_extension="git") -> list[str]:
@@ -41,100 +37,117 @@ def handle_github(
     dependency: str,
     result: Result,
 ):
-    """VCS fallthrough for GitHub based GO"""
+    """
+    VCS fallthrough for GitHub based GO.
+    Requests are spread over the token pool and revalidated with stored
+    ETags, so unchanged repositories cost no quota.
+    :raises VCSDeferredError: every token is drained until a later reset
+    """
     # Check if run is actually required
     if retrievable_keys := verify_run(language, result):
-        g = get_github()
-        rl = g.get_rate_limit()
-        reset_timestamp = calendar.timegm(rl.core.reset.timetuple())
-        if rl.core.remaining == 0:
-            logging.error(
-                f"GitHub API limit exhausted - Time left {reset_timestamp - calendar.timegm(time.gmtime()) + 5}"
-            )
-            sys.exit(-1)
+        try:
+            lookup_github(language, dependency, result, retrievable_keys)
+        except VCSDeferredError as e:
+            raise VCSDeferredError(dependency, e.reset) from e
+
+
+def parse_repo(dependency: str) -> Optional[re.Match]:
+    """
+    Owner, name and optional ref of a GitHub repo url
+    :param dependency: repo url
+    :return: match with the three as groups, None if not a GitHub repo
+    """
+    return re.search(
+        r"github.com/([^/]+)/([^/\\\r\n\s]+)(?:/tree/|)?([^/.\\\r\n\s]+)?",
+        dependency,
+    )
 
-        repo_identifier = re.search(
-            r"github.com/([^/]+)/([^/\\\r\n\s]+)(?:/tree/|)?([^/.\\\r\n\s]+)?",
-            dependency,
+
+def github_snapshot(dependency: str) -> Optional[Snapshot]:
+    """
+    Snapshot of the repository of a dependency at the ref it names
+    :param dependency: repo url
+    :return: snapshot, None if the repository can not be read
+    """
+    if repo_identifier := parse_repo(dependency):
+        repo = github_get(
+            f"/repos/{repo_identifier.group(1)}/{repo_identifier.group(2)}"
         )
-        if repo_identifier:
-            try:
-                repo = g.get_repo(
-                    repo_identifier.group(1) + "/" + repo_identifier.group(2)
-                )
-            except github.GithubException:
-                logging.error(f"{dependency} cannot be parsed")
-            else:
-                commit_branch_tag = repo_identifier.group(3) or repo.default_branch
-                try:
-                    files = repo.get_contents("", commit_branch_tag)
-                except github.GithubException:
-                    commit_branch_tag = repo.default_branch
-                    files = repo.get_contents("", commit_branch_tag)
-                if isinstance(files, Iterable):
-                    files_s = [str(f.name) for f in files]
-                else:
-                    files_s = []
-
-                if "pkg_lic" in retrievable_keys:
-                    license_filename = "LICENSE"
-                    for f in files_s:
-                        if f in constants.LICENSE_FILES:
-                            license_filename = f
-                            break
-                    try:
-                        repo_file_content = repo.get_contents(
-                            license_filename, ref=commit_branch_tag
-                        )
-                        if isinstance(repo_file_content, ContentFile):
-                            lic_file = repo_file_content.decoded_content.decode()
-                        else:
-                            lic_file = ""
-                    except github.GithubException:
-                        lic_file = ""
-                    repo_lic = parse_license(lic_file, constants.LICENSE_DICT)
-                    if repo_lic[0] == "Other":
-                        try:
-                            if r_lic := repo.get_license():
-                                repo_lic = [r_lic.license.name]
-                        except github.GithubException:
-                            repo_lic = ["Other"]
-
-                    result["pkg_lic"] = repo_lic
-
-                if "pkg_name" in retrievable_keys:
-                    result["pkg_name"] = dependency
-
-                if "pkg_ver" in retrievable_keys:
-                    releases = [release.tag_name for release in repo.get_releases()]
-                    if not releases:
-                        logging.error("No releases found, defaulting to tags")
-                        releases = [tag.name for tag in repo.get_tags()]
-                    logging.info(releases)
-                    result["pkg_ver"] = commit_branch_tag or releases[0]
-
-                req_files: list = constants.REQ_FILES[language]
-                if ".nuspec" in req_files:
-                    req_files.append(dependency + ".nuspec")
-                for f in set(files_s).intersection(req_files):
-                    req_filename = f
-                    file_extension = req_filename.split(".")[-1]
-                    if retrievable_keys := verify_run(language, result, file_extension):
-                        try:
-                            repo_file_content = repo.get_contents(
-                                req_filename, ref=commit_branch_tag
-                            )
-                            if (
-                                isinstance(repo_file_content, ContentFile)
-                                and repo_file_content.encoding == "base64"
-                            ):
-                                dep_file = repo_file_content.decoded_content.decode()
-                            else:
-                                continue
-                        except github.GithubException:
-                            continue
-                        dep_resp = handle_dep_file(req_filename, dep_file)
-                        for key in retrievable_keys:
-                            result[key] = dep_resp.get(key)  # type: ignore
-                    else:
-                        break
+        if repo is None:
+            logging.error(f"{dependency} cannot be parsed")
+        else:
+            return repo_snapshot(
+                repo, repo_identifier.group(3) or repo["default_branch"]
+            )
+    return None
+
+
+def lookup_github(
+    language: str,
+    dependency: str,
+    result: Result,
+    retrievable_keys: list[str],
+):
+    """
+    Fill in result from the repository of a dependency
+    :param language: primary language of the package
+    :param dependency: repo url
+    :param result: object to mutate
+    :param retrievable_keys: fields of result to fill in
+    """
+    if (snapshot := github_snapshot(dependency)) is not None:
+        fill_result(language, dependency, result, retrievable_keys, snapshot)
+
+
+def fill_result(
+    language: str,
+    dependency: str,
+    result: Result,
+    retrievable_keys: list[str],
+    snapshot: Snapshot,
+):
+    """
+    Fill in result from a snapshot of the repository of a dependency
+    :param language: primary language of the package
+    :param dependency: repo url
+    :param result: object to mutate
+    :param retrievable_keys: fields of result to fill in
+    :param snapshot: files of the repository at the ref looked up
+    """
+    files_s = snapshot["files"]
+
+    if "pkg_lic" in retrievable_keys:
+        license_filename = "LICENSE"
+        for f in files_s:
+            if f in constants.LICENSE_FILES:
+                license_filename = f
+                break
+        lic_file = snapshot["contents"].get(license_filename, "")
+        repo_lic = parse_license(lic_file, constants.LICENSE_DICT)
+        if repo_lic[0] == "Other" and snapshot["license"]:
+            repo_lic = [snapshot["license"]]
+
+        result["pkg_lic"] = repo_lic
+
+    if "pkg_name" in retrievable_keys:
+        result["pkg_name"] = dependency
+
+    if "pkg_ver" in retrievable_keys:
+        # an empty repository has no branch, its latest release is all there is
+        result["pkg_ver"] = snapshot["ref"] or snapshot.get("release") or ""
+
+    req_files = list(constants.REQ_FILES[language])
+    if ".nuspec" in req_files:
+        req_files.append(dependency + ".nuspec")
+    for f in set(files_s).intersection(req_files):
+        req_filename = f
+        file_extension = req_filename.split(".")[-1]
+        if retrievable_keys := verify_run(language, result, file_extension):
+            dep_file = snapshot["contents"].get(req_filename)
+            if dep_file is None:
+                continue
+            dep_resp = handle_dep_file(req_filename, dep_file)
+            for key in retrievable_keys:
+                result[key] = dep_resp.get(key)  # type: ignore
+        else:
+            break
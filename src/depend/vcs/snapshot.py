@@ -0,0 +1,160 @@
+"""Files of a GitHub repository at a commit, fetched once per repository and ref"""
+import base64
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import depend.constants as constants
+from depend import run_stats
+from depend.store import metadata_store
+from depend.vcs.github_api import github_get, github_raw
+
+# files at the root of the repository, content of those the fallback reads,
+# license named in the repository metadata
+Snapshot = Dict[str, Any]
+
+_snapshots: Dict[Tuple[str, str], Snapshot] = {}
+_snapshot_lock = threading.Lock()
+
+
+def wanted_file(name: str) -> bool:
+    """
+    Check if a file at the root of a repository is read by the VCS fallback
+    :param name: file name
+    """
+    return (
+        name in constants.LICENSE_FILES
+        or name.endswith(".nuspec")
+        or any(name in files for files in constants.REQ_FILES.values())
+    )
+
+
+def read_file(repo_name: str, ref: str, path: str) -> Optional[str]:
+    """
+    Content of a file at a ref, from the contents API if the raw host fails
+    :param repo_name: owner/name of the repository
+    :param ref: commit, branch or tag
+    :param path: path of the file in the repository
+    :return: decoded content, None if it can not be read
+    """
+    if (content := github_raw(repo_name, ref, path)) is not None:
+        return content
+    data = github_get(f"/repos/{repo_name}/contents/{path}?ref={quote(ref)}")
+    if isinstance(data, dict) and data.get("encoding") == "base64":
+        return base64.b64decode(data["content"]).decode()
+    return None
+
+
+def resolve_ref(repo: dict, ref: str) -> Tuple[str, str]:
+    """
+    Commit a branch, tag or sha points to, the default branch if it does not exist
+    :param repo: repository as returned by the API
+    :param ref: ref to look for
+    :return: ref used and the sha of its commit, empty if neither exists
+    """
+    commit = github_get(f"/repos/{repo['full_name']}/commits/{quote(ref)}")
+    if commit is None:
+        ref = repo["default_branch"]
+        commit = github_get(f"/repos/{repo['full_name']}/commits/{quote(ref)}")
+    return ref, (commit or {}).get("sha", "")
+
+
+def take_snapshot(repo: dict, sha: str) -> Snapshot:
+    """
+    Read the root tree of a commit and the files the fallback needs from it
+    :param repo: repository as returned by the API
+    :param sha: commit
+    """
+    name = repo["full_name"]
+    tree = github_get(f"/repos/{name}/git/trees/{sha}") or {}
+    files = [entry["path"] for entry in tree.get("tree", []) if entry["type"] == "blob"]
+    contents = {}
+    for path in files:
+        if wanted_file(path) and (content := read_file(name, sha, path)) is not None:
+            contents[path] = content
+    return {
+        "files": files,
+        "contents": contents,
+        "license": (repo.get("license") or {}).get("name"),
+    }
+
+
+def repo_snapshot(repo: dict, ref: str) -> Snapshot:
+    """
+    Snapshot of a repository at a ref, taken once per run and stored by commit
+    :param repo: repository as returned by the API
+    :param ref: branch, tag or sha, the default branch is used if it does not exist
+    :return: snapshot along with the ref used and its sha
+    """
+    key = (repo["full_name"], ref)
+    with _snapshot_lock:
+        snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        run_stats.record("github_snapshot_hits")
+        return snapshot
+    used_ref, sha = resolve_ref(repo, ref)
+    snapshot = metadata_store.get_snapshot(repo["full_name"], sha)
+    if not sha:
+        license_name = (repo.get("license") or {}).get("name")
+        snapshot = {"files": [], "contents": {}, "license": license_name}
+    elif snapshot is None:
+        run_stats.record("github_snapshot_fetches")
+        snapshot = take_snapshot(repo, sha)
+        metadata_store.put_snapshot(repo["full_name"], sha, snapshot)
+    else:
+        run_stats.record("github_snapshot_store_hits")
+    snapshot = dict(snapshot, ref=used_ref, sha=sha)
+    with _snapshot_lock:
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def complete_snapshot(repo_name: str, snapshot: Snapshot) -> Snapshot:
+    """
+    Read the files a snapshot lists but holds no content for, such as
+    nuspec files named after the package
+    :param repo_name: owner/name of the repository
+    :param snapshot: snapshot along with the ref used and its sha
+    """
+    for path in snapshot["files"]:
+        if wanted_file(path) and path not in snapshot["contents"]:
+            if (content := read_file(repo_name, snapshot["sha"], path)) is not None:
+                snapshot["contents"][path] = content
+    return snapshot
+
+
+def is_complete(snapshot: Snapshot) -> bool:
+    """
+    Check if a snapshot holds the content of every file the fallback reads
+    :param snapshot: files and contents of a repository
+    """
+    return all(
+        path in snapshot["contents"] for path in snapshot["files"] if wanted_file(path)
+    )
+
+
+def remember_snapshot(repo_name: str, ref: str, snapshot: Snapshot) -> Snapshot:
+    """
+    Keep a snapshot taken outside of repo_snapshot for the run, stored by commit.
+    Snapshots missing the content of a wanted file are neither kept nor stored,
+    so repo_snapshot takes them again.
+    :param repo_name: owner/name of the repository
+    :param ref: ref looked up
+    :param snapshot: snapshot along with the ref used and its sha
+    """
+    if not is_complete(snapshot):
+        return snapshot
+    if snapshot["sha"]:
+        stored = {key: snapshot[key] for key in ("files", "contents", "license")}
+        metadata_store.put_snapshot(repo_name, snapshot["sha"], stored)
+    with _snapshot_lock:
+        _snapshots[(repo_name, ref)] = snapshot
+    return snapshot
+
+
+def clear_snapshots() -> None:
+    """
+    Drops every snapshot taken in this run, stored snapshots are kept
+    """
+    with _snapshot_lock:
+        _snapshots.clear()
@@ -0,0 +1,73 @@
+"""Calls and time the VCS phase may spend"""
+import time
+from typing import Optional
+
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+
+
+class VCSBudget:
+    """
+    Limit on the GitHub calls or the seconds spent by the VCS phase.
+    It is checked before each repository is looked up, lookups already
+    running are let finish.
+    """
+
+    def __init__(self, calls: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        :param calls: GitHub requests allowed, no limit if not given
+        :param seconds: time allowed, no limit if not given
+        """
+        self.calls = calls
+        self.seconds = seconds
+        self.start()
+
+    def start(self) -> None:
+        """
+        Count calls and time from now on
+        """
+        self._calls_at_start = run_stats.snapshot().get("github_requests", 0)
+        self._started = time.monotonic()
+
+    def spent(self) -> bool:
+        """
+        Check if the phase is out of calls or time
+        """
+        if self.calls is not None:
+            calls = run_stats.snapshot().get("github_requests", 0)
+            if calls - self._calls_at_start >= self.calls:
+                return True
+        if self.seconds is not None:
+            return time.monotonic() - self._started >= self.seconds
+        return False
+
+    def allows(self, seconds: float) -> bool:
+        """
+        Check if the budget leaves time to wait before spending it
+        :param seconds: time to wait
+        """
+        if self.seconds is None:
+            return True
+        return time.monotonic() - self._started + seconds < self.seconds
+
+    def skip(self, dependency: str, result: Result) -> None:
+        """
+        Mark a result left unenriched as the budget was spent
+        :param dependency: repo url not looked up
+        :param result: object the lookup would have filled in
+        """
+        result["pkg_err"]["vcs"] = f"VCS lookup of {dependency} skipped, budget spent"
+        run_stats.record("vcs_budget_skipped")
+
+
+def parse_budget(budget: Optional[str]) -> VCSBudget:
+    """
+    Budget from its command line form, 200 for calls or 90s for seconds
+    :param budget: calls, or seconds suffixed with s, no limit if not given
+    :raises ValueError: budget is not a number
+    """
+    if not budget:
+        return VCSBudget()
+    if budget.endswith("s"):
+        return VCSBudget(seconds=float(budget[:-1]))
+    return VCSBudget(calls=int(budget))
@@ -0,0 +1,237 @@
+"""Second phase of a run, repositories are looked up after registry resolution"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from depend import run_stats
+from depend.dependencies.dep_types import Result
+from depend.dependencies.helper import parse_dep_response
+from depend.error import VCSDeferredError, VCSNotSupportedError
+from depend.handle_env import get_github_scheduler
+from depend.vcs.git_mirror import git_snapshot, mirror_mode, parse_remote
+from depend.vcs.github_batch import enrich_github
+from depend.vcs.github_scheduler import DeferredLookup
+from depend.vcs.github_worker import (
+    fill_result,
+    github_snapshot,
+    parse_repo,
+    verify_run,
+)
+from depend.vcs.snapshot import Snapshot
+from depend.vcs.vcs_budget import VCSBudget
+
+# repositories looked up at once by the phase
+PHASE_JOBS = 4
+
+_phase: Dict[str, Any] = {"enabled": False}
+_pending: List[DeferredLookup] = []
+_pending_lock = threading.Lock()
+# results waiting on a lookup and the schema entry rendered from each, by id
+_records: Dict[int, Tuple[Result, dict]] = {}
+
+
+def set_phase_mode(enabled: bool = False) -> None:
+    """
+    Queue VCS lookups during resolution, to be run in a phase of their own after it
+    :param enabled: lookups are queued if true
+    """
+    _phase.update(enabled=enabled)
+    with _pending_lock:
+        _records.clear()
+
+
+def phase_mode() -> bool:
+    """
+    Check if VCS lookups are queued for the VCS phase
+    """
+    return _phase["enabled"]
+
+
+def queue_lookup(language: str, dependency: str, result: Result) -> None:
+    """
+    Queue a VCS lookup, the result is marked in pkg_err until it is enriched
+    :param language: primary language of the package
+    :param dependency: repo url
+    :param result: object the lookup fills in
+    """
+    if verify_run(language, result):
+        result["pkg_err"]["vcs"] = f"VCS lookup of {dependency} queued"
+        with _pending_lock:
+            _pending.append((language, dependency, result))
+        run_stats.record("vcs_queued")
+
+
+def track_records(results: List[Result], response: dict) -> dict:
+    """
+    Remember the schema entries of results waiting on a VCS lookup, so they
+    can be rendered again once the lookup fills the results in
+    :param results: results of the versions of a package
+    :param response: schema compliant response rendered from results
+    :return: response
+    """
+    for versions in response.values():
+        for result in results:
+            if "vcs" in result["pkg_err"]:
+                entry = versions["versions"][result.get("pkg_ver")]
+                with _pending_lock:
+                    _records[id(result)] = (result, entry)
+    return response
+
+
+def refresh_records(lookups: Iterable[DeferredLookup]) -> None:
+    """
+    Render the schema entries of looked up results again.
+    Entries are no longer tracked once their lookup is no longer pending.
+    :param lookups: language, repo url and result of each lookup
+    """
+    for _, _, result in lookups:
+        with _pending_lock:
+            if (tracked := _records.get(id(result))) is None:
+                continue
+            if "vcs" not in result["pkg_err"]:
+                del _records[id(result)]
+        for versions in parse_dep_response([result]).values():
+            tracked[1].update(next(iter(versions["versions"].values())))
+
+
+def take_pending() -> List[DeferredLookup]:
+    """
+    Lookups queued so far, the queue is emptied
+    """
+    with _pending_lock:
+        pending = list(_pending)
+        _pending.clear()
+    return pending
+
+
+def ready_deferred(
+    wait: bool = False,
+    budget: Optional[VCSBudget] = None,
+    replayed: Optional[float] = None,
+) -> Tuple[List[DeferredLookup], Optional[float]]:
+    """
+    Lookups deferred for quota, once the first drained token is reset.
+    Lookups are left deferred while the reset is ahead, unless wait is true
+    and the budget leaves time to wait for it.
+    :param wait: sleep until the reset rather than leave lookups deferred
+    :param budget: calls or seconds left to the phase
+    :param replayed: reset deferred lookups were last replayed after, lookups
+        deferred again without a later reset are left deferred
+    :return: lookups taken off the queue and the reset they were replayed after
+    """
+    scheduler = get_github_scheduler()
+    reset = scheduler.reset_time()
+    if not scheduler.deferred or (replayed is not None and reset <= replayed):
+        return [], replayed
+    delay = reset - time.time()
+    if delay > 0:
+        if not wait or (budget is not None and not budget.allows(delay)):
+            return [], replayed
+        logging.warning(f"Waiting {delay:.0f}s for a GitHub token to be reset")
+        time.sleep(delay)
+    return scheduler.take_deferred(), reset
+
+
+def report_deferred() -> int:
+    """
+    Warn about lookups still deferred, their results keep the deferred mark
+    :return: number of lookups left
+    """
+    if left := len(get_github_scheduler().take_deferred()):
+        logging.warning(
+            f"{left} VCS lookups still deferred, run again once GitHub quota is reset"
+        )
+        run_stats.record("vcs_still_deferred", left)
+    return left
+
+
+def repo_key(dependency: str) -> str:
+    """
+    Key shared by the lookups of a repository at a ref
+    :param dependency: repo url
+    """
+    if repo_identifier := parse_repo(dependency):
+        owner, name, ref = repo_identifier.groups()
+        return f"github.com/{owner.lower()}/{name.lower()}@{ref or ''}"
+    url, ref = parse_remote(dependency)
+    return f"{url}@{ref}"
+
+
+def vcs_snapshot(dependency: str) -> Optional[Snapshot]:
+    """
+    Snapshot of the repository of a dependency from its VCS host
+    :param dependency: repo url
+    :return: snapshot, None if the repository can not be read
+    :raises VCSNotSupportedError: host is not supported
+    :raises VCSDeferredError: every token is drained
+    """
+    if mirror_mode():
+        return git_snapshot(dependency)
+    if "github.com" in dependency:
+        return github_snapshot(dependency)
+    raise VCSNotSupportedError(dependency)
+
+
+def run_vcs_phase(
+    lookups: Iterable[DeferredLookup],
+    jobs: int = PHASE_JOBS,
+    budget: Optional[VCSBudget] = None,
+    batch: bool = False,
+) -> None:
+    """
+    Fill in results registries left incomplete, each repository looked up once
+    however many packages point to it
+    :param lookups: language, repo url and result of each lookup
+    :param jobs: repositories looked up at once
+    :param budget: calls or seconds left to spend, shared by every round of a run,
+        unlimited if not given
+    :param batch: ask GitHub for many repositories per GraphQL query instead
+    """
+    lookups = list(lookups)
+    budget = budget or VCSBudget()
+    started = time.monotonic()
+    if batch:
+        enrich_github(lookups, budget=budget)
+    else:
+        repos: Dict[str, List[DeferredLookup]] = {}
+        for language, dependency, result in lookups:
+            result["pkg_err"].pop("vcs", None)
+            if verify_run(language, result):
+                repos.setdefault(repo_key(dependency), []).append(
+                    (language, dependency, result)
+                )
+        run_stats.record("vcs_phase_repos", len(repos))
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(partial(lookup_repo, budget=budget), repos.values()))
+    refresh_records(lookups)
+    run_stats.record("vcs_phase_seconds", time.monotonic() - started)
+
+
+def lookup_repo(lookups: List[DeferredLookup], budget: VCSBudget) -> None:
+    """
+    Look a repository up once and fill in every result pointing to it
+    :param lookups: lookups of the repository
+    :param budget: checked before the repository is looked up
+    """
+    if budget.spent():
+        for _, dependency, result in lookups:
+            budget.skip(dependency, result)
+        return
+    dependency = lookups[0][1]
+    try:
+        snapshot = vcs_snapshot(dependency)
+    except VCSNotSupportedError:
+        logging.info(f"Unable to use VCS as unsupported: {dependency}")
+        return
+    except VCSDeferredError as e:
+        for language, dependency, result in lookups:
+            error = VCSDeferredError(dependency, e.reset)
+            get_github_scheduler().defer(language, dependency, result, error)
+        return
+    if snapshot is not None:
+        for language, dependency, result in lookups:
+            if retrievable_keys := verify_run(language, result):
+                fill_result(language, dependency, result, retrievable_keys, snapshot)
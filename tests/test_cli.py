@@ -1,8 +1,18 @@
 """Test cli and overall pipeline for murdock"""
+import inspect
+import json
+
 import pytest
+import typer
 from jsonschema import validate
+from typer.models import OptionInfo
+from typer.testing import CliRunner
 
-from depend.cli import main
+import depend.cli as cli
+import depend.inspector as inspector
+from depend.cli import app, main
+from depend.inspector import new_result
+from depend.store import MetadataStore, metadata_store
 
 
 class Helpers:
@@ -59,6 +69,16 @@ class Helpers:
         return True
 
 
+def run_main(**params):
+    """Call the cli in process, options not given take the defaults typer would pass"""
+    defaults = {
+        name: param.default.default
+        for name, param in inspect.signature(main).parameters.items()
+        if isinstance(param.default, OptionInfo)
+    }
+    return main(**{**defaults, **params})
+
+
 @pytest.fixture
 def json_schema():
     """Schema helper functions"""
@@ -67,7 +87,7 @@ def json_schema():
 
 def test_cs(json_schema):
     """C# fetching test"""
-    result = main(
+    result = run_main(
         lang="cs",
         packages="System.IO;4.3.0",
         dep_file=None,
@@ -86,7 +106,7 @@ def test_cs(json_schema):
 
 def test_go(json_schema):
     """Go fetching test"""
-    result = main(
+    result = run_main(
         lang="go",
         packages="reflectlite;go1.18.4",
         dep_file=None,
@@ -113,7 +133,7 @@ def test_go(json_schema):
 
 def test_js(json_schema):
     """JavaScript fetching test"""
-    result = main(
+    result = run_main(
         lang="javascript",
         packages="uri-js;<=4.4.1,ajv;8.11.0",
         dep_file=None,
@@ -132,7 +152,7 @@ def test_js(json_schema):
 
 def test_php(json_schema):
     """PHP fetching test"""
-    result = main(
+    result = run_main(
         lang="php",
         packages="nunomaduro/collision;^6.0",
         dep_file=None,
@@ -158,7 +178,7 @@ def test_php(json_schema):
 
 def test_python(json_schema):
     """Python fetching test"""
-    result = main(
+    result = run_main(
         lang="python",
         packages="pygit2;==1.9.2",
         dep_file=None,
@@ -175,7 +195,7 @@ def test_python(json_schema):
 
 def test_rust(json_schema):
     """Rust fetching test"""
-    result = main(
+    result = run_main(
         lang="rust",
         packages="libc;0.2.126",
         dep_file=None,
@@ -186,3 +206,90 @@ def test_rust(json_schema):
         "rustc-std-workspace-core",
         "libc",
     }
+
+
+def test_ndjson_output(json_schema, tmp_path, monkeypatch):
+    """Records are written one per line to the output file"""
+
+    def fake_request(language, package, version="", *_args, **_kwargs):
+        deps = ["child;1.0"] if package == "root" else []
+        return {package: {"versions": {version: {"pkg_dep": deps}}}}, set(deps)
+
+    monkeypatch.setattr(inspector, "make_single_request", fake_request)
+    monkeypatch.setattr(metadata_store, "enabled", False)
+    output = tmp_path / "result.ndjson"
+    result = run_main(
+        lang="python",
+        packages="root;1.0",
+        dep_file=None,
+        depth=None,
+        store=False,
+        output_format="ndjson",
+        output=output,
+    )
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert result == []
+    assert json_schema.is_valid(records)
+    assert [next(iter(record)) for record in records] == ["root", "child"]
+
+
+def test_vcs_phase_depth():
+    """The VCS phase is rejected with a depth it can not keep to"""
+    with pytest.raises(SystemExit):
+        run_main(lang="go", packages="github.com/demo/pkg", vcs_phase=True, depth=2)
+
+
+def test_format_flag(tmp_path, monkeypatch):
+    """The output format is chosen with --format on the command line"""
+    try:
+        typer.main.get_command(app)
+    except TypeError:
+        pytest.skip("typer can not build commands with the installed click")
+
+    def fake_request(language, package, version="", *_args, **_kwargs):
+        return {package: {"versions": {version: {"pkg_dep": []}}}}, set()
+
+    monkeypatch.setattr(inspector, "make_single_request", fake_request)
+    output = tmp_path / "result.ndjson"
+    invoked = CliRunner().invoke(
+        app,
+        ["--lang", "python", "--packages", "root;1.0", "--format", "ndjson"]
+        + ["--output", str(output)],
+    )
+    assert invoked.exit_code == 0, invoked.output
+    assert [json.loads(line) for line in output.read_text().splitlines()] == [
+        {"root": {"versions": {"1.0": {"pkg_dep": []}}}}
+    ]
+
+
+def test_dep_file_depth_zero(tmp_path, capsys, monkeypatch):
+    """Parsing a dependency file alone still writes the output file and stats"""
+    monkeypatch.setattr(metadata_store, "enabled", False)
+    dep_file = tmp_path / "requirements.txt"
+    dep_file.write_text("requests==2.28.1\n")
+    output = tmp_path / "result.json"
+    result = run_main(
+        lang="python",
+        packages=None,
+        dep_file=dep_file,
+        depth=0,
+        stats=True,
+        store=False,
+        output=output,
+    )
+    assert json.loads(output.read_text()) == result
+    assert result[0][""]["versions"][""]["pkg_dep"] == ["requests;==2.28.1"]
+    assert json.loads(capsys.readouterr().err) == {}
+
+
+def test_store_maintenance(tmp_path, capsys, monkeypatch):
+    """The store is summarized, pruned and exported without any package given"""
+    store = MetadataStore(tmp_path / "store.sqlite")
+    monkeypatch.setattr(cli, "metadata_store", store)
+    for language, name in [("python", "rich"), ("rust", "libc")]:
+        store.put_result(language, name, "1.0", new_result(name))
+    export = tmp_path / "export.ndjson"
+    result = run_main(lang="rust", store_stats=True, store_prune=0, store_export=export)
+    assert result == []
+    assert json.loads(capsys.readouterr().err)["languages"] == {"python": 1}
+    assert [json.loads(line)["pkg_name"] for line in export.open()] == ["rich"]
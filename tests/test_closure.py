@@ -0,0 +1,24 @@
+"""Tests for closure memoization helpers."""
+
+from depend.closure import _reachable, response_key
+
+
+def test_reachable_with_cycle():
+    """Members of a cycle reach each other, unknown children are left out"""
+    children = {
+        "root": {"a", "missing"},
+        "a": {"b"},
+        "b": {"a", "leaf"},
+        "leaf": set(),
+    }
+    reach = _reachable(children)
+    assert reach["root"] == {"root", "a", "b", "leaf"}
+    assert reach["a"] == reach["b"] == {"a", "b", "leaf"}
+    assert reach["leaf"] == {"leaf"}
+
+
+def test_response_key():
+    """Closures are keyed by name and the version resolved for a constraint"""
+    dep_resp = {"demo": {"versions": {"1.0": {}}}}
+    assert response_key("demo;<2", dep_resp) == ("demo", "1.0")
+    assert response_key("demo", {}) == ("demo", "")
@@ -100,6 +100,55 @@ def test_requirements_txt(json_schema):
     assert json_schema.is_valid(result)
 
 
+@pytest.fixture
+def target_environment():
+    """
+    Evaluates markers for the duration of a test
+    :return: function configuring the target environment
+    """
+    yield py_helper.set_target_environment
+    py_helper.set_target_environment()
+
+
+@pytest.mark.parametrize(
+    ("python_version", "platform", "extras", "expected"),
+    [
+        (None, None, None, ["cffi", "cached-property", "pytest", "pywin32"]),
+        ("3.7", "linux", None, ["cffi", "cached-property"]),
+        ("3.11", "win32", None, ["cffi", "pywin32"]),
+        ("3.11", None, ["test"], ["cffi", "pytest"]),
+    ],
+)
+def test_requirement_markers(
+    target_environment, python_version, platform, extras, expected
+):
+    """Dependencies whose markers exclude the target environment are dropped"""
+    target_environment(python_version, platform, extras)
+    requires_dist = [
+        "cffi (>=1.9.1)",
+        'cached-property ; python_version < "3.8"',
+        'pytest ; extra == "test"',
+        'pywin32 ; sys_platform == "win32"',
+    ]
+    deps = py_helper.get_py_dep_from_iterable(requires_dist)
+    assert [dep.split(";")[0] for dep in deps] == expected
+
+
+def test_requirement_extras(target_environment):
+    """Extras are carried on the edge and select the dependencies of the child"""
+    target_environment("3.11", "linux", ["test"])
+    requires_dist = ["requests[SOCKS] (>=2)", 'pytest ; extra == "test"']
+    assert py_helper.get_py_dep_from_iterable(requires_dist, ()) == [
+        "requests[socks];>=2"
+    ]
+    assert py_helper.get_py_dep_from_iterable(requires_dist) == [
+        "requests[socks];>=2",
+        "pytest;latest",
+    ]
+    assert py_helper.entry_with_extras("demo[b];1.0", ["a"]) == "demo[a,b];1.0"
+    assert py_helper.split_extras("demo [B, a]") == ("demo", ("a", "b"))
+
+
 def test_setup_py(json_schema):
     """Check setup.py file output"""
     with open("tests/data/example_setup.py") as f:
@@ -0,0 +1,142 @@
+"""Tests for the git mirror VCS backend, against local repositories"""
+
+import os
+import subprocess
+
+import pytest
+
+import depend.inspector as inspector
+import depend.vcs.git_mirror as git_mirror
+from depend import run_stats
+from depend.error import VCSNotSupportedError
+from depend.inspector import new_result
+
+GO_MOD = "module example.com/demo\n\ngo 1.19\n\nrequire golang.org/x/text {}\n"
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "depend",
+    "GIT_AUTHOR_EMAIL": "depend@example.com",
+    "GIT_COMMITTER_NAME": "depend",
+    "GIT_COMMITTER_EMAIL": "depend@example.com",
+}
+
+
+def commit(repo, files, message):
+    """
+    Write files and commit them to a repository
+    :param repo: working tree
+    :param files: name and content of each file
+    :param message: commit message
+    """
+    for name, content in files.items():
+        (repo / name).write_text(content)
+    env = dict(os.environ, **GIT_ENV)
+    subprocess.run(["git", "-C", str(repo), "add", "."], check=True, env=env)
+    subprocess.run(
+        ["git", "-C", str(repo), "commit", "-q", "-m", message], check=True, env=env
+    )
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """
+    Repository with a tagged release followed by a dependency upgrade on main
+    :return: file url of the repository and its working tree
+    """
+    repo = tmp_path / "remote"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q", "-b", "main", str(repo)], check=True)
+    license_text = (
+        "MIT License\n\nPermission is hereby granted, free of charge, to any person"
+    )
+    commit(repo, {"LICENSE": license_text, "go.mod": GO_MOD.format("v0.3.7")}, "v1")
+    subprocess.run(["git", "-C", str(repo), "tag", "v1.0.0"], check=True)
+    commit(repo, {"go.mod": GO_MOD.format("v0.3.8")}, "upgrade")
+    git_mirror.set_mirror_mode(True, tmp_path / "mirrors")
+    run_stats.reset()
+    yield f"file://{repo}", repo
+    git_mirror.set_mirror_mode()
+
+
+def test_handle_vcs_mirror(remote):
+    """Any git host is read from a local mirror, at the ref named"""
+    url, _ = remote
+    result = new_result(url)
+    inspector.handle_vcs("go", url, result)
+    assert result["pkg_lic"] == ["MIT License"]
+    assert result["pkg_ver"] == "main"
+    assert result["pkg_dep"] == ["golang.org/x/text;v0.3.8"]
+
+    tagged = new_result(url)
+    inspector.handle_vcs("go", url + "/-/tree/v1.0.0", tagged)
+    assert tagged["pkg_ver"] == "v1.0.0"
+    assert tagged["pkg_dep"] == ["golang.org/x/text;v0.3.7"]
+
+    missing = new_result(url)
+    inspector.handle_vcs("go", url + "/tree/missing", missing)
+    assert missing["pkg_ver"] == "main"
+    # the remote is cloned once per run
+    assert run_stats.snapshot() == {"git_mirror_clones": 1}
+
+
+def test_mirror_fetch(remote, tmp_path):
+    """Later runs fetch what changed into the existing mirror"""
+    url, repo = remote
+    first = git_mirror.git_snapshot(url)
+    commit(repo, {"go.mod": GO_MOD.format("v0.3.9"), "package.json": "{}"}, "next")
+    git_mirror.set_mirror_mode(True, tmp_path / "mirrors")
+    second = git_mirror.git_snapshot(url)
+    assert second["sha"] != first["sha"]
+    assert second["files"] == ["LICENSE", "go.mod", "package.json"]
+    assert "v0.3.9" in second["contents"]["go.mod"]
+    assert run_stats.snapshot() == {"git_mirror_clones": 1, "git_mirror_fetches": 1}
+
+
+def test_mirror_unreachable(tmp_path):
+    """Remotes that can not be cloned leave the result as it is"""
+    git_mirror.set_mirror_mode(True, tmp_path / "mirrors")
+    try:
+        assert git_mirror.git_snapshot(f"file://{tmp_path}/gone") is None
+    finally:
+        git_mirror.set_mirror_mode()
+    assert git_mirror.parse_remote("gitea.com/demo/pkg/src/tag/v1") == (
+        "https://gitea.com/demo/pkg",
+        "v1",
+    )
+
+
+def test_mirror_rejects_transports(tmp_path):
+    """Urls from registry metadata never reach git as options or other transports"""
+    git_mirror.set_mirror_mode(True, tmp_path / "mirrors")
+    marker = tmp_path / "marker"
+    try:
+        for url in [
+            f"--upload-pack=touch {marker};x://h/r",
+            f"ext::sh -c touch% {marker}://h/r",
+            "http://example.com/demo/pkg",
+        ]:
+            with pytest.raises(VCSNotSupportedError):
+                git_mirror.git_snapshot(url)
+    finally:
+        git_mirror.set_mirror_mode()
+    assert not marker.exists()
+    assert not (tmp_path / "mirrors").exists()
+
+
+def test_mirror_no_prompt(tmp_path, monkeypatch):
+    """git runs without a terminal prompt and with a timeout"""
+    calls = []
+
+    def run(args, **kwargs):
+        calls.append((args, kwargs))
+        raise git_mirror.subprocess.TimeoutExpired(args, kwargs["timeout"])
+
+    monkeypatch.setattr(git_mirror.subprocess, "run", run)
+    git_mirror.set_mirror_mode(True, tmp_path / "mirrors")
+    try:
+        assert git_mirror.git_snapshot("https://example.com/demo/pkg") is None
+    finally:
+        git_mirror.set_mirror_mode()
+    ((args, kwargs),) = calls
+    assert args[:5] == ["git", "clone", "--mirror", "--quiet", "--"]
+    assert kwargs["env"]["GIT_TERMINAL_PROMPT"] == "0"
+    assert kwargs["timeout"] == git_mirror.GIT_TIMEOUT
@@ -1,12 +1,40 @@
 """Tests for all functions in inspector."""
 
+import asyncio
+import json
+import threading
 from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 
+import httpx
 import pytest
+import responses
 
+import depend.closure as closure
 import depend.inspector as inspector
+import depend.vcs.snapshot as snapshot
+from depend import run_stats
+from depend.constants import REGISTRY
+from depend.dep_helper import requests
 from depend.dependencies.dep_types import Result
+from depend.dependencies.registry_mode import set_registry_mode
+from depend.dependencies.rust.rust_sparse import sparse_url
 from depend.error import LanguageNotSupportedError, VCSNotSupportedError
+from depend.store import MetadataStore
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    """
+    Keeps results of each test out of the user metadata store
+    :return: empty store used by the inspector
+    """
+    store = MetadataStore(tmp_path / "store.sqlite")
+    monkeypatch.setattr(inspector, "metadata_store", store)
+    monkeypatch.setattr(closure, "metadata_store", store)
+    monkeypatch.setattr(snapshot, "metadata_store", store)
+    return store
 
 
 @pytest.fixture
@@ -58,6 +86,10 @@ def test_make_url_with_version():
         inspector.make_url("go", "bufio", "go1.17.6")
         == "https://pkg.go.dev/bufio@go1.17.6"
     )
+    assert (
+        inspector.make_url("python", "aiohttp[speedups]", "3.7.2")
+        == "https://pypi.org/pypi/aiohttp/3.7.2/json"
+    )
 
 
 def test_make_url_without_version():
@@ -208,3 +240,666 @@ def test_make_single_request_php_ver():
         "php", "ajgarlag/psr15-dispatcher", "0.4.1", force_schema=False
     )
     assert result[0]["pkg_dep"]
+
+
+@pytest.fixture
+def offline_graph(monkeypatch):
+    """
+    Replaces registry lookups with a fixed dependency graph
+    :return: graph mapping package names to their dependencies
+    """
+    graph = {
+        "root": ["left;1.0", "right;1.0"],
+        "left": ["shared;1.0", "leaf;1.0"],
+        "right": ["shared;1.0"],
+        "shared": ["leaf;1.0"],
+        "leaf": [],
+    }
+
+    def fake_request(language, package, version="", *_args, **_kwargs):
+        return {package: {"versions": {version: {"pkg_dep": graph[package]}}}}, set(
+            graph[package]
+        )
+
+    monkeypatch.setattr(inspector, "make_single_request", fake_request)
+    return graph
+
+
+def test_make_multiple_requests_parallel(offline_graph):
+    """Parallel resolution matches the serial output and order"""
+    serial = inspector.make_multiple_requests("python", ["root;1.0"])
+    parallel = inspector.make_multiple_requests("python", ["root;1.0"], jobs=4)
+    assert parallel == serial
+    assert [next(iter(res)) for res in serial] == [
+        "root",
+        "left",
+        "right",
+        "leaf",
+        "shared",
+    ]
+
+
+@pytest.mark.parametrize("depth", [None, 0, 1, 2])
+def test_make_multiple_requests_pipeline(offline_graph, depth):
+    """Pipelined resolution resolves the same packages as level barriers"""
+    level = inspector.make_multiple_requests("python", ["root;1.0"], depth)
+    pipelined = inspector.make_multiple_requests(
+        "python", ["root;1.0"], depth, jobs=3, pipeline=True
+    )
+    assert pipelined == level
+    assert "pipeline_seconds_saved" in run_stats.snapshot()
+
+
+@pytest.fixture
+def pypi_transport():
+    """
+    Stand-in PyPI serving two packages over an httpx transport
+    :return: transport to be used by an async client
+    """
+    documents = {
+        "demo": {"1.0": ["child (>=2)"], "1.1": ["child (>=2)"]},
+        "child": {"2.0": None},
+    }
+
+    def info(name, version):
+        return {
+            "name": name,
+            "version": version,
+            "license": "MIT",
+            "requires_dist": documents[name][version],
+            "home_page": "",
+        }
+
+    def handler(request):
+        parts = request.url.path.strip("/").split("/")
+        name = parts[1]
+        if name not in documents:
+            return httpx.Response(404)
+        if len(parts) == 3:
+            latest = sorted(documents[name])[-1]
+            return httpx.Response(
+                200,
+                json={
+                    "info": info(name, latest),
+                    "releases": {ver: [] for ver in documents[name]},
+                },
+            )
+        return httpx.Response(200, json={"info": info(name, parts[2])})
+
+    return httpx.MockTransport(handler)
+
+
+def test_async_make_single_request(pypi_transport):
+    """Async requests share version resolution and handlers"""
+
+    async def run():
+        async with httpx.AsyncClient(transport=pypi_transport) as client:
+            return await inspector.async_make_single_request(
+                "python", "demo", "<1.1", force_schema=False, client=client
+            )
+
+    result, deps = asyncio.run(run())
+    assert result[0]["pkg_ver"] == "1.0"
+    assert result[0]["pkg_lic"] == ["MIT"]
+    assert deps == {"child;>=2"}
+
+
+def test_async_listing_shared(pypi_transport, isolated_store):
+    """Async requests list versions through the store like blocking ones"""
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return pypi_transport.handle_request(request)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await inspector.async_make_single_request(
+                "python", "demo", "<1.1", force_schema=False, client=client
+            )
+
+    isolated_store.put_versions("python", "demo", ["1.0", "1.1"])
+    result, _ = asyncio.run(run())
+    assert result[0]["pkg_ver"] == "1.0"
+    assert paths == ["/pypi/demo/1.0/json"]
+
+
+def test_async_make_multiple_requests(pypi_transport):
+    """Async resolution walks the whole graph"""
+
+    async def run():
+        async with httpx.AsyncClient(transport=pypi_transport) as client:
+            return await inspector.async_make_multiple_requests(
+                "python", ["demo"], client=client
+            )
+
+    result = asyncio.run(run())
+    assert [next(iter(res)) for res in result] == ["demo", "child"]
+    assert "1.1" in result[0]["demo"]["versions"]
+
+
+@pytest.fixture
+def registry():
+    """
+    Stand-in registry responses, bypassing the http cache
+    :return: mock to register responses with
+    """
+    with requests.cache_disabled(), responses.RequestsMock(
+        assert_all_requests_are_fired=False
+    ) as mock:
+        yield mock
+
+
+def pypi_info(name, version, requires_dist=None):
+    """PyPI JSON API document for a single release"""
+    return {
+        "info": {
+            "name": name,
+            "version": version,
+            "license": "MIT",
+            "requires_dist": requires_dist,
+            "home_page": "",
+        },
+        "releases": {version: []},
+    }
+
+
+def test_make_single_request_pinned(registry):
+    """Exact pins skip listing versions"""
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/1.0/json",
+        json=pypi_info("demo", "1.0"),
+    )
+    result, _ = inspector.make_single_request(
+        "python", "demo", "==1.0", force_schema=False
+    )
+    assert result[0]["pkg_ver"] == "1.0"
+    assert [call.request.url for call in registry.calls] == [
+        "https://pypi.org/pypi/demo/1.0/json"
+    ]
+
+
+@pytest.mark.parametrize("status", [404, 403, 429, 503])
+def test_make_single_request_pinned_fallback(registry, status):
+    """Pins the registry does not serve fall back to listing versions"""
+    run_stats.reset()
+    registry.add(responses.GET, "https://pypi.org/pypi/demo/1.0/json", status=status)
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/json",
+        json={"releases": {"1.0.0": [], "2.0.0": []}},
+    )
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/1.0.0/json",
+        json=pypi_info("demo", "1.0.0"),
+    )
+    result, _ = inspector.make_single_request(
+        "python", "demo", "==1.0", force_schema=False
+    )
+    assert result[0]["pkg_ver"] == "1.0.0"
+    assert len(registry.calls) == 3
+    assert "pinned_requests_saved" not in run_stats.snapshot()
+
+
+def test_make_single_request_reuses_listing(registry):
+    """Latest PyPI release is read from the versions listing"""
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/json",
+        json=pypi_info("demo", "1.0", ["child (>=2)"]),
+    )
+    result, deps = inspector.make_single_request("python", "demo", force_schema=False)
+    assert result[0]["pkg_ver"] == "1.0"
+    assert deps == {"child;>=2"}
+    assert len(registry.calls) == 1
+
+
+def test_make_single_request_reuses_packument(registry):
+    """npm versions are read from the packument used to list them"""
+    registry.add(
+        responses.GET,
+        "https://registry.npmjs.org/left-pad",
+        json={
+            "name": "left-pad",
+            "versions": {
+                ver: {"name": "left-pad", "version": ver, "license": "WTFPL"}
+                for ver in ("1.0.0", "1.1.0", "2.0.0")
+            },
+        },
+    )
+    result, _ = inspector.make_single_request(
+        "javascript", "left-pad", "^1.0.0", force_schema=False
+    )
+    assert result[0]["pkg_ver"] == "1.1.0"
+    assert result[0]["pkg_lic"] == ["WTFPL"]
+    assert len(registry.calls) == 1
+
+
+def test_make_single_request_abbreviated_packument(registry):
+    """Abbreviated packuments list versions, the license comes from the version"""
+    registry.add(
+        responses.GET,
+        "https://registry.npmjs.org/left-pad",
+        json={
+            "name": "left-pad",
+            "versions": {
+                ver: {"name": "left-pad", "version": ver, "dependencies": {}}
+                for ver in ("1.0.0", "1.1.0", "2.0.0")
+            },
+        },
+        content_type="application/vnd.npm.install-v1+json",
+    )
+    registry.add(
+        responses.GET,
+        "https://registry.npmjs.org/left-pad/1.1.0",
+        json={"name": "left-pad", "version": "1.1.0", "license": "WTFPL"},
+    )
+    result, _ = inspector.make_single_request(
+        "javascript", "left-pad", "^1.0.0", force_schema=False
+    )
+    assert result[0]["pkg_ver"] == "1.1.0"
+    assert result[0]["pkg_lic"] == ["WTFPL"]
+    accept = registry.calls[0].request.headers["Accept"]
+    assert accept.startswith("application/vnd.npm.install-v1+json")
+    assert registry.calls[1].request.headers.get("Accept") != accept
+
+
+def test_make_single_request_from_store(registry, isolated_store):
+    """Stored versions are served without touching the network"""
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/json",
+        json=pypi_info("demo", "1.0", ["child (>=2)"]),
+    )
+    first, _ = inspector.make_single_request("python", "demo", "<2")
+    second, deps = inspector.make_single_request("python", "demo", "<2")
+    pinned, _ = inspector.make_single_request("python", "demo", "==1.0")
+    assert first == second == pinned
+    assert deps == {"child;>=2"}
+    assert len(registry.calls) == 1
+    assert isolated_store.stats()["results"] == 1
+
+
+def test_make_single_request_vcs_not_stored(registry, isolated_store, monkeypatch):
+    """Results the VCS fallback ran for are not persisted"""
+    info = pypi_info("Demo_Pkg", "1.0")
+    info["info"]["home_page"] = "https://github.com/demo/pkg"
+    registry.add(responses.GET, "https://pypi.org/pypi/Demo_Pkg/json", json=info)
+    # the version list stored for Demo_Pkg is shared, only the version is fetched
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo.pkg/1.0/json",
+        json=pypi_info("demo.pkg", "1.0"),
+    )
+    monkeypatch.setattr(inspector, "handle_vcs", lambda *_args: None)
+    inspector.make_single_request("python", "Demo_Pkg", "<2")
+    assert isolated_store.stats()["results"] == 0
+    inspector.make_single_request("python", "demo.pkg", "<2")
+    # names PyPI treats as identical share the stored result
+    assert isolated_store.has_result("python", "Demo_Pkg", "1.0")
+
+
+def test_make_multiple_requests_splices_closure(registry, isolated_store):
+    """Packages below a stored closure are not resolved again"""
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/demo/json",
+        json=pypi_info("demo", "1.0", ["child (>=2)"]),
+    )
+    registry.add(
+        responses.GET,
+        "https://pypi.org/pypi/child/json",
+        json=pypi_info("child", "2.0"),
+    )
+    first = inspector.make_multiple_requests("python", ["demo;<2"])
+    members = isolated_store.get_closure("python", "demo", "1.0")
+    assert [member["package"] for member in members] == ["child;>=2"]
+    run_stats.reset()
+    second = inspector.make_multiple_requests("python", ["demo;<2"])
+    assert first == second
+    assert run_stats.snapshot()["closures_spliced"] == 1
+    assert run_stats.snapshot()["store_hits"] == 2
+    assert len(registry.calls) == 2
+    isolated_store.put_versions("python", "child", ["2.0", "2.1"])
+    assert isolated_store.get_closure("python", "demo", "1.0") is None
+
+
+def test_iter_multiple_requests(offline_graph):
+    """Streamed responses cover the same packages, root first"""
+    level = inspector.make_multiple_requests("python", ["root;1.0"])
+    streamed = list(inspector.iter_multiple_requests("python", ["root;1.0"], jobs=3))
+    assert next(iter(streamed[0])) == "root"
+    assert sorted(streamed, key=lambda res: next(iter(res))) == sorted(
+        level, key=lambda res: next(iter(res))
+    )
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_make_multiple_requests_dedup(monkeypatch, pipeline):
+    """Entries naming the same release are resolved and reported once"""
+    graph = {
+        "root": ["PyYAML;>=5", "pyyaml;>=5", "shared;>=1", "shared;~=1.0"],
+        "PyYAML": ["shared;>=1"],
+        "shared": [],
+    }
+    calls = []
+
+    def fake_request(language, package, version="", *_args, **_kwargs):
+        calls.append((package, version))
+        return {package: {"versions": {"1.0": {"pkg_dep": graph[package]}}}}, set(
+            graph[package]
+        )
+
+    monkeypatch.setattr(inspector, "make_single_request", fake_request)
+    monkeypatch.setattr(inspector, "fetch_versions", lambda *_args: (["1.0"], None))
+    run_stats.reset()
+    result = inspector.make_multiple_requests("python", ["root"], pipeline=pipeline)
+    assert [next(iter(res)) for res in result] == ["root", "PyYAML", "shared"]
+    assert len(calls) == 4
+    assert run_stats.snapshot()["duplicates_skipped"] == 1
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_make_multiple_requests_batch_resolution(monkeypatch, pipeline):
+    """Constraints on the same package share one listing, resolved in a batch"""
+    listings = []
+    calls = []
+    listing = object()
+
+    def fake_versions(language, package):
+        listings.append(package)
+        return ["1.0", "1.1", "2.0"], listing
+
+    def fake_request(language, package, version="", *_args, **kwargs):
+        calls.append((package, version, kwargs["versions"], kwargs["listing"]))
+        ver = (kwargs["versions"] or [""])[0]
+        deps = ["shared;<2", "Shared;<1.1", "other;==1.0"] if package == "root" else []
+        return {package: {"versions": {ver: {"pkg_dep": deps}}}}, set(deps)
+
+    monkeypatch.setattr(inspector, "fetch_versions", fake_versions)
+    monkeypatch.setattr(inspector, "make_single_request", fake_request)
+    run_stats.reset()
+    inspector.make_multiple_requests("python", ["root"], jobs=2, pipeline=pipeline)
+    assert listings == ["Shared"]
+    assert sorted(calls[1:], key=str) == [
+        ("Shared", "<1.1", ["1.0"], listing),
+        ("other", "==1.0", None, None),
+        ("shared", "<2", ["1.1"], listing),
+    ]
+    assert run_stats.snapshot()["batch_resolved"] == 2
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serves files without logging every request"""
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def pypi_files(tmp_path):
+    """
+    Stand-in PyPI served from files, with the JSON, Simple and core metadata APIs
+    :return: root url of the index
+    """
+    readme = "A long project description. " * 2000
+    releases = {"0.9": None, "1.0.0": ["child (>=2)"], "2.0.0": ["child (>=3)"]}
+    files = []
+    for ver, requires_dist in releases.items():
+        info = {
+            "name": "demo-pkg",
+            "version": ver,
+            "license": "MIT",
+            "requires_dist": requires_dist,
+            "home_page": "",
+            "description": readme,
+        }
+        write = tmp_path / "pypi" / "demo-pkg" / ver / "json"
+        write.parent.mkdir(parents=True)
+        write.write_text(json.dumps({"info": info, "releases": {}}))
+        if ver == "0.9":
+            # uploaded before core metadata files were extracted
+            files.append({"filename": "demo-pkg-0.9.tar.gz", "url": "x"})
+            continue
+        filename = f"demo_pkg-{ver}-py3-none-any.whl"
+        files.append(
+            {
+                "filename": filename,
+                "url": f"../../packages/{filename}",
+                "core-metadata": {"sha256": "0"},
+            }
+        )
+        metadata = tmp_path / "packages" / (filename + ".metadata")
+        metadata.parent.mkdir(exist_ok=True)
+        metadata.write_text(
+            "Metadata-Version: 2.1\nName: demo-pkg\n"
+            f"Version: {ver}\nLicense: MIT\nRequires-Dist: {requires_dist[0]}\n\n"
+            + readme
+        )
+    # long release history, listed with upload details by the JSON API only
+    history = {f"0.{minor}": [{"filename": "x", "size": 1}] for minor in range(300)}
+    (tmp_path / "pypi" / "demo-pkg" / "json").write_text(
+        json.dumps({"info": info, "releases": {**history, **releases}})
+    )
+    # directories are served from their index.html
+    page = tmp_path / "simple" / "demo-pkg" / "index.html"
+    page.parent.mkdir(parents=True)
+    page.write_text(json.dumps({"name": "demo-pkg", "files": files}))
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHandler, directory=str(tmp_path))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_make_single_request_metadata_mode(pypi_files, monkeypatch, isolated_store):
+    """Core metadata files give the same results as the JSON API for fewer bytes"""
+    monkeypatch.setitem(REGISTRY["python"], "url", pypi_files + "/pypi")
+    isolated_store.enabled = False
+    run_stats.reset()
+    fields = ("pkg_ver", "pkg_lic", "pkg_dep")
+    with requests.cache_disabled():
+        expected, deps = inspector.make_single_request(
+            "python", "demo-pkg", "<2", force_schema=False
+        )
+        set_registry_mode("python", True, pypi_files + "/simple")
+        try:
+            result, metadata_deps = inspector.make_single_request(
+                "python", "Demo_Pkg", "<2", force_schema=False
+            )
+            stats = run_stats.snapshot()
+            fallback, _ = inspector.make_single_request(
+                "python", "demo-pkg", "==0.9", force_schema=False
+            )
+        finally:
+            set_registry_mode("python")
+    assert [result[0][field] for field in fields] == [
+        expected[0][field] for field in fields
+    ]
+    assert metadata_deps == deps == {"child;>=2"}
+    assert stats["pypi_metadata_mode_bytes"] < stats["pypi_json_mode_bytes"]
+    assert fallback[0]["pkg_ver"] == "0.9"
+    assert run_stats.snapshot()["pypi_metadata_fallbacks"] == 1
+
+
+@pytest.fixture
+def sparse_index():
+    """
+    Rust crates resolved from the sparse index for the duration of a test
+    """
+    set_registry_mode("rust", True)
+    yield
+    set_registry_mode("rust")
+
+
+def test_make_single_request_sparse_index(registry, sparse_index):
+    """Versions and dependencies come from the index file, license from the API"""
+    entries = [
+        {"name": "demo", "vers": ver, "deps": deps, "yanked": False}
+        for ver, deps in (
+            ("1.0.0", []),
+            ("1.1.0", [{"name": "serde", "req": "^1.0", "kind": "normal"}]),
+            ("2.0.0", []),
+        )
+    ]
+    entries[1]["deps"].append({"name": "json", "package": "serde_json", "req": "^1"})
+    registry.add(
+        responses.GET,
+        "https://index.crates.io/de/mo/demo",
+        body="\n".join(json.dumps(entry) for entry in entries) + "\n",
+    )
+    registry.add(
+        responses.GET,
+        "https://crates.io/api/v1/crates/demo/1.1.0",
+        json={"version": {"crate": "demo", "num": "1.1.0", "license": "MIT"}},
+    )
+    result, deps = inspector.make_single_request(
+        "rust", "demo", "1.0", force_schema=False
+    )
+    assert result[0]["pkg_ver"] == "1.1.0"
+    assert result[0]["pkg_lic"] == ["MIT"]
+    assert deps == {"serde;^1.0", "serde_json;^1"}
+    assert len(registry.calls) == 2
+    assert [sparse_url(name) for name in ("a", "ab", "abc", "Serde")] == [
+        "https://index.crates.io/1/a",
+        "https://index.crates.io/2/ab",
+        "https://index.crates.io/3/a/abc",
+        "https://index.crates.io/se/rd/serde",
+    ]
+
+
+@pytest.fixture
+def go_proxy(tmp_path):
+    """
+    Go modules resolved from a module proxy laid out on disk for the duration of a test
+    :return: root of the proxy
+    """
+    module = tmp_path / "example.com" / "!demo" / "mod" / "@v"
+    module.mkdir(parents=True)
+    (module / "list").write_text("v1.0.0\nv1.10.0\nv1.2.0\n")
+    for ver in ("v1.0.0", "v1.2.0", "v1.10.0"):
+        (module / f"{ver}.info").write_text(json.dumps({"Version": ver}))
+        (module / f"{ver}.mod").write_text(
+            "module example.com/Demo/mod\n\ngo 1.19\n\n"
+            f"require golang.org/x/text {ver}\n"
+        )
+    untagged = tmp_path / "example.com" / "untagged"
+    (untagged / "@v").mkdir(parents=True)
+    (untagged / "@v" / "list").write_text("")
+    (untagged / "@latest").write_text(
+        json.dumps({"Version": "v0.0.0-20220101000000-abcdefabcdef"})
+    )
+    (untagged / "@v" / "v0.0.0-20220101000000-abcdefabcdef.mod").write_text(
+        "module example.com/untagged\n"
+    )
+    set_registry_mode("go", True, tmp_path.as_uri())
+    yield tmp_path
+    set_registry_mode("go")
+
+
+def test_make_single_request_go_proxy(go_proxy):
+    """Versions and dependencies come from the proxy, module paths case encoded"""
+    result, deps = inspector.make_single_request(
+        "go", "example.com/Demo/mod", "v1.1.0", force_schema=False
+    )
+    assert result[0]["pkg_name"] == "example.com/Demo/mod"
+    assert result[0]["pkg_ver"] == "v1.10.0"
+    assert result[0]["lang_ver"] == ["1.19"]
+    assert deps == {"golang.org/x/text;v1.10.0"}
+    async_result, async_deps = asyncio.run(
+        inspector.async_make_single_request(
+            "go", "example.com/Demo/mod", "v1.1.0", force_schema=False
+        )
+    )
+    assert async_result[0]["pkg_ver"] == "v1.10.0"
+    assert async_deps == deps
+    untagged, _ = inspector.make_single_request(
+        "go", "example.com/untagged", force_schema=False
+    )
+    assert untagged[0]["pkg_ver"] == "v0.0.0-20220101000000-abcdefabcdef"
+
+
+def test_make_single_request_php_document_reuse(registry):
+    """Every version is served from one document parsed once"""
+    registry.add(
+        responses.GET,
+        "https://packagist.org/packages/demo/pkg.json",
+        json={
+            "package": {
+                "name": "demo/pkg",
+                "versions": {
+                    "2.0.0": {"license": ["MIT"], "require": {"php": ">=8.0"}},
+                    "1.1.0": {"license": ["MIT"], "require": {"demo/dep": "^1.0"}},
+                    "dev-main": {"license": ["MIT"], "require": []},
+                },
+            }
+        },
+    )
+    run_stats.reset()
+    latest, _ = inspector.make_single_request("php", "demo/pkg", force_schema=False)
+    older, deps = inspector.make_single_request(
+        "php", "demo/pkg", "~1.0", force_schema=False
+    )
+    assert latest[0]["pkg_ver"] == "2.0.0"
+    assert latest[0]["lang_ver"] == [">=8.0"]
+    assert older[0]["pkg_ver"] == "1.1.0"
+    assert deps == {"demo/dep;^1.0"}
+    assert run_stats.snapshot()["php_document_misses"] == 1
+    # both requests list versions and read their release from the same document
+    assert run_stats.snapshot()["php_document_hits"] == 3
+    latest[0]["pkg_lic"].append("GPL-3.0")
+    again, _ = inspector.make_single_request("php", "demo/pkg", force_schema=False)
+    assert again[0]["lang_ver"] == [">=8.0"]
+    assert again[0]["pkg_lic"] == ["MIT"]
+
+
+def test_make_single_request_php_p2(registry):
+    """Minified releases are expanded from the release before them"""
+    registry.add(
+        responses.GET,
+        "https://repo.packagist.org/p2/demo/pkg.json",
+        json={
+            "minified": "composer/2.0",
+            "packages": {
+                "demo/pkg": [
+                    {
+                        "name": "demo/pkg",
+                        "version": "2.0.0",
+                        "license": ["MIT"],
+                        "require": {"php": ">=8.0", "demo/dep": "^2.0"},
+                    },
+                    {"version": "1.1.0", "require": {"demo/dep": "^1.0"}},
+                    {
+                        "version": "1.0.0",
+                        "license": ["BSD-3-Clause"],
+                        "require": "__unset",
+                    },
+                ]
+            },
+        },
+    )
+    set_registry_mode("php", True)
+    try:
+        latest, latest_deps = inspector.make_single_request(
+            "php", "Demo/Pkg", force_schema=False
+        )
+        older, older_deps = inspector.make_single_request(
+            "php", "demo/pkg", "~1.1", force_schema=False
+        )
+        oldest, oldest_deps = inspector.make_single_request(
+            "php", "demo/pkg", "1.0.0", force_schema=False
+        )
+    finally:
+        set_registry_mode("php")
+    assert latest[0]["pkg_ver"] == "2.0.0"
+    assert latest_deps == {"demo/dep;^2.0"}
+    assert older[0]["pkg_ver"] == "1.1.0"
+    assert older[0]["pkg_lic"] == ["MIT"]
+    assert older_deps == {"demo/dep;^1.0"}
+    assert oldest[0]["pkg_lic"] == ["BSD-3-Clause"]
+    assert oldest_deps == set()
@@ -0,0 +1,110 @@
+"""Tests for the persistent package metadata store"""
+import json
+from datetime import timedelta
+
+import pytest
+
+from depend.dependencies.py.py_helper import set_target_environment
+from depend.inspector import new_result
+from depend.store import MetadataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    Empty store in a temporary directory
+    :return: metadata store to test
+    """
+    return MetadataStore(tmp_path / "store.sqlite")
+
+
+def test_results_never_expire(tmp_path):
+    """Results are kept even when version lists expire"""
+    store = MetadataStore(tmp_path / "store.sqlite", timedelta(seconds=-1))
+    result = new_result("lodash")
+    result["pkg_ver"] = "4.17.21"
+    store.put_result("javascript", "lodash", "4.17.21", result)
+    store.put_versions("javascript", "lodash", ["4.17.20", "4.17.21"])
+    assert store.get_result("javascript", "lodash", "4.17.21") == result
+    assert store.get_versions("javascript", "lodash") is None
+
+
+def test_results_canonical_name(store):
+    """Results are keyed by the name the registry treats packages as"""
+    result = new_result("Django")
+    store.put_result("python", "Django", "4.1", result)
+    assert store.get_result("python", "django", "4.1") == result
+    assert store.has_result("python", "DJANGO", "4.1")
+    assert not store.has_result("javascript", "Django", "4.1")
+    assert not store.has_result("python", "django[argon2]", "4.1")
+    store.put_result("python", "Django[Bcrypt,argon2]", "4.1", result)
+    assert store.has_result("python", "django[argon2,bcrypt]", "4.1")
+
+
+def test_versions(store):
+    """Fresh version lists are served from the store"""
+    assert store.get_versions("python", "rich") is None
+    store.put_versions("python", "rich", ["12.5.1"])
+    assert store.get_versions("python", "rich") == ["12.5.1"]
+
+
+def test_versions_canonical_name(store):
+    """Version lists are shared by every spelling of a name, extras included"""
+    store.put_versions("python", "Typing_Extensions", ["4.4.0"])
+    assert store.get_versions("python", "typing-extensions") == ["4.4.0"]
+    assert store.get_versions("python", "typing.extensions[test]") == ["4.4.0"]
+    store.put_versions("rust", "Serde_JSON", ["1.0.0"])
+    assert store.get_versions("rust", "serde-json") == ["1.0.0"]
+    assert store.get_versions("javascript", "Serde_JSON") is None
+
+
+def test_closure_invalidated_by_canonical_name(store):
+    """Closures are invalidated whichever spelling their members were listed under"""
+    store.put_versions("python", "typing_extensions", ["4.3.0"])
+    member = {
+        "package": "typing_extensions;>=4",
+        "name": "typing-extensions",
+        "version": "4.3.0",
+        "pinned": False,
+        "deps": [],
+    }
+    store.put_closure("python", "demo", "1.0", [member])
+    assert store.get_closure("python", "demo", "1.0") == [member]
+    store.put_versions("python", "Typing.Extensions", ["4.3.0", "4.4.0"])
+    assert store.get_closure("python", "demo", "1.0") is None
+
+
+def test_disabled_store(tmp_path):
+    """A disabled store neither keeps nor serves anything"""
+    store = MetadataStore(tmp_path / "store.sqlite", enabled=False)
+    store.put_versions("python", "rich", ["12.5.1"])
+    assert store.get_versions("python", "rich") is None
+
+
+def test_stats_prune_export(store, tmp_path):
+    """Store maintenance operations"""
+    for language, name in [("python", "rich"), ("rust", "libc"), ("rust", "log")]:
+        store.put_result(language, name, "1.0.0", new_result(name))
+    stats = store.stats()
+    assert stats["results"] == 3
+    assert stats["languages"] == {"python": 1, "rust": 2}
+    assert stats["size_bytes"] > 0
+    assert store.prune() == 0
+    assert store.prune(language="rust") == 2
+    export = tmp_path / "export.ndjson"
+    assert store.export(export) == 1
+    entry = json.loads(export.read_text())
+    assert (entry["language"], entry["pkg_name"]) == ("python", "rich")
+
+
+def test_python_results_scoped_by_environment(store):
+    store.put_result("python", "demo", "1.0", new_result("demo"))
+    try:
+        set_target_environment("3.7", "linux")
+        assert store.get_result("python", "demo", "1.0") is None
+        store.put_result("python", "demo", "1.0", new_result("demo"))
+    finally:
+        set_target_environment()
+    assert store.get_result("python", "demo", "1.0") is not None
+    assert store.stats()["languages"] == {"python": 1, "python[3.7.0-linux]": 1}
+    assert store.prune(language="python") == 2
@@ -0,0 +1,505 @@
+"""Tests for the VCS fallback, against a stand-in GitHub server."""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from requests_cache import CachedSession
+
+import depend.cli as cli
+import depend.inspector as inspector
+import depend.vcs.github_api as github_api
+import depend.vcs.github_batch as github_batch
+import depend.vcs.github_worker as github_worker
+import depend.vcs.snapshot as snapshot
+import depend.vcs.vcs_phase as vcs_phase
+from depend import run_stats
+from depend.dependencies.helper import parse_dep_response
+from depend.dependencies.py.setup_reader import LaxSetupReader
+from depend.error import VCSDeferredError
+from depend.inspector import new_result
+from depend.store import MetadataStore
+from depend.vcs.github_scheduler import GithubScheduler
+from depend.vcs.vcs_budget import VCSBudget, parse_budget
+
+GO_MOD = "module github.com/demo/pkg\n\ngo 1.19\n\nrequire golang.org/x/text v0.3.7\n"
+REFS = {"main": "a" * 40, "v1.0.0": "b" * 40}
+FILES = {
+    "LICENSE": "MIT License\n\nPermission is hereby granted",
+    "go.mod": GO_MOD,
+    "README.md": "demo",
+    "requirements.txt": "requests>=2\n",
+}
+
+
+class GithubHandler(BaseHTTPRequestHandler):
+    """
+    Serves a single repository the way the REST API and raw host do.
+    Responses carry an ETag, caching and rate limit headers, quota is tracked
+    per token.
+    """
+
+    quota: dict = {}
+    requests: list = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        token = self.headers.get("Authorization", "").split(" ")[-1]
+        remaining = self.quota.get(token, 5000)
+        if remaining <= 0:
+            return self.send_status(403, {"x-ratelimit-remaining": "0"})
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_status(304, {"ETag": etag})
+        self.quota[token] = remaining - 1
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "private, max-age=60")
+        self.send_header("x-ratelimit-remaining", str(remaining - 1))
+        self.send_header("x-ratelimit-reset", str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_status(self, status, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("x-ratelimit-reset", str(int(time.time()) + 3600))
+        self.end_headers()
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[0] == "raw":
+            # raw/demo/pkg/<sha>/<path>
+            if parts[3] not in REFS.values() or parts[4] not in FILES:
+                return self.send_status(404, {})
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(FILES[parts[4]].encode())
+        elif parts[:3] != ["repos", "demo", "pkg"]:
+            self.send_status(404, {})
+        elif len(parts) == 3:
+            self.send_json(
+                {
+                    "full_name": "demo/pkg",
+                    "default_branch": "main",
+                    "license": {"name": "MIT License"},
+                }
+            )
+        elif parts[3] == "commits" and parts[4] in REFS:
+            self.send_json({"sha": REFS[parts[4]]})
+        elif parts[3] == "git" and parts[5] in REFS.values():
+            tree = [{"path": name, "type": "blob"} for name in FILES]
+            self.send_json({"tree": tree + [{"path": "cmd", "type": "tree"}]})
+        elif parts[3] == "contents" and parts[4] in FILES:
+            content = base64.b64encode(FILES[parts[4]].encode()).decode()
+            self.send_json({"encoding": "base64", "content": content})
+        else:
+            self.send_status(404, {})
+
+    def do_POST(self):
+        """
+        GraphQL endpoint, resolving the repository and object fields the
+        batch enrichment asks for
+        """
+        self.requests.append(self.path)
+        length = int(self.headers["Content-Length"])
+        query = json.loads(self.rfile.read(length))["query"]
+        data = {}
+        for alias, owner, name, body in re.findall(
+            r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\) \{(.*?)\n  \}',
+            query,
+            re.S,
+        ):
+            if f"{owner}/{name}" != "demo/pkg":
+                data[alias] = None
+                continue
+            repo = {
+                "nameWithOwner": "demo/pkg",
+                "licenseInfo": {"name": "MIT License"},
+                "defaultBranchRef": {"name": "main"},
+                "latestRelease": {"tagName": "v1.0.0"},
+            }
+            for field, expression in re.findall(
+                r'(\w+): object\(expression: "([^"]*)"\)', body
+            ):
+                ref, tree, path = expression.partition(":")
+                sha = REFS.get("main" if ref == "HEAD" else ref)
+                if sha is None:
+                    repo[field] = None
+                elif not tree:
+                    repo[field] = {"oid": sha}
+                elif not path:
+                    entries = [{"name": name, "type": "blob"} for name in FILES]
+                    repo[field] = {
+                        "entries": entries + [{"name": "cmd", "type": "tree"}]
+                    }
+                else:
+                    repo[field] = {"text": FILES[path]} if path in FILES else None
+            data[alias] = repo
+        self.send_json({"data": data})
+
+
+def memory_session() -> CachedSession:
+    """
+    Http cache configured like depend.dep_helper.requests, kept in memory
+    :return: session
+    """
+    return CachedSession(
+        backend="memory",
+        cache_control=True,
+        expire_after=timedelta(days=1),
+        allowable_methods=["GET", "POST"],
+        allowable_codes=[200, 400],
+        match_headers=True,
+    )
+
+
+@pytest.fixture
+def fake_github(tmp_path, monkeypatch):
+    """
+    Stand-in GitHub server for the duration of a test
+    :return: scheduler of the token pool used
+    """
+    GithubHandler.quota = {}
+    GithubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GithubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    scheduler = GithubScheduler(["first"])
+    monkeypatch.setattr(github_api, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(github_api, "requests", memory_session())
+    monkeypatch.setattr(inspector, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(github_batch, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(vcs_phase, "get_github_scheduler", lambda: scheduler)
+    store = MetadataStore(tmp_path / "store.sqlite")
+    monkeypatch.setattr(github_api, "metadata_store", store)
+    monkeypatch.setattr(snapshot, "metadata_store", store)
+    github_api.set_github_hosts(url, url + "/raw")
+    snapshot.clear_snapshots()
+    run_stats.reset()
+    yield scheduler
+    github_api.set_github_hosts()
+    vcs_phase.set_phase_mode()
+    vcs_phase.take_pending()
+    snapshot.clear_snapshots()
+    server.shutdown()
+    server.server_close()
+
+
+def test_handle_github_snapshot(fake_github):
+    """License and manifest come from one snapshot per repository and ref"""
+    result = new_result("github.com/demo/pkg")
+    github_worker.handle_github("go", "github.com/demo/pkg", result)
+    assert result["pkg_lic"] == ["MIT License"]
+    assert result["pkg_ver"] == "main"
+    assert result["pkg_dep"] == ["golang.org/x/text;v0.3.7"]
+    api_calls = [path for path in GithubHandler.requests if path.startswith("/repos")]
+    assert len(api_calls) == 3
+    assert len(GithubHandler.requests) == 6
+
+    # the repository is still fresh in the http cache
+    github_worker.handle_github("go", "github.com/demo/pkg", new_result("pkg"))
+    assert len(GithubHandler.requests) == 6
+    assert run_stats.snapshot()["github_snapshot_hits"] == 1
+
+    # a new run revalidates the repository and ref, the snapshot is stored by commit
+    github_api.requests.cache.clear()
+    snapshot.clear_snapshots()
+    stored = new_result("github.com/demo/pkg")
+    github_worker.handle_github("go", "github.com/demo/pkg", stored)
+    assert stored == dict(result, timestamp=stored["timestamp"])
+    assert len(GithubHandler.requests) == 8
+    assert run_stats.snapshot()["github_quota_saved"] == 3
+    assert GithubHandler.quota["first"] == 5000 - 3
+
+
+def test_github_validators_without_store(fake_github, tmp_path, monkeypatch):
+    """Validators are kept when the store is disabled, conditional GETs are not no-store"""
+    store = MetadataStore(tmp_path / "disabled.sqlite", enabled=False)
+    monkeypatch.setattr(github_api, "metadata_store", store)
+    sent = []
+    request = github_api.requests.request
+
+    def record(method, url, **kwargs):
+        sent.append(kwargs["headers"])
+        return request(method, url, **kwargs)
+
+    monkeypatch.setattr(github_api.requests, "request", record)
+    first = github_api.github_get("/repos/demo/pkg")
+    github_api.requests.cache.clear()
+    assert github_api.github_get("/repos/demo/pkg") == first
+    assert GithubHandler.requests == ["/repos/demo/pkg"] * 2
+    assert "If-None-Match" in sent[1]
+    assert all("Cache-Control" not in headers for headers in sent)
+    assert run_stats.snapshot()["github_quota_saved"] == 1
+    assert run_stats.snapshot()["github_requests"] == 2
+
+
+def test_github_unreachable(fake_github):
+    """Requests GitHub cannot answer are reported like error responses"""
+    github_api.set_github_hosts("http://127.0.0.1:9", "http://127.0.0.1:9")
+    assert github_api.github_get("/repos/demo/pkg") is None
+    assert github_api.github_graphql("query { viewer { login } }") is None
+    assert github_api.github_raw("demo/pkg", "main", "LICENSE") is None
+
+
+def test_repo_snapshot_unknown_ref(fake_github):
+    """Refs that do not exist fall back to the default branch"""
+    repo = github_api.github_get("/repos/demo/pkg")
+    taken = snapshot.repo_snapshot(repo, "missing")
+    assert (taken["ref"], taken["sha"]) == ("main", REFS["main"])
+    assert taken["files"] == list(FILES)
+    assert set(taken["contents"]) == {"LICENSE", "go.mod", "requirements.txt"}
+    tagged = snapshot.repo_snapshot(repo, "v1.0.0")
+    assert tagged["sha"] == REFS["v1.0.0"]
+
+
+def test_github_scheduler_rotation(fake_github, monkeypatch):
+    """Drained tokens are skipped until their reset, lookups then wait for quota"""
+    GithubHandler.quota = {"drained": 0, "spare": 3}
+    scheduler = GithubScheduler(["drained", "spare"])
+    monkeypatch.setattr(github_api, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(inspector, "get_github_scheduler", lambda: scheduler)
+    result = new_result("github.com/demo/pkg")
+    github_worker.handle_github("go", "github.com/demo/pkg", result)
+    assert result["pkg_lic"] == ["MIT License"]
+    # the spare token reported no quota left after its last request
+    assert scheduler.acquire() is None
+    with pytest.raises(VCSDeferredError):
+        github_worker.handle_github("go", "github.com/demo/other", new_result("pkg"))
+
+    deferred = new_result("github.com/demo/other")
+    response = SimpleNamespace(status_code=200, text="")
+    inspector.handle_fallback(
+        "go", "github.com/demo/other", deferred, response, "https://example.com"
+    )
+    assert "github.com/demo/other deferred until" in deferred["pkg_err"]["vcs"]
+    assert scheduler.take_deferred() == [("go", "github.com/demo/other", deferred)]
+    assert run_stats.snapshot()["github_tokens_drained"] == 2
+
+    scheduler.resets = {index: time.time() - 1 for index in scheduler.resets}
+    assert scheduler.acquire() == 0
+
+
+def test_setup_py_requirements_file(fake_github):
+    """Requirements read by setup.py are fetched once, then revalidated"""
+    setup_py = (
+        "from setuptools import setup\n"
+        "setup(name='demo', url='https://github.com/demo/pkg', "
+        "install_requires=open('requirements.txt').read().splitlines())\n"
+    )
+    reader = LaxSetupReader()
+    reader._find_install_requires = lambda call, body: "requirements.txt"
+    first = reader.auth_read_setup_py(setup_py)
+    second = reader.auth_read_setup_py(setup_py)
+    assert first["pkg_dep"] == second["pkg_dep"] == ["requests;>=2"]
+    assert run_stats.snapshot()["github_quota_saved"] == 2
+
+
+def test_enrich_github_batch(fake_github):
+    """Repositories are looked up in batches, once for every package pointing to them"""
+    expected = new_result("github.com/demo/pkg")
+    github_worker.handle_github("go", "github.com/demo/pkg", expected)
+    snapshot.clear_snapshots()
+    GithubHandler.requests = []
+
+    lookups = [
+        ("go", repo, new_result(repo))
+        for repo in [
+            "github.com/demo/pkg",
+            "github.com/demo/pkg",
+            "github.com/demo/pkg/tree/missing",
+            "github.com/demo/gone",
+        ]
+    ]
+    github_batch.enrich_github(lookups, batch_size=2)
+    first, second, missing, gone = (result for _, _, result in lookups)
+    assert first == dict(expected, timestamp=first["timestamp"])
+    assert second == dict(first, timestamp=second["timestamp"])
+    assert missing["pkg_lic"] == ["MIT License"]
+    assert missing["pkg_ver"] == "main"
+    assert gone["pkg_lic"] == ["Other"]
+    # demo/pkg, demo/pkg/tree/missing and then its default branch, served by
+    # the snapshot queried first
+    assert GithubHandler.requests == ["/graphql", "/graphql"]
+    assert run_stats.snapshot()["github_graphql_repos"] == 3
+    assert snapshot.metadata_store.get_snapshot("demo/pkg", REFS["main"])
+
+    # the REST path reuses the snapshot of the run
+    result = new_result("github.com/demo/pkg")
+    github_worker.handle_github("go", "github.com/demo/pkg", result)
+    assert result == dict(expected, timestamp=result["timestamp"])
+    assert run_stats.snapshot()["github_snapshot_hits"] == 1
+
+
+def test_enrich_github_nuspec(fake_github, monkeypatch):
+    """Files GraphQL is not asked for are read before the snapshot is stored"""
+    monkeypatch.setitem(FILES, "Demo.Pkg.nuspec", "<package></package>")
+    result = new_result("github.com/demo/pkg")
+    github_batch.enrich_github([("cs", "github.com/demo/pkg", result)])
+    assert GithubHandler.requests == [
+        "/graphql",
+        f"/raw/demo/pkg/{REFS['main']}/Demo.Pkg.nuspec",
+    ]
+    stored = snapshot.metadata_store.get_snapshot("demo/pkg", REFS["main"])
+    assert stored["contents"]["Demo.Pkg.nuspec"] == "<package></package>"
+
+
+@pytest.mark.parametrize("tokens", [[], ["first"]])
+def test_enrich_github_rest_fallback(fake_github, monkeypatch, tokens):
+    """Without a token or an answer to the query, repositories are read over REST"""
+    scheduler = GithubScheduler(tokens)
+    monkeypatch.setattr(github_api, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(github_batch, "get_github_scheduler", lambda: scheduler)
+    monkeypatch.setattr(github_batch, "github_graphql", lambda query: None)
+    result = new_result("github.com/demo/pkg")
+    github_batch.enrich_github([("go", "github.com/demo/pkg", result)])
+    assert result["pkg_lic"] == ["MIT License"]
+    assert result["pkg_dep"] == ["golang.org/x/text;v0.3.7"]
+    assert "/graphql" not in GithubHandler.requests
+
+
+def test_vcs_phase_queue(fake_github):
+    """Queued lookups are marked until the phase, deferred lookups are replayed"""
+    vcs_phase.set_phase_mode(True)
+    queued = new_result("github.com/demo/pkg")
+    inspector.handle_vcs("go", "github.com/demo/pkg", queued)
+    assert queued["pkg_err"]["vcs"] == "VCS lookup of github.com/demo/pkg queued"
+    assert GithubHandler.requests == []
+
+    GithubHandler.quota = {"first": 0}
+    vcs_phase.run_vcs_phase(vcs_phase.take_pending(), batch=True)
+    assert "github.com/demo/pkg deferred until" in queued["pkg_err"]["vcs"]
+
+    GithubHandler.quota = {}
+    fake_github.resets.clear()
+    vcs_phase.run_vcs_phase(fake_github.take_deferred())
+    assert "vcs" not in queued["pkg_err"]
+    assert queued["pkg_lic"] == ["MIT License"]
+
+
+def test_vcs_rounds(fake_github, monkeypatch):
+    """Entries are rendered again once enriched, dependencies found are resolved"""
+    calls = []
+
+    def fake_requests(language, packages, *_args, queued=None, **_kwargs):
+        calls.append((packages, set(queued)))
+        return [{"golang.org/x/text": {"versions": {"v0.3.7": {"pkg_dep": []}}}}]
+
+    monkeypatch.setattr(cli, "make_multiple_requests", fake_requests)
+    vcs_phase.set_phase_mode(True)
+    queued = new_result("github.com/demo/pkg")
+    inspector.handle_vcs("go", "github.com/demo/pkg", queued)
+    response = vcs_phase.track_records([queued], parse_dep_response([queued]))
+    result = [response]
+    cli.run_vcs_rounds("go", result, ["github.com/demo/pkg"], recursive=False)
+    entry = response["github.com/demo/pkg"]["versions"][""]
+    assert entry["pkg_lic"] == ["MIT License"]
+    assert entry["pkg_dep"] == ["golang.org/x/text;v0.3.7"]
+    assert "vcs" not in entry["pkg_err"]
+    assert calls == []
+
+    inspector.handle_vcs("go", "github.com/demo/pkg", new_result("github.com/demo/pkg"))
+    result = []
+    cli.run_vcs_rounds("go", result, ["github.com/demo/pkg"], recursive=True)
+    assert calls == [(["golang.org/x/text;v0.3.7"], {"github.com/demo/pkg;"})]
+    assert len(result) == 1
+    assert run_stats.snapshot()["vcs_phase_rounds"] == 1
+
+
+def test_vcs_rounds_share_budget(fake_github, monkeypatch):
+    """Rounds spend from one budget, later rounds stop once it is spent"""
+    found = new_result("github.com/demo/other")
+
+    def fake_requests(language, packages, *_args, **_kwargs):
+        inspector.handle_vcs("go", "github.com/demo/other", found)
+        return [{"golang.org/x/text": {"versions": {"v0.3.7": {"pkg_dep": []}}}}]
+
+    monkeypatch.setattr(cli, "make_multiple_requests", fake_requests)
+    vcs_phase.set_phase_mode(True)
+    first = new_result("github.com/demo/pkg")
+    inspector.handle_vcs("go", "github.com/demo/pkg", first)
+    budget = VCSBudget(calls=1)
+    cli.run_vcs_rounds("go", [], ["github.com/demo/pkg"], True, budget=budget)
+    assert first["pkg_lic"] == ["MIT License"]
+    assert found["pkg_err"]["vcs"] == (
+        "VCS lookup of github.com/demo/other skipped, budget spent"
+    )
+    assert run_stats.snapshot()["vcs_phase_rounds"] == 1
+
+
+@pytest.mark.parametrize("wait", [False, True])
+def test_vcs_rounds_deferred(fake_github, monkeypatch, wait):
+    """Deferred lookups wait for a reset, or are reported as still deferred"""
+    waited = []
+
+    def fake_sleep(seconds):
+        waited.append(seconds)
+        GithubHandler.quota = {}
+        fake_github.resets.clear()
+
+    monkeypatch.setattr(vcs_phase.time, "sleep", fake_sleep)
+    vcs_phase.set_phase_mode(True)
+    queued = new_result("github.com/demo/pkg")
+    inspector.handle_vcs("go", "github.com/demo/pkg", queued)
+    GithubHandler.quota = {"first": 0}
+    cli.run_vcs_rounds("go", [], ["github.com/demo/pkg"], False, wait=wait)
+    assert len(waited) == int(wait)
+    if wait:
+        assert "vcs" not in queued["pkg_err"]
+        assert "vcs_still_deferred" not in run_stats.snapshot()
+    else:
+        assert "deferred until" in queued["pkg_err"]["vcs"]
+        assert run_stats.snapshot()["vcs_still_deferred"] == 1
+    assert fake_github.take_deferred() == []
+
+
+def test_vcs_phase_dedup(fake_github):
+    """Packages pointing to the same repository share a single lookup"""
+    lookups = [
+        ("go", repo, new_result(repo))
+        for repo in [
+            "github.com/demo/pkg",
+            "https://github.com/demo/pkg",
+            "github.com/demo/pkg",
+            "gitlab.com/demo/pkg",
+        ]
+    ]
+    vcs_phase.run_vcs_phase(lookups, jobs=2)
+    results = [result for _, _, result in lookups]
+    assert [result["pkg_ver"] for result in results] == ["main"] * 3 + [""]
+    assert results[1]["pkg_name"] == "https://github.com/demo/pkg"
+    assert len(GithubHandler.requests) == 6
+    assert run_stats.snapshot()["vcs_phase_repos"] == 2
+
+
+def test_vcs_phase_budget(fake_github):
+    """Repositories left once the budget is spent are marked, not looked up"""
+    lookups = [("go", "github.com/demo/pkg", new_result("github.com/demo/pkg"))]
+    vcs_phase.run_vcs_phase(lookups, budget=VCSBudget(calls=0))
+    result = lookups[0][2]
+    assert result["pkg_err"]["vcs"] == (
+        "VCS lookup of github.com/demo/pkg skipped, budget spent"
+    )
+    assert result["pkg_lic"] == ["Other"]
+    assert GithubHandler.requests == []
+
+    vcs_phase.run_vcs_phase(lookups, budget=parse_budget("3"), batch=True)
+    assert "vcs" not in result["pkg_err"]
+    assert parse_budget("90s").seconds == 90
+    assert parse_budget(None).spent() is False
+    with pytest.raises(ValueError):
+        parse_budget("ten")
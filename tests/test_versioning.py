@@ -2,7 +2,18 @@
 import pytest
 from packaging.specifiers import SpecifierSet
 
-from depend.dependencies.helper import fix_constraint, resolve_version
+import depend.dependencies.version_batch as version_batch
+from depend import run_stats
+from depend.dependencies import helper
+from depend.dependencies.helper import (
+    canonical_entry,
+    fix_constraint,
+    pinned_version,
+    resolve_version,
+    version_index,
+)
+from depend.dependencies.semver import semver_index
+from depend.dependencies.version_batch import resolve_versions
 
 
 @pytest.mark.parametrize(
@@ -99,3 +110,216 @@ def test_equivalent_dependency_parsing(language, ver_constraint, req_constraint)
     assert resolve_version(
         vers, fix_constraint(language, ver_constraint)
     ) == resolve_version(vers, fix_constraint(language, req_constraint))
+
+
+@pytest.mark.parametrize(
+    ("language", "ver_constraint", "pinned"),
+    [
+        ("python", "==1.9.2", "1.9.2"),
+        ("python", ">=1.9.2", None),
+        ("python", "==1.*", None),
+        ("javascript", "4.17.21", "4.17.21"),
+        ("javascript", "^4.17.21", None),
+        ("cs", "[1.0]", "1.0"),
+        ("cs", "1.0", None),
+        ("python", "latest", None),
+    ],
+)
+def test_pinned_version(language, ver_constraint, pinned):
+    """Only exact pins are detected from fixed constraints"""
+    assert pinned_version(fix_constraint(language, ver_constraint)) == pinned
+
+
+@pytest.mark.parametrize(
+    ("language", "package_d", "entry"),
+    [
+        ("python", "PyYAML;>=5", "pyyaml;>=5"),
+        ("python", "zope.Interface", "zope-interface;"),
+        ("python", "Requests;latest", "requests;"),
+        ("rust", "Serde_JSON;1.0", "serde-json;1.0"),
+        ("php", "Symfony/Console;^6.0", "symfony/console;^6.0"),
+        (
+            "go",
+            "github.com/BurntSushi/toml;v1.2.0",
+            "github.com/BurntSushi/toml;v1.2.0",
+        ),
+    ],
+)
+def test_canonical_entry(language, package_d, entry):
+    assert canonical_entry(language, package_d) == entry
+
+
+def test_version_index_order():
+    vers = ["1.0", "2.0.0rc1", "dev-master", "1.10", "1.0.0", "1.2"]
+    assert [ver for _, ver in version_index(tuple(vers))] == [
+        "dev-master",
+        "2.0.0rc1",
+        "1.10",
+        "1.2",
+        "1.0",
+        "1.0.0",
+    ]
+    assert resolve_version(vers, [SpecifierSet("<1.5")]) == "1.2"
+    assert resolve_version(vers, [SpecifierSet(">=2")]) is None
+    assert resolve_version(vers, [SpecifierSet("==1.0.0")]) == "1.0"
+
+
+def test_resolve_versions_matches_resolve_version():
+    pytest.importorskip("numpy")
+    vers = [
+        "0.9",
+        "1.0.0a1",
+        "1.0.0rc2",
+        "1.0",
+        "1.0.post1",
+        "1.0.1.dev3",
+        "1.0.1+local",
+        "1.1.0b1",
+        "1.1",
+        "1.2.3.4.5",
+        "1!0.5",
+        "2.0.0.dev1",
+        "2.0.0",
+        "dev-master",
+        "v3.0.0",
+    ]
+    batch = [
+        [SpecifierSet(spec)]
+        for spec in (
+            "",
+            ">=1.0",
+            ">1.0",
+            "<1.0",
+            "<=1.0",
+            "==1.0",
+            "==1.0.*",
+            "!=2.0.0",
+            "!=1.*",
+            "~=1.0",
+            "~=1.0.0",
+            "===1.0",
+            ">1.2.3.4",
+            ">=1.0.0a1,<1.1",
+            ">=2.0.0.dev0",
+            "==1.0.1",
+        )
+    ]
+    batch += [fix_constraint("javascript", "^1.0.0 || ^2.0.0")]
+    batch += [fix_constraint("rust", "~1.0")]
+    resolved = resolve_versions(vers, batch)
+    assert resolved == [resolve_version(vers, reqs) for reqs in batch]
+    assert resolve_versions([], batch[:1]) == [None]
+
+
+SEMVER_LISTING = [
+    "0.9.0",
+    "1.0.0-alpha.1",
+    "1.0.0",
+    "1.2.2",
+    "1.2.3-beta.2",
+    "1.2.3-beta.11",
+    "1.2.9",
+    "1.3.0-rc.1",
+    "1.4.0",
+    "2.0.0-rc.1",
+    "2.0.0",
+    "2.1.0",
+    "v3.0.0",
+    "dev-master",
+]
+
+
+SEMVER_CASES = [
+    # pre-releases only match ranges naming a pre-release of the same release
+    ("javascript", "*", "v3.0.0"),
+    ("javascript", "^1.2.0", "1.4.0"),
+    ("javascript", "<2", "1.4.0"),
+    ("javascript", "^1.2.3-beta.1", "1.4.0"),
+    ("javascript", "~1.2.3-beta.1", "1.2.9"),
+    ("javascript", ">=1.2.3-beta.1 <1.2.4", "1.2.3-beta.11"),
+    ("javascript", "1.0.0-alpha.1", "1.0.0-alpha.1"),
+    ("rust", ">=2.0.0-rc.1, <2.0.0", "2.0.0-rc.1"),
+    ("php", "1.3.*@beta", "1.3.0-rc.1"),
+    ("php", "1.3.*", None),
+    ("php", "~2.0@beta", "2.1.0"),
+    ("php", "<2.0@rc", "1.4.0"),
+    ("php", "^1.0", "1.4.0"),
+    # grammar
+    ("javascript", ">= 1.2.3 < 2", "1.4.0"),
+    ("javascript", ">1.2", "v3.0.0"),
+    ("javascript", "<=1.2", "1.2.9"),
+    ("javascript", "1 - 1.2", "1.2.9"),
+    ("javascript", "1.2.x || 2.0", "2.0.0"),
+    ("javascript", "=v1.2.2", "1.2.2"),
+    ("rust", "=1.2", "1.2.9"),
+    ("rust", "1.2", "1.4.0"),
+    ("rust", "1.*", "1.4.0"),
+    ("php", "1.2.*|~2.0.0", "2.0.0"),
+    ("php", ">=1.0,<1.3", "1.2.9"),
+    ("php", "~1.2.2", "1.2.9"),
+    ("php", "dev-master", None),
+    ("php", "dev-master|^1.0", "1.4.0"),
+    ("javascript", "file:../local", None),
+    ("javascript", ">3", None),
+]
+
+
+@pytest.mark.parametrize(("language", "ver_constraint", "expected"), SEMVER_CASES)
+def test_semver_ranges(language, ver_constraint, expected):
+    """Ranges of semver ecosystems follow semver precedence and pre-release rules"""
+    assert resolve_version(
+        SEMVER_LISTING, fix_constraint(language, ver_constraint)
+    ) == (expected)
+
+
+def test_resolve_versions_semver(monkeypatch):
+    """Semver ranges are resolved through the array path, not one by one"""
+    pytest.importorskip("numpy")
+
+    def one_by_one(*_args):
+        raise AssertionError("resolved without the array")
+
+    monkeypatch.setattr(version_batch, "resolve_version", one_by_one)
+    batch = [
+        fix_constraint(language, constraint) for language, constraint, _ in SEMVER_CASES
+    ]
+    assert resolve_versions(SEMVER_LISTING, batch) == [
+        expected for _, _, expected in SEMVER_CASES
+    ]
+    lodash = ["4.16.6", "4.17.0", "4.17.20", "4.17.21", "5.0.0-rc.1"]
+    assert resolve_versions(lodash, [fix_constraint("javascript", "^4.17.0")]) == [
+        "4.17.21"
+    ]
+
+
+def test_semver_precedence():
+    vers = [
+        "1.0.0",
+        "1.0.0-rc.1",
+        "1.0.0-beta.11",
+        "1.0.0-beta.2",
+        "1.0.0-beta",
+        "1.0.0-alpha.beta",
+        "1.0.0-alpha.1",
+        "1.0.0-alpha",
+    ]
+    assert [ver for _, ver in semver_index(tuple(reversed(vers)))] == vers
+
+
+def test_constraint_cache():
+    helper.clear_constraint_cache()
+    run_stats.reset()
+    first = fix_constraint("javascript", "^1.0.0")
+    assert fix_constraint("javascript", " ^1.0.0 ") == first
+    assert fix_constraint("javascript", "^1.0.0")[0] is first[0]
+    fix_constraint("python", "^1.0.0")
+    fix_constraint("rust", "^1.0.0")
+    stats = run_stats.snapshot()
+    assert stats["constraint_cache_hits"] == 2
+    assert stats["constraint_cache_misses"] == 3
+    info = helper.compiled_constraint.cache_info()
+    assert (info.currsize, info.maxsize) == (3, helper.CONSTRAINT_CACHE_SIZE)
+    helper.clear_constraint_cache()
+    # counts from before the cache was cleared are kept for the run
+    fix_constraint("javascript", "^1.0.0")
+    assert run_stats.snapshot()["constraint_cache_misses"] == 4